@@ -6,6 +6,7 @@ from OpenGL.GL import *
 import OpenGL.GL.shaders
 import numpy as np
 import grafica.transformations as tr
+import grafica.headless as hl
 import grafica.basic_shapes as bs
 import grafica.easy_shaders as es
 import grafica.performance_monitor as pm
@@ -184,8 +185,11 @@ def transformGuiOverlay(lightPos, ka, kd, ks):
 
 if __name__ == "__main__":
 
+    # Modo sin ventana: --headless=N dibuja N frames fuera de pantalla y --dump-frames=DIR los guarda en PNG
+    headless = hl.HeadlessMode.fromArguments()
+
     # Initialize glfw
-    if not glfw.init():
+    if not headless.init():
         glfw.set_window_should_close(window, True)
 
     width = 800
@@ -197,7 +201,7 @@ if __name__ == "__main__":
     glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, GL_TRUE)
     glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
 
-    window = glfw.create_window(width, height, title, None, None)
+    window = headless.createWindow(width, height, title)
 
     if not window:
         glfw.terminate()
@@ -260,7 +264,7 @@ if __name__ == "__main__":
     ks = [1.0, 1.0, 1.0] 
 
     # Application loop
-    while not glfw.window_should_close(window):
+    while not headless.shouldClose(window):
         # Variables del tiempo
         t1 = glfw.get_time()
         delta = t1 -t0
@@ -370,7 +374,7 @@ if __name__ == "__main__":
         impl.render(imgui.get_draw_data())
 
         # Once the drawing is rendered, buffers are swap so an uncomplete drawing is never seen.
-        glfw.swap_buffers(window)
+        headless.swapBuffers(window)
 
     gpuAxis.clear()
     impl.shutdown()
@@ -378,4 +382,5 @@ if __name__ == "__main__":
     torus1.clear()
     torus2.clear()
 
+    headless.clear()
     glfw.terminate()
\ No newline at end of file
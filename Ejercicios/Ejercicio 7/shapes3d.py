@@ -7,6 +7,7 @@ import grafica.basic_shapes as bs
 import grafica.easy_shaders as es
 import grafica.transformations as tr
 import grafica.scene_graph as sg
+import grafica.parametric_shapes as ps
 
 def createGPUShape(pipeline, shape):
      # Funcion Conveniente para facilitar la inicializacion de un GPUShape
@@ -139,227 +140,28 @@ def createCube2(pipeline):
     return scaledObject
 
 def createColorNormalSphere(N, r, g, b):
-    # Funcion para crear una esfera con normales
-
-    vertices = []           # lista para almacenar los verices
-    indices = []            # lista para almacenar los indices
-    dTheta = 2 * np.pi /N   # angulo que hay entre cada iteracion de la coordenada theta
-    dPhi = 2 * np.pi /N     # angulo que hay entre cada iteracion de la coordenada phi
-    rho = 0.5               # radio de la esfera
-    c = 0                   # contador de vertices, para ayudar a indicar los indices
-
-    # Se recorre la coordenada theta
-    for i in range(N - 1):
-        theta = i * dTheta # angulo theta en esta iteracion
-        theta1 = (i + 1) * dTheta # angulo theta en la iteracion siguiente
-        # Se recorre la coordenada phi
-        for j in range(N):
-            phi = j*dPhi # angulo phi en esta iteracion
-            phi1 = (j+1)*dPhi # angulo phi en la iteracion siguiente
-
-            # Se crean los vertices necesarios son coordenadas esfericas para cada iteracion
-
-            # Vertice para las iteraciones actuales de theta (i) y phi (j) 
-            v0 = [rho*np.sin(theta)*np.cos(phi), rho*np.sin(theta)*np.sin(phi), rho*np.cos(theta)]
-            # Vertice para las iteraciones siguiente de theta (i + 1) y actual de phi (j) 
-            v1 = [rho*np.sin(theta1)*np.cos(phi), rho*np.sin(theta1)*np.sin(phi), rho*np.cos(theta1)]
-            # Vertice para las iteraciones actual de theta (i) y siguiente de phi (j + 1) 
-            v2 = [rho*np.sin(theta1)*np.cos(phi1), rho*np.sin(theta1)*np.sin(phi1), rho*np.cos(theta1)]
-            # Vertice para las iteraciones siguientes de theta (i + 1) y phi (j + 1) 
-            v3 = [rho*np.sin(theta)*np.cos(phi1), rho*np.sin(theta)*np.sin(phi1), rho*np.cos(theta)]
-            
-            # Se crean los vectores normales para cada vertice segun los valores de rho tongo 
-            n0 = [np.sin(theta)*np.cos(phi), np.sin(theta)*np.sin(phi), np.cos(theta)]
-            n1 = [np.sin(theta1)*np.cos(phi), np.sin(theta1)*np.sin(phi), np.cos(theta1)]
-            n2 = [np.sin(theta1)*np.cos(phi1), np.sin(theta1)*np.sin(phi1), np.cos(theta1)]
-            n3 = [np.sin(theta)*np.cos(phi1), np.sin(theta)*np.sin(phi1), np.cos(theta)]
-
-
-            # Creamos los triangulos superiores
-            #        v0
-            #       /  \
-            #      /    \
-            #     /      \
-            #    /        \
-            #   /          \
-            # v1 ---------- v2
-            if i == 0:
-                #           vertices              color    normales
-                vertices += [v0[0], v0[1], v0[2], r, g, b, n0[0], n0[1], n0[2]]
-                vertices += [v1[0], v1[1], v1[2], r, g, b, n1[0], n1[1], n1[2]]
-                vertices += [v2[0], v2[1], v2[2], r, g, b, n2[0], n2[1], n2[2]]
-                indices += [ c + 0, c + 1, c +2 ]
-                c += 3
-
-            # Creamos los triangulos inferiores
-            # v0 ---------- v3
-            #   \          /
-            #    \        /
-            #     \      /
-            #      \    /
-            #       \  /
-            #        v1
-            elif i == (N-2):
-                #           vertices              color    normales
-                vertices += [v0[0], v0[1], v0[2], r, g, b, n0[0], n0[1], n0[2]]
-                vertices += [v1[0], v1[1], v1[2], r, g, b, n1[0], n1[1], n1[2]]
-                vertices += [v3[0], v3[1], v3[2], r, g, b, n3[0], n3[1], n3[2]]
-                indices += [ c + 0, c + 1, c +2 ]
-                c += 3
-            
-            # Creamos los quads intermedios
-            #  v0 -------------- v3
-            #  | \                |
-            #  |    \             |
-            #  |       \          |
-            #  |          \       |
-            #  |             \    |
-            #  |                \ |
-            #  v1 -------------- v2
-            else: 
-                #           vertices              color    normales
-                vertices += [v0[0], v0[1], v0[2], r, g, b, n0[0], n0[1], n0[2]]
-                vertices += [v1[0], v1[1], v1[2], r, g, b, n1[0], n1[1], n1[2]]
-                vertices += [v2[0], v2[1], v2[2], r, g, b, n2[0], n2[1], n2[2]]
-                vertices += [v3[0], v3[1], v3[2], r, g, b, n3[0], n3[1], n3[2]]
-                indices += [ c + 0, c + 1, c +2 ]
-                indices += [ c + 2, c + 3, c + 0 ]
-                c += 4
-    return bs.Shape(vertices, indices)
+    # Funcion para crear una esfera con normales, evaluada de una vez sobre las esquinas (phi, theta)
+    phi, theta = ps.cellParameters(N, N - 1, 2 * np.pi / N, 2 * np.pi / N)
+    return ps.createCellShape(ps.sphereCells(phi, theta, 0.5, (r, g, b)), bs.COLOR_NORMAL_LAYOUT, capped=True)
+
 
 def createTextureNormalSphere(N):
     # Funcion para crear una esfera con normales y texturizada
-
-    vertices = []           # lista para almacenar los verices
-    indices = []            # lista para almacenar los indices
-    dTheta = 2 * np.pi /N   # angulo que hay entre cada iteracion de la coordenada theta
-    dPhi = 2 * np.pi /N     # angulo que hay entre cada iteracion de la coordenada phi
-    rho = 0.5               # radio de la esfera
-    c = 0                   # contador de vertices, para ayudar a indicar los indices
-
-    # Se recorre la coordenada theta
-    for i in range(N - 1):
-        theta = i * dTheta # angulo theta en esta iteracion
-        theta1 = (i + 1) * dTheta # angulo theta en la iteracion siguiente
-         # Se recorre la coordenada phi
-        for j in range(N):
-            phi = j*dPhi # angulo phi en esta iteracion
-            phi1 = (j+1)*dPhi # angulo phi en la iteracion siguiente
-
-            # Se crean los vertices necesarios son coordenadas esfericas para cada iteracion
-
-            # Vertice para las iteraciones actuales de theta (i) y phi (j) 
-            v0 = [rho*np.sin(theta)*np.cos(phi), rho*np.sin(theta)*np.sin(phi), rho*np.cos(theta)]
-            # Vertice para las iteraciones siguiente de theta (i + 1) y actual de phi (j) 
-            v1 = [rho*np.sin(theta1)*np.cos(phi), rho*np.sin(theta1)*np.sin(phi), rho*np.cos(theta1)]
-            # Vertice para las iteraciones actual de theta (i) y siguiente de phi (j + 1) 
-            v2 = [rho*np.sin(theta1)*np.cos(phi1), rho*np.sin(theta1)*np.sin(phi1), rho*np.cos(theta1)]
-            # Vertice para las iteraciones siguientes de theta (i + 1) y phi (j + 1) 
-            v3 = [rho*np.sin(theta)*np.cos(phi1), rho*np.sin(theta)*np.sin(phi1), rho*np.cos(theta)]
-
-            # Se crean los vectores normales para cada vertice segun los valores de rho tongo 
-            n0 = [np.sin(theta)*np.cos(phi), np.sin(theta)*np.sin(phi), np.cos(theta)]
-            n1 = [np.sin(theta1)*np.cos(phi), np.sin(theta1)*np.sin(phi), np.cos(theta1)]
-            n2 = [np.sin(theta1)*np.cos(phi1), np.sin(theta1)*np.sin(phi1), np.cos(theta1)]
-            n3 = [np.sin(theta)*np.cos(phi1), np.sin(theta)*np.sin(phi1), np.cos(theta)]
-
-
-            # Creamos los triangulos superiores
-            #        v0
-            #       /  \
-            #      /    \
-            #     /      \
-            #    /        \
-            #   /          \
-            # v1 ---------- v2
-            if i == 0:
-                #           vertices           UV coord    normales
-                vertices += [v0[0], v0[1], v0[2], 0, 1, n0[0], n0[1], n0[2]]
-                vertices += [v1[0], v1[1], v1[2], 1, 1, n1[0], n1[1], n1[2]]
-                vertices += [v2[0], v2[1], v2[2], 0.5, 0, n2[0], n2[1], n2[2]]
-                indices += [ c + 0, c + 1, c +2 ]
-                c += 3
-            
-            # Creamos los triangulos inferiores
-            # v0 ---------- v3
-            #   \          /
-            #    \        /
-            #     \      /
-            #      \    /
-            #       \  /
-            #        v1
-            elif i == (N-2):
-                #           vertices           UV coord    normales
-                vertices += [v0[0], v0[1], v0[2], 0, 0, n0[0], n0[1], n0[2]]
-                vertices += [v1[0], v1[1], v1[2], 0.5, 1, n1[0], n1[1], n1[2]]
-                vertices += [v3[0], v3[1], v3[2], 1, 0, n3[0], n3[1], n3[2]]
-                indices += [ c + 0, c + 1, c +2 ]
-                c += 3
-            
-            # Creamos los quads intermedios
-            #  v0 -------------- v3
-            #  | \                |
-            #  |    \             |
-            #  |       \          |
-            #  |          \       |
-            #  |             \    |
-            #  |                \ |
-            #  v1 -------------- v2
-            else: 
-                #           vertices           UV coord    normales
-                vertices += [v0[0], v0[1], v0[2], 0, 0, n0[0], n0[1], n0[2]]
-                vertices += [v1[0], v1[1], v1[2], 0, 1, n1[0], n1[1], n1[2]]
-                vertices += [v2[0], v2[1], v2[2], 1, 1, n2[0], n2[1], n2[2]]
-                vertices += [v3[0], v3[1], v3[2], 0, 1, n3[0], n3[1], n3[2]]
-                indices += [ c + 0, c + 1, c +2 ]
-                indices += [ c + 2, c + 3, c + 0 ]
-                c += 4
-    return bs.Shape(vertices, indices)
+    # Cada triangulo superior, cuadrilatero e inferior lleva sus propias coordenadas de textura
+    phi, theta = ps.cellParameters(N, N - 1, 2 * np.pi / N, 2 * np.pi / N)
+    texCoords = np.tile([[0, 0], [0, 1], [1, 1], [0, 1]], (N - 1, 1, 1, 1)).astype(float)
+    texCoords[0] = [[0, 1], [1, 1], [0.5, 0], [0, 0]]
+    if N > 2:
+        texCoords[-1] = [[0, 0], [0.5, 1], [0, 0], [1, 0]]
+    return ps.createCellShape(ps.sphereCells(phi, theta, 0.5, texCoords), bs.TEXTURE_NORMAL_LAYOUT, capped=True)
 
 
 def createTextureNormalsTorus(N, R, r):
-    # Funcion para crear un toroide con normales y texturizada
-
-    vertices = []           # lista para almacenar los verices
-    indices = []            # lista para almacenar los indices
-    dTheta = 2 * np.pi /N   # angulo que hay entre cada iteracion de la coordenada theta
-    dPhi = 2 * np.pi /N     # angulo que hay entre cada iteracion de la coordenada phi
-    c = 0                   # contador de vertices, para ayudar a indicar los indices
-
-    # Se recorre la coordenada theta
-    for i in range(N):
-        theta = i * dTheta # angulo theta en esta iteracion
-        theta1 = (i + 1) * dTheta # angulo theta en la iteracion siguiente
-         # Se recorre la coordenada phi
-        for j in range(N):
-            phi = j * dPhi # angulo phi en esta iteracion
-            phi1 = (j + 1) * dPhi # angulo phi en la iteracion siguiente
-
-            # Vertice para las iteraciones actuales de theta (i) y phi (j) 
-            v0 = [(R + r*np.sin(theta))*np.cos(phi), (R + r*np.sin(theta))*np.sin(phi), r*np.cos(theta)]
-            # Vertice para las iteraciones siguiente de theta (i + 1) y actual de phi (j) 
-            v1 = [(R + r*np.sin(theta1))*np.cos(phi), (R + r*np.sin(theta1))*np.sin(phi), r*np.cos(theta1)]
-            # Vertice para las iteraciones actual de theta (i) y siguiente de phi (j + 1) 
-            v2 = [(R + r*np.sin(theta1))*np.cos(phi1), (R + r*np.sin(theta1))*np.sin(phi1), r*np.cos(theta1)]
-            # Vertice para las iteraciones siguientes de theta (i + 1) y phi (j + 1) 
-            v3 = [(R + r*np.sin(theta))*np.cos(phi1), (R + r*np.sin(theta))*np.sin(phi1), r*np.cos(theta)]
-
-            # Se crean los vectores normales para cada vertice segun los valores de rho tongo 
-            n0 = [np.sin(theta)*np.cos(phi), np.sin(theta)*np.sin(phi), np.cos(theta)]
-            n1 = [np.sin(theta1)*np.cos(phi), np.sin(theta1)*np.sin(phi), np.cos(theta1)]
-            n2 = [np.sin(theta1)*np.cos(phi1), np.sin(theta1)*np.sin(phi1), np.cos(theta1)]
-            n3 = [np.sin(theta)*np.cos(phi1), np.sin(theta)*np.sin(phi1), np.cos(theta)]
-
-            #           vertices            UV coord    normales
-            vertices += [v0[0], v0[1], v0[2], 0, 0, n0[0], n0[1], n0[2]]
-            vertices += [v1[0], v1[1], v1[2], 0, 1, n1[0], n1[1], n1[2]]
-            vertices += [v2[0], v2[1], v2[2], 1, 1, n2[0], n2[1], n2[2]]
-            vertices += [v3[0], v3[1], v3[2], 1, 0, n3[0], n3[1], n3[2]]
-            indices += [ c + 0, c + 1, c +2 ]
-            indices += [ c + 2, c + 3, c + 0 ]
-            c += 4
-
-    return bs.Shape(vertices, indices)
+    # Funcion para crear un toroide con normales y texturizado
+    # La textura completa se repite en cada cuadrilatero
+    phi, theta = ps.cellParameters(N, N, 2 * np.pi / N, 2 * np.pi / N)
+    texCoords = np.array([[0, 0], [0, 1], [1, 1], [1, 0]], dtype=float)
+    return ps.createCellShape(ps.torusCells(phi, theta, R, r, texCoords), bs.TEXTURE_NORMAL_LAYOUT)
 
 
 def createSphereNode(r, g, b, pipeline):
@@ -439,4 +241,4 @@ def createTexTorusNode2(pipeline, R, r):
     scaledTorus.transform = tr.scale(4.5, 4.5, 4.5)
     scaledTorus.childs = [torusNode]
 
-    return scaledTorus
\ No newline at end of file
+    return scaledTorus
\ No newline at end of file
@@ -9,6 +9,7 @@ import sys
 import os.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import grafica.transformations as tr
+import grafica.headless as hl
 import grafica.basic_shapes as bs
 import grafica.scene_graph as sg
 import grafica.easy_shaders as es
@@ -132,8 +133,11 @@ def create_scene():
 
 if __name__ == "__main__":
 
+    # Modo sin ventana: --headless=N dibuja N frames fuera de pantalla y --dump-frames=DIR los guarda en PNG
+    headless = hl.HeadlessMode.fromArguments()
+
     # Initialize glfw
-    if not glfw.init():
+    if not headless.init():
         sys.exit(1)
 
     width = 600
@@ -144,7 +148,7 @@ if __name__ == "__main__":
     glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, GL_TRUE)
     glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
 
-    window = glfw.create_window(width, height, "Ejercicio 15: Plano inclinado variable", None, None)
+    window = headless.createWindow(width, height, "Ejercicio 15: Plano inclinado variable")
 
     if not window:
         glfw.terminate()
@@ -176,7 +180,7 @@ if __name__ == "__main__":
     # Creamos el arreglo donde iremos dejando el ultimo paso del calculo de la aproximación, y dejamos las condiciones iniciales
     last_time = 0
 
-    while not glfw.window_should_close(window):
+    while not headless.shouldClose(window):
         # Using GLFW to check for input events
         glfw.poll_events()
 
@@ -212,6 +216,7 @@ if __name__ == "__main__":
         sg.drawSceneGraphNode(scene, pipeline, "transform")
 
         # Once the render is done, buffers are swapped, showing only the complete scene.
-        glfw.swap_buffers(window)
+        headless.swapBuffers(window)
 
+    headless.clear()
     glfw.terminate()
\ No newline at end of file
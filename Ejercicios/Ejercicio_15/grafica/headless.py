@@ -0,0 +1,231 @@
+# coding=utf-8
+"""Offscreen rendering of the applications for a fixed number of frames, with optional PNG dumps"""
+
+import os
+import sys
+import ctypes
+import glfw
+from OpenGL.GL import *
+from PIL import Image
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+# Number of frames to render offscreen, "--headless=N" in the command line does the same
+FRAMES_VARIABLE = "GRAFICA_HEADLESS"
+
+# Directory where every frame is saved as PNG, as "--dump-frames=DIRECTORY"
+DUMP_VARIABLE = "GRAFICA_DUMP_FRAMES"
+
+# Frames rendered by "--headless" without a number
+DEFAULT_FRAMES = 300
+
+# EGL_PLATFORM_SURFACELESS_MESA, an EGL display without any window system
+SURFACELESS_PLATFORM = 0x31DD
+
+
+class HeadlessMode:
+    """
+    Stands in for the GLFW calls of an application main loop: init, create_window,
+    window_should_close and swap_buffers. When disabled it only forwards them.
+
+    When enabled, the window is hidden and the application draws into a
+    framebuffer object of the window size, the loop ends after the given number
+    of frames, and every frame can be saved as PNG.
+
+    The backend follows PYOPENGL_PLATFORM, which must be set before OpenGL is
+    imported, and needs no display for "osmesa" or "egl":
+    - "osmesa": GLFW creates the context with OSMesa (libOSMesa must be installed).
+    - "egl": the context comes from the surfaceless EGL platform of Mesa, which
+      works on machines without GPU (llvmpipe). GLFW only gives the window for
+      input and time, so glfw.make_context_current and glfw.swap_interval on it
+      are no-ops and their errors are ignored.
+    - anything else: a hidden window of the desktop is used.
+
+        PYOPENGL_PLATFORM=egl python application.py --headless=10 --dump-frames=frames
+    """
+    def __init__(self, frames=None, dumpDirectory=None):
+        self.enabled = frames is not None
+        self.frames = frames
+        self.dumpDirectory = dumpDirectory
+        self.frame = 0
+        self.width = 0
+        self.height = 0
+        self.fbo = None
+        self.renderbuffers = []
+        self.eglDisplay = None
+        self.eglContext = None
+
+    @classmethod
+    def fromArguments(cls, argv=None):
+        """
+        Reads and removes --headless[=N] and --dump-frames=DIRECTORY from argv
+        (sys.argv by default), so the application arguments keep their positions.
+        The environment variables are used when the options are not given.
+        """
+        argv = sys.argv if argv is None else argv
+
+        frames = os.environ.get(FRAMES_VARIABLE) or None
+        dumpDirectory = os.environ.get(DUMP_VARIABLE) or None
+
+        for argument in list(argv[1:]):
+            if argument == "--headless":
+                frames = DEFAULT_FRAMES
+            elif argument.startswith("--headless="):
+                frames = argument.split("=", 1)[1]
+            elif argument.startswith("--dump-frames="):
+                dumpDirectory = argument.split("=", 1)[1]
+            else:
+                continue
+            argv.remove(argument)
+
+        if dumpDirectory is not None and frames is None:
+            frames = DEFAULT_FRAMES
+
+        return cls(None if frames is None else int(frames), dumpDirectory)
+
+    def backend(self):
+        """"osmesa", "egl" or None for a hidden desktop window"""
+
+        platform = os.environ.get("PYOPENGL_PLATFORM", "")
+        return platform if platform in ("osmesa", "egl") else None
+
+    def init(self):
+        """glfw.init(), without asking for a display if the context does not need one"""
+
+        if self.enabled and self.backend() is not None and hasattr(glfw, "PLATFORM_NULL"):
+            glfw.init_hint(glfw.PLATFORM, glfw.PLATFORM_NULL)
+
+        return glfw.init()
+
+    def createWindow(self, width, height, title):
+        """glfw.create_window, hidden and drawing to a framebuffer object if enabled"""
+
+        if not self.enabled:
+            return glfw.create_window(width, height, title, None, None)
+
+        glfw.window_hint(glfw.VISIBLE, glfw.FALSE)
+        backend = self.backend()
+        if backend == "osmesa":
+            glfw.window_hint(glfw.CONTEXT_CREATION_API, glfw.OSMESA_CONTEXT_API)
+        elif backend == "egl":
+            # GLFW only creates EGL contexts with a window surface, which surfaceless EGL lacks
+            glfw.window_hint(glfw.CLIENT_API, glfw.NO_API)
+
+        window = glfw.create_window(width, height, title, None, None)
+        if not window:
+            return window
+
+        if backend == "egl":
+            self.createEGLContext()
+        else:
+            glfw.make_context_current(window)
+        self.width = width
+        self.height = height
+        self.createFramebuffer()
+
+        if self.dumpDirectory is not None:
+            os.makedirs(self.dumpDirectory, exist_ok=True)
+
+        return window
+
+    def createEGLContext(self):
+        # Imported here, the EGL library is not there on every desktop
+        from OpenGL import EGL
+
+        self.eglDisplay = EGL.eglGetPlatformDisplayEXT(SURFACELESS_PLATFORM, EGL.EGL_DEFAULT_DISPLAY, None)
+        if not self.eglDisplay or not EGL.eglInitialize(self.eglDisplay, None, None):
+            raise RuntimeError("Surfaceless EGL is not available")
+
+        configAttributes = (EGL.EGLint * 5)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        if not EGL.eglChooseConfig(self.eglDisplay, configAttributes, ctypes.pointer(config), 1, ctypes.pointer(count)) \
+                or count.value == 0:
+            raise RuntimeError("No EGL configuration for desktop OpenGL")
+
+        # Compatibility profile, so applications that ask for a core or a legacy context both run
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        contextAttributes = (EGL.EGLint * 7)(EGL.EGL_CONTEXT_MAJOR_VERSION, 4, EGL.EGL_CONTEXT_MINOR_VERSION, 1,
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_COMPATIBILITY_PROFILE_BIT, EGL.EGL_NONE)
+        self.eglContext = EGL.eglCreateContext(self.eglDisplay, config, EGL.EGL_NO_CONTEXT, contextAttributes)
+        if not self.eglContext or not EGL.eglMakeCurrent(self.eglDisplay, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE,
+                self.eglContext):
+            raise RuntimeError("Could not create a surfaceless EGL context")
+
+        # The window has no GLFW context for glfw.make_context_current and glfw.swap_interval
+        reporting = glfw.ERROR_REPORTING
+        reporting = dict(reporting) if isinstance(reporting, dict) else {None: reporting}
+        reporting[glfw.NO_WINDOW_CONTEXT] = "ignore"
+        reporting[glfw.NO_CURRENT_CONTEXT] = "ignore"
+        glfw.ERROR_REPORTING = reporting
+
+    def createFramebuffer(self):
+        # Hidden and null platform windows may have no readable default framebuffer
+        self.renderbuffers = list(glGenRenderbuffers(2))
+        color, depth = self.renderbuffers
+
+        glBindRenderbuffer(GL_RENDERBUFFER, color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, self.width, self.height)
+        glBindRenderbuffer(GL_RENDERBUFFER, depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, self.width, self.height)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, color)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT, GL_RENDERBUFFER, depth)
+
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"Offscreen framebuffer incomplete, status {status}")
+
+        # Stays bound, everything the application draws ends up here
+        glViewport(0, 0, self.width, self.height)
+
+    def shouldClose(self, window):
+        """glfw.window_should_close, also true once every frame was rendered"""
+
+        if self.enabled and self.frame >= self.frames:
+            return True
+        return glfw.window_should_close(window)
+
+    def swapBuffers(self, window):
+        """glfw.swap_buffers, or waits for the frame and saves it if enabled"""
+
+        if not self.enabled:
+            glfw.swap_buffers(window)
+            return
+
+        # Nothing is presented, waiting keeps the frame times honest
+        glFinish()
+        if self.dumpDirectory is not None:
+            self.saveFrame(os.path.join(self.dumpDirectory, f"frame_{self.frame:05d}.png"))
+        self.frame += 1
+
+    def saveFrame(self, path):
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        pixels = glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE)
+
+        # OpenGL rows go from bottom to top
+        image = Image.frombytes("RGBA", (self.width, self.height), pixels)
+        image.transpose(Image.FLIP_TOP_BOTTOM).save(path)
+
+    def clear(self):
+        """Freeing the offscreen framebuffer and the EGL context"""
+
+        if self.fbo is not None:
+            glBindFramebuffer(GL_FRAMEBUFFER, 0)
+            glDeleteFramebuffers(1, [self.fbo])
+            glDeleteRenderbuffers(2, self.renderbuffers)
+            self.fbo = None
+
+        if self.eglContext is not None:
+            from OpenGL import EGL
+            EGL.eglMakeCurrent(self.eglDisplay, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            EGL.eglDestroyContext(self.eglDisplay, self.eglContext)
+            EGL.eglTerminate(self.eglDisplay)
+            self.eglContext = None
+            self.eglDisplay = None
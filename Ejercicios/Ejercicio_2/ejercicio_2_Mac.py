@@ -17,6 +17,11 @@ from OpenGL.GL import *
 import OpenGL.GL.shaders
 import numpy as np
 from gpu_shape import GPUShape, SIZE_IN_BYTES
+import sys
+import os.path
+# El modo sin ventana es el de la copia de grafica del Ejercicio_4
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Ejercicio_4"))
+import grafica.headless as hl
 
 # A class to store the application control
 class Controller:
@@ -489,8 +494,11 @@ def create_street(x0, y0, height):
 
 if __name__ == "__main__":
 
+    # Modo sin ventana: --headless=N dibuja N frames fuera de pantalla y --dump-frames=DIR los guarda en PNG
+    headless = hl.HeadlessMode.fromArguments()
+
     # Initialize glfw
-    if not glfw.init():
+    if not headless.init():
         glfw.set_window_should_close(window, True)
 
     width = 800
@@ -501,7 +509,7 @@ if __name__ == "__main__":
     glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, GL_TRUE)
     glfw.window_hint(glfw.OPENGL_PROFILE,       glfw.OPENGL_CORE_PROFILE)
 
-    window = glfw.create_window(width, height, "Ejercicio: Escena de edificios con montaña de fondo", None, None)
+    window = headless.createWindow(width, height, "Ejercicio: Escena de edificios con montaña de fondo")
 
     if not window:
         glfw.terminate()
@@ -588,7 +596,7 @@ if __name__ == "__main__":
     gpu_mountain.fillBuffers(mountain_shape.vertices, mountain_shape.indices, GL_STATIC_DRAW)
 
 # * Recordar cambiar figuras
-    while not glfw.window_should_close(window):
+    while not headless.shouldClose(window):
         # Using GLFW to check for input events
         glfw.poll_events()
 
@@ -636,7 +644,7 @@ if __name__ == "__main__":
             simplePipeline.drawCall(gpu_building_3)
 
         # Once the render is done, buffers are swapped, showing only the complete scene.
-        glfw.swap_buffers(window)
+        headless.swapBuffers(window)
 
     # freeing GPU memory
     gpu_sky.clear()
@@ -649,4 +657,5 @@ if __name__ == "__main__":
     gpu_building_3.clear()
     gpu_street.clear()
 
+    headless.clear()
     glfw.terminate()
\ No newline at end of file
@@ -17,6 +17,11 @@ from OpenGL.GL import *
 import OpenGL.GL.shaders
 import numpy as np
 from gpu_shape import GPUShape, SIZE_IN_BYTES
+import sys
+import os.path
+# El modo sin ventana es el de la copia de grafica del Ejercicio_4
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Ejercicio_4"))
+import grafica.headless as hl
 
 # A class to store the application control
 class Controller:
@@ -486,17 +491,36 @@ def create_street(x0, y0, height):
 
     return Shape(vertices, indices)
 
+# * Escena estatica
+def merge_shapes(shapes, stride=6):
+    # Junta figuras que no se mueven en una sola, en el mismo orden de dibujo,
+    # para dibujar toda la escena con una unica llamada
+
+    vertices = []
+    indices = []
+
+    for shape in shapes:
+        # Los indices de cada figura se desplazan por los vertices ya agregados
+        offset = len(vertices) // stride
+        vertices += shape.vertices
+        indices += [index + offset for index in shape.indices]
+
+    return Shape(vertices, indices)
+
 
 if __name__ == "__main__":
 
+    # Modo sin ventana: --headless=N dibuja N frames fuera de pantalla y --dump-frames=DIR los guarda en PNG
+    headless = hl.HeadlessMode.fromArguments()
+
     # Initialize glfw
-    if not glfw.init():
+    if not headless.init():
         glfw.set_window_should_close(window, True)
 
     width = 800
     height = 800
 
-    window = glfw.create_window(width, height, "Ejercicio: Escena de edificios con montaña de fondo", None, None)
+    window = headless.createWindow(width, height, "Ejercicio: Escena de edificios con montaña de fondo")
 
     if not window:
         glfw.terminate()
@@ -510,77 +534,33 @@ if __name__ == "__main__":
     # * Creating our shader program and telling OpenGL to use it
     simplePipeline = SimpleShaderProgram()
     NolightPipeline = NolightShaderProgram()
-    inversePipeline = inverseShaderProgram()
+    inversePipeline = InverseShaderProgram()
     
     # Setting up the clear screen color
     glClearColor(0.2, 0.2, 0.2, 1.0)
 
     # * Creating shapes on GPU memory
     sky_shape = create_sky(y0=-0.2, y1=1.0)
-    gpu_sky = GPUShape().initBuffers()
-    simplePipeline.setupVAO(gpu_sky)
-    NolightPipeline.setupVAO(gpu_sky)
-    inversePipeline.setupVAO(gpu_sky)
-    gpu_sky.fillBuffers(sky_shape.vertices, sky_shape.indices, GL_STATIC_DRAW)
-
     ground_shape = create_ground(y0=-1.0, y1=-0.3)
-    gpu_ground = GPUShape().initBuffers()
-    simplePipeline.setupVAO(gpu_ground)
-    NolightPipeline.setupVAO(gpu_ground)
-    inversePipeline.setupVAO(gpu_ground)
-    gpu_ground.fillBuffers(ground_shape.vertices, ground_shape.indices, GL_STATIC_DRAW)
-
     street_shape = create_street(x0=-1.0, y0=-0.9, height=0.4)
-    gpu_street = GPUShape().initBuffers()
-    simplePipeline.setupVAO(gpu_street)
-    NolightPipeline.setupVAO(gpu_street)
-    inversePipeline.setupVAO(gpu_street)
-    gpu_street.fillBuffers(street_shape.vertices, street_shape.indices, GL_STATIC_DRAW)
-
     building_1_shape = create_building(x0=-0.8, y0=-0.3, height=0.7)
-    gpu_building_1 = GPUShape().initBuffers()
-    simplePipeline.setupVAO(gpu_building_1)
-    NolightPipeline.setupVAO(gpu_building_1)
-    inversePipeline.setupVAO(gpu_building_1)
-    gpu_building_1.fillBuffers(building_1_shape.vertices, building_1_shape.indices, GL_STATIC_DRAW)
-
     building_2_shape = create_building(x0=-0.2, y0=-0.3, height=1)
-    gpu_building_2 = GPUShape().initBuffers()
-    simplePipeline.setupVAO(gpu_building_2)
-    NolightPipeline.setupVAO(gpu_building_2)
-    inversePipeline.setupVAO(gpu_building_2)
-    gpu_building_2.fillBuffers(building_2_shape.vertices, building_2_shape.indices, GL_STATIC_DRAW)
-
     building_3_shape = create_building(x0=0.4, y0=-0.3, height=0.5)
-    gpu_building_3 = GPUShape().initBuffers()
-    simplePipeline.setupVAO(gpu_building_3)
-    NolightPipeline.setupVAO(gpu_building_3)
-    inversePipeline.setupVAO(gpu_building_3)
-    gpu_building_3.fillBuffers(building_3_shape.vertices, building_3_shape.indices, GL_STATIC_DRAW)
-
     grass_shape = create_grass(y0=-0.3, y1=0.0)
-    gpu_grass = GPUShape().initBuffers()
-    simplePipeline.setupVAO(gpu_grass)
-    NolightPipeline.setupVAO(gpu_grass)
-    inversePipeline.setupVAO(gpu_grass)
-    gpu_grass.fillBuffers(grass_shape.vertices, grass_shape.indices, GL_STATIC_DRAW)
-
     ovni_shape = create_ovni(x0=-0.8, y0=0.8, width=0.1, height=0.05)
-    gpu_ovni = GPUShape().initBuffers()
-    simplePipeline.setupVAO(gpu_ovni)
-    NolightPipeline.setupVAO(gpu_ovni)
-    inversePipeline.setupVAO(gpu_ovni)
-    gpu_ovni.fillBuffers(ovni_shape.vertices, ovni_shape.indices, GL_STATIC_DRAW)
-
     mountain_shape = create_mountain(x0=-0.5, y0=0.0, width=1, height=0.8)
-    gpu_mountain = GPUShape().initBuffers()
-    simplePipeline.setupVAO(gpu_mountain)
-    NolightPipeline.setupVAO(gpu_mountain)
-    inversePipeline.setupVAO(gpu_mountain)
-    gpu_mountain.fillBuffers(mountain_shape.vertices, mountain_shape.indices, GL_STATIC_DRAW)
+
+    # Ninguna figura se mueve, asi que se juntan en un solo VBO/EBO en el orden en que se dibujaban
+    scene_shape = merge_shapes([sky_shape, ground_shape, street_shape, grass_shape, ovni_shape,
+        mountain_shape, building_1_shape, building_2_shape, building_3_shape])
+    gpu_scene = GPUShape().initBuffers()
+    simplePipeline.setupVAO(gpu_scene)
+    NolightPipeline.setupVAO(gpu_scene)
+    inversePipeline.setupVAO(gpu_scene)
+    gpu_scene.fillBuffers(scene_shape.vertices, scene_shape.indices, GL_STATIC_DRAW)
 
 # * Recordar cambiar figuras
-    while not glfw.window_should_close(window):
+    while not headless.shouldClose(window):
         # Using GLFW to check for input events
         glfw.poll_events()
 
@@ -595,50 +575,19 @@ if __name__ == "__main__":
 
         if (controller.effect1):
             glUseProgram(NolightPipeline.shaderProgram)
-            NolightPipeline.drawCall(gpu_sky)
-            NolightPipeline.drawCall(gpu_ground)
-            NolightPipeline.drawCall(gpu_street)
-            NolightPipeline.drawCall(gpu_grass)
-            NolightPipeline.drawCall(gpu_ovni)
-            NolightPipeline.drawCall(gpu_mountain)
-            NolightPipeline.drawCall(gpu_building_1)
-            NolightPipeline.drawCall(gpu_building_2)
-            NolightPipeline.drawCall(gpu_building_3)
+            NolightPipeline.drawCall(gpu_scene)
         elif (controller.effect2):
             glUseProgram(inversePipeline.shaderProgram)
-            inversePipeline.drawCall(gpu_sky)
-            inversePipeline.drawCall(gpu_ground)
-            inversePipeline.drawCall(gpu_street)
-            inversePipeline.drawCall(gpu_grass)
-            inversePipeline.drawCall(gpu_ovni)
-            inversePipeline.drawCall(gpu_mountain)
-            inversePipeline.drawCall(gpu_building_1)
-            inversePipeline.drawCall(gpu_building_2)
-            inversePipeline.drawCall(gpu_building_3)
+            inversePipeline.drawCall(gpu_scene)
         else:
             glUseProgram(simplePipeline.shaderProgram)
-            simplePipeline.drawCall(gpu_sky)
-            simplePipeline.drawCall(gpu_ground)
-            simplePipeline.drawCall(gpu_street)
-            simplePipeline.drawCall(gpu_grass)
-            simplePipeline.drawCall(gpu_ovni)
-            simplePipeline.drawCall(gpu_mountain)
-            simplePipeline.drawCall(gpu_building_1)
-            simplePipeline.drawCall(gpu_building_2)
-            simplePipeline.drawCall(gpu_building_3)
+            simplePipeline.drawCall(gpu_scene)
 
         # Once the render is done, buffers are swapped, showing only the complete scene.
-        glfw.swap_buffers(window)
+        headless.swapBuffers(window)
 
     # freeing GPU memory
-    gpu_sky.clear()
-    gpu_ground.clear()
-    gpu_grass.clear()
-    gpu_ovni.clear()
-    gpu_mountain.clear()
-    gpu_building_1.clear()
-    gpu_building_2.clear()
-    gpu_building_3.clear()
-    gpu_street.clear()
+    gpu_scene.clear()
 
+    headless.clear()
     glfw.terminate()
\ No newline at end of file
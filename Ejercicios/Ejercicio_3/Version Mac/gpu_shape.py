@@ -42,17 +42,22 @@ class GPUShape:
             "  tex=" + str(self.texture)
 
     def fillBuffers(self, vertices, indices, usage):
+        """
+        Uploads vertices and indices to the GPU.
+        Contiguous float32/uint32 NumPy arrays are passed straight to
+        glBufferData, lists are converted first.
+        """
 
-        vertexData = np.array(vertices, dtype=np.float32)
-        indices = np.array(indices, dtype=np.uint32)
+        vertexData = np.ascontiguousarray(vertices, dtype=np.float32)
+        indices = np.ascontiguousarray(indices, dtype=np.uint32)
 
-        self.size = len(indices)
+        self.size = indices.size
 
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, len(vertexData) * SIZE_IN_BYTES, vertexData, usage)
+        glBufferData(GL_ARRAY_BUFFER, vertexData.nbytes, vertexData, usage)
 
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, len(indices) * SIZE_IN_BYTES, indices, usage)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, usage)
 
     def clear(self):
         """Freeing GPU memory"""
@@ -20,7 +20,7 @@ def merge(destinationShape, strideSize, sourceShape):
     # current vertices are an offset for indices refering to vertices of the new shape
     offset = len(destinationShape.vertices)
     destinationShape.vertices += sourceShape.vertices
-    destinationShape.indices += [(offset/strideSize) + index for index in sourceShape.indices]
+    destinationShape.indices += [(offset//strideSize) + index for index in sourceShape.indices]
 
 
 def applyOffset(shape, stride, offset):
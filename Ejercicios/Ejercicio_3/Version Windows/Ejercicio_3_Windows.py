@@ -12,8 +12,11 @@ import sys
 import os.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import planet_shape as ps
-import easy_shaders_Mac as es
+import easy_shaders_Windows as es
 import transformations as tr
+# El modo sin ventana es el de la copia de grafica del Ejercicio_4
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "Ejercicio_4"))
+import grafica.headless as hl
 import math
 
 __author__ = "Daniel Calderon"
@@ -53,14 +56,17 @@ def on_key(window, key, scancode, action, mods):
 
 if __name__ == "__main__":
 
+    # Modo sin ventana: --headless=N dibuja N frames fuera de pantalla y --dump-frames=DIR los guarda en PNG
+    headless = hl.HeadlessMode.fromArguments()
+
     # Initialize glfw
-    if not glfw.init():
+    if not headless.init():
         glfw.set_window_should_close(window, True)
 
     width = 600
     height = 600
 
-    window = glfw.create_window(width, height, "Ejercicio 3: Movimiento órbitas Tierra y luna", None, None)
+    window = headless.createWindow(width, height, "Ejercicio 3: Movimiento órbitas Tierra y luna")
 
     if not window:
         glfw.terminate()
@@ -128,7 +134,7 @@ if __name__ == "__main__":
     pipeline.setupVAO(gpuLuna)
 
 
-    while not glfw.window_should_close(window):
+    while not headless.shouldClose(window):
         # Using GLFW to check for input events
         glfw.poll_events()
 
@@ -226,7 +232,7 @@ if __name__ == "__main__":
         pipeline.drawCall(gpuLuna)
 
         # Once the drawing is rendered, buffers are swap so an uncomplete drawing is never seen.
-        glfw.swap_buffers(window)
+        headless.swapBuffers(window)
 
     # freeing GPU memory
     gpuTierra.clear()
@@ -237,4 +243,5 @@ if __name__ == "__main__":
     gpuContourSol.clear()
     gpuLuna.clear()
     
+    headless.clear()
     glfw.terminate()
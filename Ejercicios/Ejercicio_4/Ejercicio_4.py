@@ -9,6 +9,7 @@ import sys, os.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from grafica.gpu_shape import GPUShape, SIZE_IN_BYTES
 import grafica.transformations as tr
+import grafica.headless as hl
 import grafica.basic_shapes as bs
 import grafica.easy_shaders as es
 from PIL import Image
@@ -65,8 +66,11 @@ def on_key(window, key, scancode, action, mods):
 
 
 if __name__ == "__main__":
+    # Modo sin ventana: --headless=N dibuja N frames fuera de pantalla y --dump-frames=DIR los guarda en PNG
+    headless = hl.HeadlessMode.fromArguments()
+
     # Initialize glfw
-    if not glfw.init():
+    if not headless.init():
         glfw.set_window_should_close(window, True)
 
     width = 600
@@ -77,7 +81,7 @@ if __name__ == "__main__":
     glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, GL_TRUE)
     glfw.window_hint(glfw.OPENGL_PROFILE,       glfw.OPENGL_CORE_PROFILE)
 
-    window = glfw.create_window(width, height, "Ejercicio 4: Caballero bajo la lluvia", None, None)
+    window = headless.createWindow(width, height, "Ejercicio 4: Caballero bajo la lluvia")
 
     if not window:
         glfw.terminate()
@@ -161,7 +165,7 @@ if __name__ == "__main__":
 
 #######################################################################################################    
 
-    while not glfw.window_should_close(window):
+    while not headless.shouldClose(window):
         # Using GLFW to check for input events
         glfw.poll_events()
 
@@ -243,10 +247,11 @@ if __name__ == "__main__":
 ##############################################################################################################################
 
         # Once the render is done, buffers are swapped, showing only the complete scene.
-        glfw.swap_buffers(window)
+        headless.swapBuffers(window)
 
     # freeing GPU memory
     gpuKnight.clear()
     gpuRain.clear()
     gpuBackground.clear()
+    headless.clear()
     glfw.terminate()
@@ -6,6 +6,7 @@ import numpy as np
 import grafica.basic_shapes as bs
 import grafica.easy_shaders as es
 import grafica.transformations as tr
+import grafica.headless as hl
 import grafica.performance_monitor as pm
 import grafica.scene_graph as sg
 from shapes import *
@@ -75,8 +76,11 @@ def on_key(window, key, scancode, action, mods):
 
 if __name__ == "__main__":
 
+    # Modo sin ventana: --headless=N dibuja N frames fuera de pantalla y --dump-frames=DIR los guarda en PNG
+    headless = hl.HeadlessMode.fromArguments()
+
     # Initialize glfw
-    if not glfw.init():
+    if not headless.init():
         glfw.set_window_should_close(window, True)
 
     # Creating a glfw window
@@ -87,7 +91,7 @@ if __name__ == "__main__":
     glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 1)
     glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, GL_TRUE)
     glfw.window_hint(glfw.OPENGL_PROFILE,       glfw.OPENGL_CORE_PROFILE)
-    window = glfw.create_window(width, height, title, None, None)
+    window = headless.createWindow(width, height, title)
 
     if not window:
         glfw.terminate()
@@ -180,7 +184,7 @@ if __name__ == "__main__":
     t0 = glfw.get_time()
 
     # Application loop
-    while not glfw.window_should_close(window):
+    while not headless.shouldClose(window):
         # Variables del tiempo
         t1 = glfw.get_time()
         delta = t1 -t0
@@ -250,10 +254,11 @@ if __name__ == "__main__":
         sg.drawSceneGraphNode(tex_scene, tex_pipeline, "transform")
 
         # Once the drawing is rendered, buffers are swap so an uncomplete drawing is never seen.
-        glfw.swap_buffers(window)
+        headless.swapBuffers(window)
 
     # freeing GPU memory
     mainScene.clear()
     tex_scene.clear()
 
+    headless.clear()
     glfw.terminate()
\ No newline at end of file
@@ -3,6 +3,7 @@
 """Vertices and indices for a variety of simple shapes"""
 
 import math
+import numpy as np
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
@@ -15,16 +16,117 @@ class Shape:
         self.textureFileName = textureFileName
 
 
+class VertexLayout:
+    """
+    Describes how the attributes of each vertex are packed in a vertex buffer.
+    Attributes are given in buffer order as (name, number of floats) pairs.
+    """
+    def __init__(self, *attributes):
+        self.attributes = list(attributes)
+        self.offsets = {}
+
+        offset = 0
+        for name, size in self.attributes:
+            self.offsets[name] = (offset, size)
+            offset += size
+
+        # stride measured in floats, as the strideSize used by merge
+        self.stride = offset
+
+    def slice(self, name):
+        offset, size = self.offsets[name]
+        return slice(offset, offset + size)
+
+    def __eq__(self, other):
+        return isinstance(other, VertexLayout) and self.attributes == other.attributes
+
+    def __hash__(self):
+        return hash(tuple(self.attributes))
+
+    def __str__(self):
+        return "VertexLayout(" + ", ".join(name + ":" + str(size) for name, size in self.attributes) + ")"
+
+
+# Layouts used by the pipelines in easy_shaders
+COLOR_LAYOUT = VertexLayout(("position", 3), ("color", 3))
+TEXTURE_LAYOUT = VertexLayout(("position", 3), ("texCoords", 2))
+COLOR_NORMAL_LAYOUT = VertexLayout(("position", 3), ("color", 3), ("normal", 3))
+TEXTURE_NORMAL_LAYOUT = VertexLayout(("position", 3), ("texCoords", 2), ("normal", 3))
+
+
+class ArrayShape(Shape):
+    """
+    A Shape backed by contiguous NumPy arrays.
+    vertexData has one row per vertex and layout.stride float32 columns,
+    indices is a flat uint32 array. Both can be uploaded without copies.
+    """
+    def __init__(self, vertexData, indices, layout, textureFileName=None):
+        self.layout = layout
+        self.vertexData = np.ascontiguousarray(vertexData, dtype=np.float32).reshape(-1, layout.stride)
+        self.indices = np.ascontiguousarray(indices, dtype=np.uint32).reshape(-1)
+        self.textureFileName = textureFileName
+
+    @property
+    def vertices(self):
+        # Flat view over the same memory, as expected by GPUShape.fillBuffers
+        return self.vertexData.reshape(-1)
+
+    def attribute(self, name):
+        """Writable view over the columns of an attribute, one row per vertex"""
+        return self.vertexData[:, self.layout.slice(name)]
+
+    def numberOfVertices(self):
+        return self.vertexData.shape[0]
+
+
+def toArrayShape(shape, layout):
+    """Converts a list based Shape to an ArrayShape with the given layout"""
+
+    if isinstance(shape, ArrayShape):
+        assert shape.layout == layout
+        return shape
+
+    return ArrayShape(shape.vertices, shape.indices, layout, shape.textureFileName)
+
+
+def mergeShapes(shapes):
+    """
+    Merges several ArrayShapes sharing a layout into a new ArrayShape
+    with a single concatenation of vertices and indices.
+    """
+    layout = shapes[0].layout
+    assert all(shape.layout == layout for shape in shapes)
+
+    vertexCounts = np.array([shape.numberOfVertices() for shape in shapes], dtype=np.uint32)
+    offsets = np.concatenate([[0], np.cumsum(vertexCounts)[:-1]]).astype(np.uint32)
+    indexCounts = [len(shape.indices) for shape in shapes]
+
+    vertexData = np.concatenate([shape.vertexData for shape in shapes])
+    indices = np.concatenate([shape.indices for shape in shapes]) + np.repeat(offsets, indexCounts)
+
+    return ArrayShape(vertexData, indices, layout, shapes[0].textureFileName)
+
+
 def merge(destinationShape, strideSize, sourceShape):
 
+    if isinstance(destinationShape, ArrayShape):
+        merged = mergeShapes([destinationShape, toArrayShape(sourceShape, destinationShape.layout)])
+        destinationShape.vertexData = merged.vertexData
+        destinationShape.indices = merged.indices
+        return
+
     # current vertices are an offset for indices refering to vertices of the new shape
     offset = len(destinationShape.vertices)
     destinationShape.vertices += sourceShape.vertices
-    destinationShape.indices += [(offset/strideSize) + index for index in sourceShape.indices]
+    destinationShape.indices += [(offset//strideSize) + index for index in sourceShape.indices]
 
 
 def applyOffset(shape, stride, offset):
 
+    if isinstance(shape, ArrayShape):
+        shape.vertexData[:, 0:3] += np.asarray(offset, dtype=np.float32)
+        return
+
     numberOfVertices = len(shape.vertices)//stride
 
     for i in range(numberOfVertices):
@@ -36,6 +138,10 @@ def applyOffset(shape, stride, offset):
 
 def scaleVertices(shape, stride, scaleFactor):
 
+    if isinstance(shape, ArrayShape):
+        shape.vertexData[:, 0:3] *= np.asarray(scaleFactor, dtype=np.float32)
+        return
+
     numberOfVertices = len(shape.vertices) // stride
 
     for i in range(numberOfVertices):
@@ -45,6 +151,24 @@ def scaleVertices(shape, stride, scaleFactor):
         shape.vertices[index + 2] *= scaleFactor[2]
 
 
+def transformVertices(shape, transform):
+    """
+    Applies a 4x4 transform in place to the positions of an ArrayShape.
+    Normals, if present, are transformed with the inverse transpose and normalized.
+    """
+    assert isinstance(shape, ArrayShape)
+
+    transform = np.asarray(transform, dtype=np.float32)
+    positions = shape.attribute("position")
+    positions[:] = positions @ transform[:3, :3].T + transform[:3, 3]
+
+    if "normal" in shape.layout.offsets:
+        normals = shape.attribute("normal")
+        normals[:] = normals @ np.linalg.inv(transform[:3, :3])
+        norm = np.linalg.norm(normals, axis=1, keepdims=True)
+        np.divide(normals, norm, out=normals, where=norm > 0)
+
+
 def createAxis(length=1.0):
 
     # Defining the location and colors of each vertex  of the shape
@@ -11,18 +11,169 @@ __author__ = "Daniel Calderon"
 __license__ = "MIT"
 
 
+class ChildList(list):
+    """
+    List of childs of a SceneGraphNode.
+    Every change goes through the owner, which keeps parent pointers and
+    name indices up to date. Node names must not change once added.
+    """
+    def __init__(self, owner, childs=()):
+        super().__init__()
+        self.owner = owner
+        self.extend(childs)
+
+    def append(self, child):
+        self.owner.attach(child)
+        super().append(child)
+
+    def insert(self, position, child):
+        self.owner.attach(child)
+        super().insert(position, child)
+
+    def extend(self, childs):
+        for child in list(childs):
+            self.append(child)
+
+    def __iadd__(self, childs):
+        self.extend(childs)
+        return self
+
+    def remove(self, child):
+        super().remove(child)
+        self.owner.detach(child)
+
+    def pop(self, position=-1):
+        child = super().pop(position)
+        self.owner.detach(child)
+        return child
+
+    def clear(self):
+        while len(self) > 0:
+            self.pop()
+
+    def __setitem__(self, position, child):
+        if isinstance(position, slice):
+            raise TypeError("Slice assignment is not supported on scene graph childs")
+        self.owner.attach(child)
+        self.owner.detach(self[position])
+        super().__setitem__(position, child)
+
+    def __delitem__(self, position):
+        if isinstance(position, slice):
+            raise TypeError("Slice deletion is not supported on scene graph childs")
+        self.pop(position)
+
+
 class SceneGraphNode:
     """
     A simple class to handle a scene graph
     Each node represents a group of objects
     Each leaf represents a basic figure (GPUShape)
     To identify each node properly, it MUST have a unique name
+
+    Every node indexes the names of its subtree, so findNode takes constant
+    time, and knows its parents. Adding a node whose name is already used by
+    a different node of the graph raises ValueError.
+
+    Keeping the index up to date is what adding and removing cost: every
+    distinct ancestor updates one entry per name of the moved subtree, so a
+    subtree of k names under a tree of depth d takes O(d * k). Removing also
+    searches the childs of the parent, O(siblings), since their order is the
+    drawing order.
     """
     def __init__(self, name):
         self.name = name
         self.transform = tr.identity()
+        self.parents = []
+
+        # name -> [node, number of paths from this node to it]
+        self.index = {name: [self, 1]}
         self.childs = []
 
+    def __setattr__(self, name, value):
+        # Assigned childs go through the index, reading them is a plain attribute access
+        if name == "childs":
+            value = self.replaceChilds(value)
+        super().__setattr__(name, value)
+
+    def replaceChilds(self, childs):
+        current = self.__dict__.get("childs")
+
+        # node.childs += [...] extends the list in place and assigns it back
+        if current is childs:
+            return childs
+
+        if current is not None:
+            current.clear()
+        return ChildList(self, childs)
+
+    @property
+    def parent(self):
+        """First parent of the node, None for a root"""
+        return self.parents[0] if len(self.parents) > 0 else None
+
+    def ancestors(self):
+        """This node and its ancestors, once for each path reaching them"""
+
+        yield self
+        for parent in self.parents:
+            yield from parent.ancestors()
+
+    def ancestorPaths(self):
+        """This node and each of its distinct ancestors, with the number of paths reaching it"""
+
+        counts = {}
+        for ancestor in self.ancestors():
+            entry = counts.setdefault(id(ancestor), [ancestor, 0])
+            entry[1] += 1
+        return list(counts.values())
+
+    def attach(self, child):
+        """Registers the names of a new child subtree in this node and its ancestors"""
+
+        if not isinstance(child, SceneGraphNode):
+            return
+
+        ancestors = self.ancestorPaths()
+        if any(ancestor is child for ancestor, _ in ancestors):
+            raise ValueError("A scene graph node can not be its own descendant: " + str(child.name))
+
+        # Checked before changing anything, so a failed add leaves the graph as it was
+        for ancestor, _ in ancestors:
+            for name, (node, _) in child.index.items():
+                entry = ancestor.index.get(name)
+                if entry is not None and entry[0] is not node:
+                    raise ValueError("Duplicated scene graph node name: " + str(name))
+
+        # An ancestor reached by several paths reaches the subtree through each of them
+        for ancestor, count in ancestors:
+            for name, (node, paths) in child.index.items():
+                entry = ancestor.index.setdefault(name, [node, 0])
+                entry[1] += count * paths
+
+        child.parents.append(self)
+
+    def detach(self, child):
+        """Removes the names of a removed child subtree from this node and its ancestors"""
+
+        if not isinstance(child, SceneGraphNode):
+            return
+
+        for ancestor, count in self.ancestorPaths():
+            for name, (_, paths) in child.index.items():
+                entry = ancestor.index[name]
+                entry[1] -= count * paths
+                if entry[1] == 0:
+                    del ancestor.index[name]
+
+        child.parents.remove(self)
+
+    def remove(self):
+        """Takes this node out of every parent"""
+
+        for parent in list(self.parents):
+            parent.childs.remove(self)
+
     def clear(self):
         """Freeing GPU memory"""
 
@@ -36,18 +187,9 @@ def findNode(node, name):
     if isinstance(node, gs.GPUShape):
         return None
 
-    # This is the requested node
-    if node.name == name:
-        return node
-    
-    # All childs are checked for the requested name
-    for child in node.childs:
-        foundNode = findNode(child, name)
-        if foundNode != None:
-            return foundNode
-
-    # No child of this node had the requested name
-    return None
+    # Every node indexes the names of its subtree
+    entry = node.index.get(name)
+    return None if entry is None else entry[0]
 
 
 def findTransform(node, name, parentTransform=tr.identity()):
@@ -9,6 +9,7 @@ import sys
 import os.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import grafica.transformations as tr
+import grafica.headless as hl
 import grafica.basic_shapes as bs
 import grafica.easy_shaders as es
 import grafica.scene_graph as sg
@@ -344,8 +345,11 @@ def on_key(window, key, scancode, action, mods):
 
 if __name__ == "__main__":
 
+    # Modo sin ventana: --headless=N dibuja N frames fuera de pantalla y --dump-frames=DIR los guarda en PNG
+    headless = hl.HeadlessMode.fromArguments()
+
     # Initialize glfw
-    if not glfw.init():
+    if not headless.init():
         glfw.set_window_should_close(window, True)
 
     width = 600
@@ -357,7 +361,7 @@ if __name__ == "__main__":
     glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
 
 
-    window = glfw.create_window(width, height, "Ejercicio 6: Rio y bote", None, None)
+    window = headless.createWindow(width, height, "Ejercicio 6: Rio y bote")
 
     if not window:
         glfw.terminate()
@@ -395,7 +399,7 @@ if __name__ == "__main__":
     # View and projection
     projection = tr.perspective(60, float(width)/float(height), 0.1, 100)
 
-    while not glfw.window_should_close(window):
+    while not headless.shouldClose(window):
         # Using GLFW to check for input events
         glfw.poll_events()
 
@@ -446,6 +450,7 @@ if __name__ == "__main__":
         sg.drawSceneGraphNode(floor, textureShaderProgram, "model")       
 
         # Once the drawing is rendered, buffers are swap so an uncomplete drawing is never seen.
-        glfw.swap_buffers(window)
+        headless.swapBuffers(window)
 
+    headless.clear()
     glfw.terminate()
@@ -22,6 +22,13 @@ class GPUShape:
         self.texture = None
         self.size = None
 
+        # Copy of the data sent by fillBuffers, used to bake static batches
+        self.vertexData = None
+        self.indexData = None
+
+        # ResourceRegistry owning the vbo, ebo and texture, if they are shared
+        self.registry = None
+
     def initBuffers(self):
         """Convenience function for initialization of OpenGL buffers.
         It returns itself to enable the convenience call:
@@ -42,30 +49,49 @@ class GPUShape:
             "  tex=" + str(self.texture)
 
     def fillBuffers(self, vertices, indices, usage):
+        """
+        Uploads vertices and indices to the GPU.
+        Contiguous float32/uint32 NumPy arrays are passed straight to
+        glBufferData, lists are converted first.
+        """
 
-        vertexData = np.array(vertices, dtype=np.float32)
-        indices = np.array(indices, dtype=np.uint32)
+        vertexData = np.ascontiguousarray(vertices, dtype=np.float32)
+        indices = np.ascontiguousarray(indices, dtype=np.uint32)
 
-        self.size = len(indices)
+        self.size = indices.size
+        self.vertexData = vertexData
+        self.indexData = indices
 
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, len(vertexData) * SIZE_IN_BYTES, vertexData, usage)
+        glBufferData(GL_ARRAY_BUFFER, vertexData.nbytes, vertexData, usage)
 
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, len(indices) * SIZE_IN_BYTES, indices, usage)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, usage)
 
     def clear(self):
-        """Freeing GPU memory"""
+        """Freeing GPU memory.
+        Handles are reset, so clearing a shape reachable from several nodes
+        of a scene graph deletes its buffers only once.
+        """
 
-        if self.texture != None:
-            glDeleteTextures(1, [self.texture])
-        
-        if self.ebo != None:
-            glDeleteBuffers(1, [self.ebo])
+        if self.registry is not None:
+            self.registry.release(self)
+
+        else:
+            if self.texture != None:
+                glDeleteTextures(1, [self.texture])
 
-        if self.vbo != None:
-            glDeleteBuffers(1, [self.vbo])
+            if self.ebo != None:
+                glDeleteBuffers(1, [self.ebo])
+
+            if self.vbo != None:
+                glDeleteBuffers(1, [self.vbo])
 
         if self.vao != None:
             glDeleteVertexArrays(1, [self.vao])
-        
\ No newline at end of file
+
+        self.vao = None
+        self.vbo = None
+        self.ebo = None
+        self.texture = None
+        self.registry = None
@@ -0,0 +1,197 @@
+# coding=utf-8
+"""Instanced draw calls: many copies of a GPUShape, one model matrix each, in a single call"""
+
+from OpenGL.GL import *
+import numpy as np
+import grafica.gpu_shape as gs
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+# Per instance model matrix of the pipelines supporting instancing, read
+# instead of the model uniform while the "instanced" uniform is true
+INSTANCE_ATTRIBUTE = "instanceModel"
+
+# Shapes sharing buffers and texture are instanced from this many copies on
+MIN_INSTANCES = 2
+
+
+def instanceKey(gpuShape):
+    """GPUShapes with the same key can be drawn by a single instanced call"""
+    return (gpuShape.vbo, gpuShape.ebo, gpuShape.size, gpuShape.texture)
+
+
+class InstancedShape:
+    """
+    VAO reading the vertex buffers and texture of a GPUShape, plus a buffer
+    with one model matrix per instance.
+    """
+    def __init__(self, pipeline, gpuShape):
+        self.shape = gs.GPUShape()
+        self.shape.vao = glGenVertexArrays(1)
+        self.shape.vbo = gpuShape.vbo
+        self.shape.ebo = gpuShape.ebo
+        self.shape.size = gpuShape.size
+        self.shape.texture = gpuShape.texture
+        pipeline.setupVAO(self.shape)
+
+        self.instanceVbo = glGenBuffers(1)
+        self.count = 0
+
+        glBindVertexArray(self.shape.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instanceVbo)
+
+        # A mat4 attribute takes 4 locations, one per column, advanced once per instance
+        location = pipeline.instanceLocation
+        for column in range(4):
+            glVertexAttribPointer(location + column, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(16 * column))
+            glEnableVertexAttribArray(location + column)
+            glVertexAttribDivisor(location + column, 1)
+
+        glBindVertexArray(0)
+
+    def upload(self, transforms):
+        """Sends a list or (N, 4, 4) array of row major matrices"""
+
+        # Transposed, so every column is contiguous as the attribute expects
+        matrices = np.asarray(transforms, dtype=np.float32).reshape(-1, 4, 4)
+        data = np.ascontiguousarray(np.transpose(matrices, (0, 2, 1)))
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.instanceVbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STREAM_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.count = len(matrices)
+
+    def clear(self):
+        """Freeing the VAO and instance buffer, the vertex buffers belong to the GPUShape"""
+        glDeleteBuffers(1, [self.instanceVbo])
+        glDeleteVertexArrays(1, [self.shape.vao])
+
+
+class InstancedShaderProgram:
+    """
+    Base class of the pipelines that can draw many copies of a shape at once.
+    Only pipelines whose vertex shader declares the instanceModel attribute
+    and the "instanced" uniform use instanced calls, the others draw the
+    shapes one by one.
+    """
+
+    @property
+    def instanceLocation(self):
+        # Queried once, after the program is linked
+        if getattr(self, "_instanceLocation", None) is None:
+            self._instanceLocation = glGetAttribLocation(self.shaderProgram, INSTANCE_ATTRIBUTE)
+            self.instancedShapes = {}
+        return self._instanceLocation
+
+    def supportsInstancing(self):
+        return self.instanceLocation >= 0
+
+    def drawInstanced(self, gpuShape, transforms, mode=GL_TRIANGLES):
+        """
+        Draws gpuShape once per matrix in transforms with a single draw call.
+        The instanced VAO is built on first use, for the buffers the shape
+        has at that moment.
+        """
+        if not self.supportsInstancing():
+            raise ValueError(type(self).__name__ + " does not support instancing")
+
+        key = instanceKey(gpuShape)
+        instanced = self.instancedShapes.get(key)
+        if instanced is None:
+            instanced = InstancedShape(self, gpuShape)
+            self.instancedShapes[key] = instanced
+
+        instanced.upload(transforms)
+
+        instancedFlag = glGetUniformLocation(self.shaderProgram, "instanced")
+        glUniform1i(instancedFlag, 1)
+        glBindVertexArray(instanced.shape.vao)
+        if gpuShape.texture is not None:
+            glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
+
+        glDrawElementsInstanced(mode, gpuShape.size, GL_UNSIGNED_INT, None, instanced.count)
+
+        glBindVertexArray(0)
+        glUniform1i(instancedFlag, 0)
+
+    def drawShapes(self, gpuShapes, transforms, transformName, mode=GL_TRIANGLES, ordered=True):
+        """
+        Draws every GPUShape with its transform. If the pipeline supports
+        instancing, shapes sharing buffers and texture take one draw call:
+        only consecutive ones while ordered, so blending sees the same order,
+        or all of them otherwise, for depth tested opaque shapes.
+        """
+        if not self.supportsInstancing():
+            for gpuShape, transform in zip(gpuShapes, transforms):
+                self.drawTransformed(gpuShape, transform, transformName, mode)
+            return
+
+        runs = []
+        groups = {}
+        for gpuShape, transform in zip(gpuShapes, transforms):
+            key = instanceKey(gpuShape)
+            if ordered and runs and runs[-1][0] == key:
+                runs[-1][1].append((gpuShape, transform))
+            elif not ordered and key in groups:
+                groups[key].append((gpuShape, transform))
+            else:
+                runs.append((key, [(gpuShape, transform)]))
+                groups[key] = runs[-1][1]
+
+        for _, run in runs:
+            if len(run) >= MIN_INSTANCES:
+                self.drawInstanced(run[0][0], [transform for _, transform in run], mode)
+                continue
+
+            for gpuShape, transform in run:
+                self.drawTransformed(gpuShape, transform, transformName, mode)
+
+    def drawTransformed(self, gpuShape, transform, transformName, mode=GL_TRIANGLES):
+        glUniformMatrix4fv(glGetUniformLocation(self.shaderProgram, transformName), 1, GL_TRUE, transform)
+        self.drawCall(gpuShape, mode)
+
+    def clearInstancing(self):
+        """Freeing the VAOs and buffers created by drawInstanced"""
+
+        for instanced in getattr(self, "instancedShapes", {}).values():
+            instanced.clear()
+        self.instancedShapes = {}
+
+
+class InstancedBatch:
+    """
+    A subtree of a scene graph drawn with one instanced call per shape.
+
+    Leaves are collected again on every draw, so transforms below the node can
+    change every frame without baking anything, but they are grouped by shape
+    instead of following the graph: different shapes in the subtree must not
+    rely on being drawn in a given order.
+    """
+    def __init__(self, node):
+        self.node = node
+        node.batch = self
+
+    def collect(self, node, transform, gpuShapes, transforms):
+        if not node.enabled:
+            return
+
+        if len(node.childs) == 1 and isinstance(node.childs[0], gs.GPUShape):
+            gpuShapes.append(node.childs[0])
+            transforms.append(transform)
+            return
+
+        for child in node.childs:
+            self.collect(child, np.matmul(transform, child.transform), gpuShapes, transforms)
+
+    def draw(self, pipeline, transformName, transform, mode=GL_TRIANGLES):
+        """Draws the subtree, transform is the world transform of the batched node"""
+
+        gpuShapes = []
+        transforms = []
+        self.collect(self.node, transform, gpuShapes, transforms)
+        pipeline.drawShapes(gpuShapes, transforms, transformName, mode, ordered=False)
+
+    def clear(self):
+        """The instanced VAOs belong to the pipelines, see clearInstancing"""
+        self.node.batch = None
@@ -0,0 +1,214 @@
+# coding=utf-8
+"""Reference counted textures and vertex buffers shared among GPUShapes"""
+
+import os.path
+import hashlib
+from collections import OrderedDict
+from OpenGL.GL import *
+import numpy as np
+
+import grafica.shaders as es
+from grafica.gpu_shape import GPUShape
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+# Environment variable making the applications print report() once their resources are loaded
+ENVIRONMENT_VARIABLE = "RESOURCE_REPORT"
+
+
+class TextureResource:
+    def __init__(self, key, texture, bytes):
+        self.key = key
+        self.texture = texture
+        self.bytes = bytes
+        self.refCount = 0
+
+
+class BufferResource:
+    def __init__(self, key, vbo, ebo, size, bytes, vertexData, indexData):
+        self.key = key
+        self.vbo = vbo
+        self.ebo = ebo
+        self.size = size
+        self.bytes = bytes
+        self.refCount = 0
+
+        # Kept for the shapes handed out, static batches bake them
+        self.vertexData = vertexData
+        self.indexData = indexData
+
+
+def boundTextureBytes():
+    """Estimates the VRAM used by the base level of the currently bound 2D texture"""
+
+    width = glGetTexLevelParameteriv(GL_TEXTURE_2D, 0, GL_TEXTURE_WIDTH)
+    height = glGetTexLevelParameteriv(GL_TEXTURE_2D, 0, GL_TEXTURE_HEIGHT)
+    internalFormat = glGetTexLevelParameteriv(GL_TEXTURE_2D, 0, GL_TEXTURE_INTERNAL_FORMAT)
+    channels = 4 if internalFormat in (GL_RGBA, GL_RGBA8) else 3
+    return int(width) * int(height) * channels
+
+
+def reportRequested():
+    """True if the environment variable RESOURCE_REPORT is set (and not "0")"""
+    return os.environ.get(ENVIRONMENT_VARIABLE, "0") not in ("", "0")
+
+
+class ResourceRegistry:
+    """
+    Hands out shared textures and vertex buffers with reference counts.
+
+    Textures are keyed by image path and wrap/filter parameters, vertex buffers
+    by a hash of their content. GPUShapes created with createGPUShape give their
+    references back when cleared, and GPU memory is freed with the last one.
+
+    If maxTextureBytes is set, textures nobody references anymore stay loaded
+    (so loading them again is free) until the budget is exceeded, then the least
+    recently used ones are deleted.
+    """
+    def __init__(self, maxTextureBytes=None):
+        self.maxTextureBytes = maxTextureBytes
+        self.textures = OrderedDict()     # key -> TextureResource, in least recently used order
+        self.texturesById = {}
+        self.buffers = {}                 # key -> BufferResource
+        self.buffersByVbo = {}
+
+    def acquireTexture(self, path, sWrapMode=GL_CLAMP_TO_EDGE, tWrapMode=GL_CLAMP_TO_EDGE,
+                       minFilterMode=GL_NEAREST, maxFilterMode=GL_NEAREST):
+        key = (os.path.abspath(path), int(sWrapMode), int(tWrapMode), int(minFilterMode), int(maxFilterMode))
+
+        resource = self.textures.get(key)
+        if resource is None:
+            texture = es.textureSimpleSetup(path, sWrapMode, tWrapMode, minFilterMode, maxFilterMode)
+            resource = TextureResource(key, texture, boundTextureBytes())
+            self.textures[key] = resource
+            self.texturesById[texture] = resource
+
+        resource.refCount += 1
+        self.textures.move_to_end(key)
+
+        # A new texture may take the registry over budget, the unreferenced ones make room
+        self.evictTextures()
+        return resource.texture
+
+    def releaseTexture(self, texture):
+        resource = self.texturesById[texture]
+        resource.refCount -= 1
+
+        if resource.refCount == 0 and self.maxTextureBytes is None:
+            self.deleteTexture(resource)
+
+        self.evictTextures()
+
+    def deleteTexture(self, resource):
+        glDeleteTextures(1, [resource.texture])
+        del self.textures[resource.key]
+        del self.texturesById[resource.texture]
+
+    def evictTextures(self):
+        if self.maxTextureBytes is None:
+            return
+
+        for resource in list(self.textures.values()):
+            if self.textureBytes() <= self.maxTextureBytes:
+                break
+            if resource.refCount == 0:
+                self.deleteTexture(resource)
+
+    def acquireBuffers(self, vertices, indices, usage=GL_STATIC_DRAW):
+        vertexData = np.ascontiguousarray(vertices, dtype=np.float32)
+        indexData = np.ascontiguousarray(indices, dtype=np.uint32)
+
+        digest = hashlib.sha1(vertexData.tobytes())
+        digest.update(indexData.tobytes())
+        key = (digest.hexdigest(), int(usage))
+
+        resource = self.buffers.get(key)
+        if resource is None:
+            uploader = GPUShape()
+            uploader.vbo = glGenBuffers(1)
+            uploader.ebo = glGenBuffers(1)
+            uploader.fillBuffers(vertexData, indexData, usage)
+
+            resource = BufferResource(key, uploader.vbo, uploader.ebo, uploader.size,
+                vertexData.nbytes + indexData.nbytes, uploader.vertexData, uploader.indexData)
+            self.buffers[key] = resource
+            self.buffersByVbo[resource.vbo] = resource
+
+        resource.refCount += 1
+        return resource
+
+    def releaseBuffers(self, vbo):
+        resource = self.buffersByVbo[vbo]
+        resource.refCount -= 1
+
+        if resource.refCount == 0:
+            glDeleteBuffers(1, [resource.ebo])
+            glDeleteBuffers(1, [resource.vbo])
+            del self.buffers[resource.key]
+            del self.buffersByVbo[vbo]
+
+    def createGPUShape(self, pipeline, shape, usage=GL_STATIC_DRAW, texturePath=None,
+                       wrapMode=GL_CLAMP_TO_EDGE, filterMode=GL_NEAREST):
+        """
+        GPUShape with its own VAO over shared vertex buffers and texture.
+        Calling clear() on it releases the shared resources.
+        """
+        buffers = self.acquireBuffers(shape.vertices, shape.indices, usage)
+
+        gpuShape = GPUShape()
+        gpuShape.vao = glGenVertexArrays(1)
+        gpuShape.vbo = buffers.vbo
+        gpuShape.ebo = buffers.ebo
+        gpuShape.size = buffers.size
+        gpuShape.vertexData = buffers.vertexData
+        gpuShape.indexData = buffers.indexData
+        gpuShape.registry = self
+        pipeline.setupVAO(gpuShape)
+
+        if texturePath is not None:
+            gpuShape.texture = self.acquireTexture(texturePath, wrapMode, wrapMode, filterMode, filterMode)
+
+        return gpuShape
+
+    def release(self, gpuShape):
+        """Gives back the resources referenced by a GPUShape created by this registry"""
+
+        if gpuShape.texture is not None:
+            self.releaseTexture(gpuShape.texture)
+
+        if gpuShape.vbo is not None:
+            self.releaseBuffers(gpuShape.vbo)
+
+    def clear(self):
+        """Frees every resource, even if still referenced"""
+
+        for resource in list(self.textures.values()):
+            self.deleteTexture(resource)
+
+        for resource in list(self.buffers.values()):
+            glDeleteBuffers(1, [resource.ebo])
+            glDeleteBuffers(1, [resource.vbo])
+        self.buffers.clear()
+        self.buffersByVbo.clear()
+
+    def textureBytes(self):
+        return sum(resource.bytes for resource in self.textures.values())
+
+    def bufferBytes(self):
+        return sum(resource.bytes for resource in self.buffers.values())
+
+    def report(self):
+        """VRAM bytes and reference count held by every resource"""
+
+        lines = []
+        for resource in self.textures.values():
+            lines += [f"texture {os.path.basename(resource.key[0])}: {resource.bytes} bytes, {resource.refCount} refs"]
+        for resource in self.buffers.values():
+            lines += [f"buffers {resource.key[0][:8]}: {resource.bytes} bytes, {resource.refCount} refs"]
+        lines += [f"total: {self.textureBytes()} bytes in textures, {self.bufferBytes()} bytes in buffers"]
+        return "\n".join(lines)
+
+    def __str__(self):
+        return f"ResourceRegistry [{len(self.textures)} textures - {len(self.buffers)} buffers - " +\
+            f"{self.textureBytes() + self.bufferBytes()} bytes]"
@@ -7,6 +7,7 @@ import numpy as np
 from PIL import Image
 
 from grafica.gpu_shape import GPUShape
+from grafica.instancing import InstancedShaderProgram
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
@@ -48,7 +49,7 @@ def textureSimpleSetup(imgName, sWrapMode, tWrapMode, minFilterMode, maxFilterMo
     return texture
 
 
-class SimpleTransformShaderProgram:
+class SimpleTransformShaderProgram(InstancedShaderProgram):
 
     def __init__(self):
 
@@ -56,6 +57,10 @@ class SimpleTransformShaderProgram:
             #version 410
             uniform mat4 transform;
 
+            // Read instead of transform by instanced draw calls
+            uniform bool instanced;
+            in mat4 instanceModel;
+
             in vec3 position;
             in vec3 color;
 
@@ -63,7 +68,7 @@ class SimpleTransformShaderProgram:
 
             void main()
             {
-                gl_Position = transform * vec4(position, 1.0f);
+                gl_Position = (instanced ? instanceModel : transform) * vec4(position, 1.0f);
                 newColor = color;
             }
             """
@@ -114,7 +119,7 @@ class SimpleTransformShaderProgram:
         glBindVertexArray(0)
 
 
-class terminateShaderProgram:
+class terminateShaderProgram(InstancedShaderProgram):
 
     def __init__(self):
 
@@ -122,6 +127,10 @@ class terminateShaderProgram:
             #version 410
             uniform mat4 transform;
 
+            // Read instead of transform by instanced draw calls
+            uniform bool instanced;
+            in mat4 instanceModel;
+
             in vec3 position;
             in vec3 color;
 
@@ -129,7 +138,7 @@ class terminateShaderProgram:
 
             void main()
             {
-                gl_Position = transform * vec4(position, 1.0f);
+                gl_Position = (instanced ? instanceModel : transform) * vec4(position, 1.0f);
                 newColor = color;
             }
             """
@@ -0,0 +1,221 @@
+# coding=utf-8
+"""Static scene graph subtrees baked into merged vertex buffers"""
+
+from OpenGL.GL import *
+import numpy as np
+import grafica.transformations as tr
+import grafica.gpu_shape as gs
+import grafica.scene_graph as sg
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+
+def bakeVertices(vertexData, stride, transform):
+    """Vertices with their position (the first 3 floats) multiplied by an affine transform"""
+
+    vertices = np.array(vertexData, dtype=np.float32).reshape(-1, stride)
+    positions = np.matmul(vertices[:, :3], np.transpose(transform[:3, :3])) + transform[:3, 3]
+    vertices[:, :3] = positions
+    return vertices
+
+
+class BatchGroup:
+    """Merged buffers of the leaves sharing a texture"""
+
+    def __init__(self, texture):
+        self.texture = texture
+        self.leaves = []          # [leaf order, gpuShape, baked transform, first vertex]
+        self.vertices = None
+        self.vbo = None
+        self.ebo = None
+        self.size = 0
+        self.shapes = {}          # id(pipeline) -> GPUShape with a VAO set up by that pipeline
+
+    def shape(self, pipeline):
+        shape = self.shapes.get(id(pipeline))
+        if shape is None:
+            shape = gs.GPUShape()
+            shape.vao = glGenVertexArrays(1)
+            shape.vbo = self.vbo
+            shape.ebo = self.ebo
+            shape.size = self.size
+            shape.texture = self.texture
+            pipeline.setupVAO(shape)
+            self.shapes[id(pipeline)] = shape
+        return shape
+
+    def clear(self):
+        for shape in self.shapes.values():
+            glDeleteVertexArrays(1, [shape.vao])
+        self.shapes.clear()
+
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            glDeleteBuffers(1, [self.ebo])
+        self.vbo = None
+        self.ebo = None
+
+
+class StaticBatch:
+    """
+    A subtree of a scene graph drawn with one draw call per texture.
+
+    Every leaf is multiplied by its transform relative to the batched node and
+    merged into a single vertex and index buffer per texture, in the same order
+    drawSceneGraphNode would draw them. The batched node keeps its transform
+    and childs, so they can still be found and edited: when a transform below
+    it is replaced, only the leaves under it are baked again on the next draw,
+    and adding, removing, enabling or disabling nodes builds the batch again.
+
+    Transforms must be replaced, not modified in place. Leaves need the vertex
+    data kept by GPUShape.fillBuffers, with the position in the first 3 of
+    every stride floats.
+
+    Subtrees with a batch of their own, as an InstancedBatch for shapes that
+    move every frame, are left out of the merged buffers and drawn after them.
+    """
+    def __init__(self, node, stride, usage=GL_DYNAMIC_DRAW):
+        self.node = node
+        self.stride = stride
+        self.usage = usage
+        self.groups = []
+
+        # (node, transform relative to the batched node) of the nested batches
+        self.nested = []
+
+        # [node, transform, enabled, childs] as seen by the last build or bake
+        self.snapshot = []
+
+        # Counters exposed for benchmarking
+        self.builds = 0
+        self.bakes = 0
+
+        self.build()
+        node.batch = self
+
+    def collect(self, node, transform, leaves):
+        # transform takes node to the batched node, whose own transform is left to the uniform
+        self.snapshot.append([node, node.transform, node.enabled, tuple(node.childs)])
+        if not node.enabled:
+            return
+
+        if node.batch is not None and node is not self.node:
+            self.nested.append((node, transform))
+            return
+
+        if len(node.childs) == 1 and isinstance(node.childs[0], gs.GPUShape):
+            leaves.append((node, node.childs[0], transform))
+            return
+
+        for child in node.childs:
+            self.collect(child, np.matmul(transform, child.transform), leaves)
+
+    def relativeLeaves(self):
+        """Leaves below the batched node, with their transform relative to it"""
+
+        self.snapshot = []
+        self.nested = []
+        leaves = []
+        self.collect(self.node, tr.identity(), leaves)
+        return leaves
+
+    def build(self):
+        for group in self.groups:
+            group.clear()
+
+        groups = {}
+        for order, (node, gpuShape, transform) in enumerate(self.relativeLeaves()):
+            if gpuShape.vertexData is None:
+                raise ValueError("The GPUShape of " + str(node.name) + " has no vertex data to batch")
+            group = groups.get(gpuShape.texture)
+            if group is None:
+                group = BatchGroup(gpuShape.texture)
+                groups[gpuShape.texture] = group
+            group.leaves.append([order, gpuShape, transform, 0])
+
+        for group in groups.values():
+            vertices = []
+            indices = []
+            vertexCount = 0
+            for leaf in group.leaves:
+                _, gpuShape, transform, _ = leaf
+                leaf[3] = vertexCount
+                baked = bakeVertices(gpuShape.vertexData, self.stride, transform)
+                vertices.append(baked)
+                indices.append(gpuShape.indexData + vertexCount)
+                vertexCount += len(baked)
+
+            group.vertices = np.concatenate(vertices)
+            group.size = sum(len(leafIndices) for leafIndices in indices)
+            group.vbo = glGenBuffers(1)
+            group.ebo = glGenBuffers(1)
+
+            uploader = gs.GPUShape()
+            uploader.vbo = group.vbo
+            uploader.ebo = group.ebo
+            uploader.fillBuffers(group.vertices.reshape(-1), np.concatenate(indices), self.usage)
+
+        self.groups = list(groups.values())
+        self.builds += 1
+
+    def bake(self):
+        """Bakes again the leaves whose relative transform changed"""
+
+        # The structure did not change, so leaves come in the same order as when built
+        leaves = self.relativeLeaves()
+
+        for group in self.groups:
+            first = None
+            last = None
+            for leaf in group.leaves:
+                order, gpuShape, transform, start = leaf
+                newTransform = leaves[order][2]
+                if np.array_equal(newTransform, transform):
+                    continue
+
+                baked = bakeVertices(gpuShape.vertexData, self.stride, newTransform)
+                group.vertices[start:start + len(baked)] = baked
+                leaf[2] = newTransform
+                first = start if first is None else min(first, start)
+                last = start + len(baked) if last is None else max(last, start + len(baked))
+                self.bakes += 1
+
+            # Changed leaves are sent with a single upload
+            if first is not None:
+                data = np.ascontiguousarray(group.vertices[first:last])
+                glBindBuffer(GL_ARRAY_BUFFER, group.vbo)
+                glBufferSubData(GL_ARRAY_BUFFER, first * self.stride * gs.SIZE_IN_BYTES, data.nbytes, data)
+
+    def update(self):
+        """Builds or bakes the batch again if the subtree changed since the last draw"""
+
+        transformsChanged = False
+        for node, transform, enabled, childs in self.snapshot:
+            if node.enabled != enabled or tuple(node.childs) != childs:
+                self.build()
+                return
+            if node.transform is not transform and node is not self.node:
+                transformsChanged = True
+
+        if transformsChanged:
+            self.bake()
+
+    def draw(self, pipeline, transformName, transform, mode=GL_TRIANGLES):
+        """Draws the subtree, transform is the world transform of the batched node"""
+
+        self.update()
+        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, transformName), 1, GL_TRUE, transform)
+        for group in self.groups:
+            pipeline.drawCall(group.shape(pipeline), mode)
+
+        for node, relative in self.nested:
+            node.batch.draw(pipeline, transformName, np.matmul(transform, relative), mode)
+
+    def clear(self):
+        """Freeing the merged buffers, the leaves keep their own"""
+
+        for group in self.groups:
+            group.clear()
+        self.groups = []
+        self.node.batch = None
@@ -121,6 +121,37 @@ def entity_movement(entity):
             entity.pos[1] = pos_y()
             entity.model.transform = tr.matmul([tr.translate(entity.pos[0], entity.pos[1], 0), tr.scale(entity.size, entity.size, 1)])
 
+def entities_movement(entities):
+    # Same movement as entity_movement, computed for every entity at once
+    n = len(entities)
+    if n == 0:
+        return
+
+    stop = np.array([entity.stop for entity in entities])
+    t = np.array([entity.t for entity in entities], dtype=float)
+    x_ini = np.array([entity.x_ini for entity in entities], dtype=float)
+    y_ini = np.array([entity.y_ini for entity in entities], dtype=float)
+    vel = np.array([entity.vel for entity in entities], dtype=float)
+    direction = np.array([entity.direction for entity in entities], dtype=float).reshape(n)
+    size = np.array([entity.size for entity in entities], dtype=float)
+    pos = np.array([np.ravel(entity.pos) for entity in entities], dtype=float).reshape(n, 2)
+
+    # Stopped entities keep their time and position
+    moving = ~stop
+    t[moving] += 0.001
+    x = np.clip(direction*vel[:, 0]*np.sin(t) + x_ini, -0.55, 0.55)
+    y = -np.sign(y_ini)*vel[:, 1]*t + y_ini
+    pos[moving, 0] = x[moving]
+    pos[moving, 1] = y[moving]
+
+    transforms = tr.matmulN([tr.translateN(pos[:, 0], pos[:, 1], 0), tr.scaleN(size, size, 1)])
+
+    for i, entity in enumerate(entities):
+        entity.t = t[i]
+        entity.pos[0] = pos[i, 0]
+        entity.pos[1] = pos[i, 1]
+        entity.model.transform = transforms[i]
+
 class Zombie():
     # Class that contains zombies features
     def __init__(self, x_ini, y_ini, size):
@@ -129,7 +160,7 @@ class Zombie():
         self.y_ini = y_ini # Init y coordinate position
         self.pos = [x_ini, y_ini] # Position on screen
         self.vel = np.random.uniform(0.4, 0.6, 2) # Random generated speed 
-        self.direction = np.random.choice([-1, 1], 1) # Direction could be upwards or downwards
+        self.direction = np.random.choice([-1, 1]) # Direction could be upwards or downwards
         self.radio = 0.03 # Ratio of collition
         self.size = size # Size of the model
         self.model = None # Scene graph reference
@@ -152,7 +183,7 @@ class Human():
         self.y_ini = y_ini # Init y coordinate position
         self.pos = [x_ini, y_ini] # Position on screen
         self.vel = np.random.uniform(0.4, 0.6, 2) # Random generated speed 
-        self.direction = np.random.choice([-1, 1], 1) # Direction could be upwards or downwards
+        self.direction = np.random.choice([-1, 1]) # Direction could be upwards or downwards
         self.radio = 0.05 # Ratio of collition
         self.size = size # Size of the model
         self.model = None # Scene graph reference
@@ -6,6 +6,9 @@ from OpenGL.GL import *
 import grafica.shaders as es
 import grafica.transformations as tr
 import grafica.scene_graph as sg
+import grafica.static_batch as sb
+import grafica.instancing as inst
+import grafica.resource_registry as rr
 
 # A simple class container to store vertices and indices that define a shape
 class Shape:
@@ -15,23 +18,19 @@ class Shape:
         self.textureFileName = textureFileName
 
 
+# Shared GPU resources: shapes with the same vertices and textures with the same
+# image are uploaded once, and freed when the last shape using them is cleared
+resourceRegistry = rr.ResourceRegistry()
+
+
 def createGPUShape(shape, pipeline, usage=GL_STATIC_DRAW):
     # Initialize GPUShape
-    gpuShape = es.GPUShape().initBuffers()
-    pipeline.setupVAO(gpuShape)
-    gpuShape.fillBuffers(shape.vertices, shape.indices, usage)
-    return gpuShape
+    return resourceRegistry.createGPUShape(pipeline, shape, usage)
 
 
 def createTextureGPUShape(shape, pipeline, path, usage):
     # Initialize GPUShape with textures
-
-    gpuShape = es.GPUShape().initBuffers()
-    pipeline.setupVAO(gpuShape)
-    gpuShape.fillBuffers(shape.vertices, shape.indices, usage)
-    gpuShape.texture = es.textureSimpleSetup(
-        path, GL_CLAMP_TO_EDGE, GL_CLAMP_TO_EDGE, GL_NEAREST, GL_NEAREST)
-    return gpuShape
+    return resourceRegistry.createGPUShape(pipeline, shape, usage, path, GL_CLAMP_TO_EDGE, GL_NEAREST)
 
 
 def createColorTriangle(r, g, b):
@@ -254,6 +253,12 @@ def createScene(pipeline):
     backGroundNode = sg.SceneGraphNode("background")
     backGroundNode.childs = [grassNode, completeHighwayNode, treesNode]
 
+    # The trees are drawn with one instanced call for the logs and one for the
+    # tops, whose shearing changes every frame; the rest of the background is
+    # drawn from merged buffers with a single draw call
+    inst.InstancedBatch(treesNode)
+    sb.StaticBatch(backGroundNode, 6)
+
     # Father node of the scene
     sceneNode = sg.SceneGraphNode("world")
     sceneNode.childs = [backGroundNode]
@@ -7,14 +7,20 @@ import OpenGL.GL.shaders
 import numpy as np
 import grafica.shaders as es
 import grafica.transformations as tr
+import grafica.headless as hl
 import grafica.performance_monitor as pm
+import grafica.gl_accounting as gla
 import grafica.scene_graph as sg
+import grafica.resource_registry as rr
 from shapes import *
 from model import *
 import math
 
 # Initialize parameters
 
+# Offscreen mode: --headless=N renders N frames without a window, --dump-frames=DIR saves them as PNG
+headless = hl.HeadlessMode.fromArguments()
+
 Z = int(sys.argv[1])
 H = int(sys.argv[2])
 T = float(sys.argv[3])
@@ -99,7 +105,7 @@ def on_key(window, key, scancode, action, mods):
 if __name__ == "__main__":
 
     # Initialize glfw
-    if not glfw.init():
+    if not headless.init():
         glfw.set_window_should_close(window, True)
 
     # Creating a glfw window
@@ -114,7 +120,7 @@ if __name__ == "__main__":
     glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
     ############################################################################################
 
-    window = glfw.create_window(width, height, title, None, None)
+    window = headless.createWindow(width, height, title)
     if not window:
         glfw.terminate()
         glfw.set_window_should_close(window, True)
@@ -142,13 +148,17 @@ if __name__ == "__main__":
     # Background scene graph
     mainScene = createScene(pipeline)
 
-    # Shapes with textures
-    hinata_png = createTextureGPUShape(createTextureQuad(1,1), tex_pipeline, "Sprites/hinata.png", GL_STREAM_DRAW)
-    zombie_png = createTextureGPUShape(createTextureQuad(1,1), tex_pipeline, "Sprites/zombie.png", GL_DYNAMIC_DRAW)
-    human_png = createTextureGPUShape(createTextureQuad(1,1), tex_pipeline, "Sprites/kageyama.png", GL_DYNAMIC_DRAW)
+    # Shapes with textures: the six quads are never written again, so they share one static buffer
+    hinata_png = createTextureGPUShape(createTextureQuad(1,1), tex_pipeline, "Sprites/hinata.png", GL_STATIC_DRAW)
+    zombie_png = createTextureGPUShape(createTextureQuad(1,1), tex_pipeline, "Sprites/zombie.png", GL_STATIC_DRAW)
+    human_png = createTextureGPUShape(createTextureQuad(1,1), tex_pipeline, "Sprites/kageyama.png", GL_STATIC_DRAW)
     store_png = createTextureGPUShape(createTextureQuad(1,1), tex_pipeline, "Sprites/store.png", GL_STATIC_DRAW)
-    you_win_png = createTextureGPUShape(createTextureQuad(1,1), tex_pipeline, "Sprites/you_win.png", GL_DYNAMIC_DRAW)
-    game_over_png = createTextureGPUShape(createTextureQuad(1,1), tex_pipeline, "Sprites/game_over.png", GL_DYNAMIC_DRAW)
+    you_win_png = createTextureGPUShape(createTextureQuad(1,1), tex_pipeline, "Sprites/you_win.png", GL_STATIC_DRAW)
+    game_over_png = createTextureGPUShape(createTextureQuad(1,1), tex_pipeline, "Sprites/game_over.png", GL_STATIC_DRAW)
+
+    # VRAM used by every shared texture and buffer, with RESOURCE_REPORT=1
+    if rr.reportRequested():
+        print(resourceRegistry.report())
 
     # Nodes per shape
     hinataNode = sg.SceneGraphNode("hinata")
@@ -158,11 +168,13 @@ if __name__ == "__main__":
     storeNode.childs = [store_png]
 
     you_winNode = sg.SceneGraphNode("win")
-    you_winNode.transform = tr.matmul([tr.scale(0, 0, 0)])
+    # Hidden until the game ends
+    you_winNode.enabled = False
     you_winNode.childs = [you_win_png]
 
     game_overNode = sg.SceneGraphNode("lose")
-    game_overNode.transform = tr.matmul([tr.scale(0, 0, 0)])
+    # Hidden until the game ends
+    game_overNode.enabled = False
     game_overNode.childs = [game_over_png]
 
     # Initialize player
@@ -247,6 +259,7 @@ if __name__ == "__main__":
         x_scale = t+0.2
 
         if 0 < t < 2.51:
+            you_winNode.enabled = True
             you_winNode.transform = tr.matmul([tr.scale(x_scale, y_scale, 1), tr.rotationZ(-t*10)])
 
         player.update(0, True)
@@ -261,6 +274,7 @@ if __name__ == "__main__":
         x_scale = t+0.2
 
         if 0 < t < 2.51:
+            game_overNode.enabled = True
             game_overNode.transform = tr.matmul([tr.scale(x_scale, y_scale, 1), tr.rotationZ(-t*10)])
 
         player.update(0, True)
@@ -308,6 +322,8 @@ if __name__ == "__main__":
     gameNode.childs = [tex_scene, mainScene, you_winNode, game_overNode]
 
     perfMonitor = pm.PerformanceMonitor(glfw.get_time(), 0.5)
+    # Count GL calls per frame, only when run with GL_ACCOUNTING=1
+    glAccounting = gla.fromEnvironment(perfMonitor)
     # glfw will swap buffers as soon as possible
     glfw.swap_interval(0)
     t0 = glfw.get_time()
@@ -329,7 +345,7 @@ if __name__ == "__main__":
     t_infected = 0
 
     # Application loop
-    while not glfw.window_should_close(window):
+    while not headless.shouldClose(window):
 
         # Time variables
         t1 = glfw.get_time()
@@ -338,7 +354,7 @@ if __name__ == "__main__":
 
         # Measuring performance
         perfMonitor.update(glfw.get_time())
-        glfw.set_window_title(window, title + str(perfMonitor))
+        glfw.set_window_title(window, title + str(perfMonitor) + ("" if glAccounting is None else str(glAccounting)))
 
         # Using GLFW to check for input events
         glfw.poll_events()
@@ -370,11 +386,11 @@ if __name__ == "__main__":
             t_win += delta
             win(t_win)
 
+        # Move every human at once
+        entities_movement(humans)
+
         # Check some interactions for all humans on screen
         for human in humans:
-            # Move human
-            human.update()
-
             # Check if player touch an infected human
             player.infected(human)
 
@@ -410,11 +426,11 @@ if __name__ == "__main__":
             lose(t_lose)
 
 
+        # Move every zombie at once
+        entities_movement(zombies)
+
         # Check some zombie interactions
         for zombie in zombies:
-            # Move zombie
-            zombie.update()
-
             # If player touch a zombie -> Game over
             if player.collision_zombie(zombie):
                 # Set time spawn to None to stop spawning entities
@@ -510,10 +526,20 @@ if __name__ == "__main__":
                 zombies.remove(zombie)
 
         # Once the drawing is rendered, buffers are swap so an uncomplete drawing is never seen.
-        glfw.swap_buffers(window)
+        headless.swapBuffers(window)
 
     # freeing GPU memory
     mainScene.clear()
     tex_scene.clear()
+    pipeline.clearInstancing()
+    terminate_pipeline.clearInstancing()
+
+    # Whatever the scene graphs did not reach is freed here
+    resourceRegistry.clear()
+
+    if glAccounting is not None:
+        print(perfMonitor.report())
+        print(glAccounting.report())
 
+    headless.clear()
     glfw.terminate()
@@ -9,11 +9,17 @@ import sys
 import os.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import grafica.transformations as tr
+import grafica.headless as hl
 import grafica.basic_shapes as bs
 import grafica.easy_shaders as es
 import grafica.lighting_shaders as ls
+import grafica.lighting_block as lb
 import grafica.performance_monitor as pm
+import grafica.gl_accounting as gla
 import grafica.scene_graph as sg
+import grafica.culling as cl
+import grafica.resource_registry as rr
+import grafica.quaternion as qt
 import grafica.ex_curves as cv
 from grafica.assets_path import getAssetPath
 from obj_reader import *
@@ -61,8 +67,11 @@ def on_key(window, key, scancode, action, mods):
 
 if __name__ == "__main__":
 
+    # Modo sin ventana: --headless=N dibuja N frames fuera de pantalla y --dump-frames=DIR los guarda en PNG
+    headless = hl.HeadlessMode.fromArguments()
+
     # Initialize glfw
-    if not glfw.init():
+    if not headless.init():
         glfw.set_window_should_close(window, True)
 
     width = 1000
@@ -74,7 +83,7 @@ if __name__ == "__main__":
     glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, GL_TRUE)
     glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
 
-    window = glfw.create_window(width, height, title, None, None)
+    window = headless.createWindow(width, height, title)
 
     if not window:
         glfw.terminate()
@@ -99,6 +108,10 @@ if __name__ == "__main__":
     skybox = createSceneSkybox(textPhongPipeline)
     floor = createFloor(textPhongPipeline)
 
+    # Memoria de video usada por cada textura y buffer compartido, con RESOURCE_REPORT=1
+    if rr.reportRequested():
+        print(resourceRegistry.report())
+
     # As we work in 3D, we need to check which part is in front,
     # and which one is at the back
     glEnable(GL_DEPTH_TEST)
@@ -132,6 +145,20 @@ if __name__ == "__main__":
     Kd = [0.8, 0.8, 0.8]
     Ks = [0.5, 0.5, 0.5]
 
+    # Uniform buffer con camara y luces, compartido por los cuatro pipelines
+    lightingBlock = lb.LightingBlock()
+    lightingBlock.setAmbient(La)
+    lightingBlock.setSpotConcentration(spotConcentration)
+    lightingBlock.setAttenuation(0.001, 0.03, 0.01)
+
+    # Los materiales no cambian, se fijan una sola vez en cada pipeline
+    for lightingPipeline in [phongPipeline, celShadingPipeline, textPhongPipeline, texCelShadingPipeline]:
+        lightingBlock.attach(lightingPipeline)
+        glUseProgram(lightingPipeline.shaderProgram)
+        glUniform3f(glGetUniformLocation(lightingPipeline.shaderProgram, "Ka"), Ka[0], Ka[1], Ka[2])
+        glUniform3f(glGetUniformLocation(lightingPipeline.shaderProgram, "Kd"), Kd[0], Kd[1], Kd[2])
+        glUniform3f(glGetUniformLocation(lightingPipeline.shaderProgram, "Ks"), Ks[0], Ks[1], Ks[2])
+        glUniform1ui(glGetUniformLocation(lightingPipeline.shaderProgram, "shininess"), shininess)
 
     # inicializa variables
     camera_t = 8
@@ -151,10 +178,16 @@ if __name__ == "__main__":
 
     perfMonitor = pm.PerformanceMonitor(glfw.get_time(), 0.5)
 
+    # Conteo de llamadas a OpenGL por frame, solo si se ejecuta con GL_ACCOUNTING=1
+    glAccounting = gla.fromEnvironment(perfMonitor)
+
+    # Cuenta las figuras dibujadas y descartadas en cada frame
+    frustum = cl.Frustum()
+
     # glfw will swap buffers as soon as possible
     glfw.swap_interval(0)
 
-    while not glfw.window_should_close(window):
+    while not headless.shouldClose(window):
 
         # Getting the time difference from the previous iteration
         t1 = glfw.get_time()
@@ -200,7 +233,9 @@ if __name__ == "__main__":
 
         # Measuring performance
         perfMonitor.update(glfw.get_time())
-        glfw.set_window_title(window, title + str(perfMonitor) + " Dance time: " + str(int(t)) + " segs.")
+        glfw.set_window_title(window, title + str(perfMonitor) + str(frustum) +
+            ("" if glAccounting is None else str(glAccounting)) + " Dance time: " + str(int(t)) + " segs.")
+        frustum.reset()
 
         # Using GLFW to check for input events
         glfw.poll_events()
@@ -233,56 +268,56 @@ if __name__ == "__main__":
         # * Cabeza
         head = model_movement.head
         headRotation = sg.findNode(model_3D, "rotate head")
-        headRotation.transform = tr.matmul([tr.translate(0, 0, body.height), tr.translate(0, 0, 6), tr.rotationZ(head.rotation)])
+        headRotation.transform = qt.TRS((0, 0, body.height + 6), qt.Quaternion.fromEuler(0, 0, head.rotation)).matrix()
 
 
         # * mano y antebrazo derecho
         rightArm = model_movement.rightArm
         rightArmRotation = sg.findNode(model_3D, "rotate right arm")
-        rightArmRotation.transform = tr.matmul([tr.rotationX(rightArm.theta_x) ,tr.rotationY(rightArm.theta_y), tr.rotationZ(rightArm.theta_z)])
+        rightArmRotation.transform = qt.Quaternion.fromEuler(rightArm.theta_x, rightArm.theta_y, rightArm.theta_z).matrix()
 
 
         # * brazo completo derecho
         completeRightArm = model_movement.completeRightArm
         completeRightArmRotation = sg.findNode(model_3D, "rotate complete right arm")
-        completeRightArmRotation.transform = tr.matmul([tr.rotationX(completeRightArm.theta_x), tr.rotationY(completeRightArm.theta_y), 
-                                                        tr.rotationZ(completeRightArm.theta_z)])
+        completeRightArmRotation.transform = qt.Quaternion.fromEuler(completeRightArm.theta_x, completeRightArm.theta_y,
+                                                                     completeRightArm.theta_z).matrix()
 
 
         # * mano y antebrazo izquierdo
         leftArm = model_movement.leftArm
         leftArmRotation = sg.findNode(model_3D, "rotate left arm")
-        leftArmRotation.transform = tr.matmul([tr.rotationX(leftArm.theta_x), tr.rotationY(leftArm.theta_y), tr.rotationZ(leftArm.theta_z)])
+        leftArmRotation.transform = qt.Quaternion.fromEuler(leftArm.theta_x, leftArm.theta_y, leftArm.theta_z).matrix()
 
 
         # * brazo completo izquierdo
         completeLeftArm = model_movement.completeLeftArm
         completeLeftArmRotation = sg.findNode(model_3D, "rotate complete left arm")
-        completeLeftArmRotation.transform = tr.matmul([tr.rotationX(completeLeftArm.theta_x), tr.rotationY(completeLeftArm.theta_y),
-                                                       tr.rotationZ(completeLeftArm.theta_z)])
+        completeLeftArmRotation.transform = qt.Quaternion.fromEuler(completeLeftArm.theta_x, completeLeftArm.theta_y,
+                                                                    completeLeftArm.theta_z).matrix()
 
         # * pierna y pie derecho
         rightFoot = model_movement.rightFoot
         rightLegRotation = sg.findNode(model_3D, "rotate right foot")
-        rightLegRotation.transform = tr.matmul([tr.rotationX(rightFoot.theta_x), tr.rotationY(rightFoot.theta_y), tr.rotationZ(rightFoot.theta_z)])
+        rightLegRotation.transform = qt.Quaternion.fromEuler(rightFoot.theta_x, rightFoot.theta_y, rightFoot.theta_z).matrix()
 
 
         # * pierna completa derecha
         rightLeg = model_movement.rightLeg
         completeRightLegRotation = sg.findNode(model_3D, "rotate complete right leg")
-        completeRightLegRotation.transform = tr.matmul([tr.rotationY(rightLeg.theta_y), tr.rotationX(rightLeg.theta_x), tr.rotationZ(rightLeg.theta_z)])
+        completeRightLegRotation.transform = qt.Quaternion.fromEuler(rightLeg.theta_x, rightLeg.theta_y, rightLeg.theta_z, order="YXZ").matrix()
 
 
         # * pierna y pie izquierdo
         leftFoot = model_movement.leftFoot
         leftLegRotation = sg.findNode(model_3D, "rotate left foot")
-        leftLegRotation.transform = tr.matmul([tr.rotationY(leftFoot.theta_y), tr.rotationX(leftFoot.theta_x), tr.rotationZ(leftFoot.theta_z)])
+        leftLegRotation.transform = qt.Quaternion.fromEuler(leftFoot.theta_x, leftFoot.theta_y, leftFoot.theta_z, order="YXZ").matrix()
 
 
         # * pierna completa izquierda
         leftLeg = model_movement.leftLeg
         completeLeftLegRotation = sg.findNode(model_3D, "rotate complete left leg")
-        completeLeftLegRotation.transform = tr.matmul([tr.rotationY(leftLeg.theta_y), tr.rotationX(leftLeg.theta_x), tr.rotationZ(leftLeg.theta_z)])
+        completeLeftLegRotation.transform = qt.Quaternion.fromEuler(leftLeg.theta_x, leftLeg.theta_y, leftLeg.theta_z, order="YXZ").matrix()
 
         # Controla movimiento de camara con teclas y si no esta automatico
         if (glfw.get_key(window, glfw.KEY_LEFT) == glfw.PRESS) and not controller.autoCam:
@@ -301,6 +336,9 @@ if __name__ == "__main__":
         # Setting up the projection transform
         projection = tr.perspective(60, float(width)/float(height), 0.1, 300)
 
+        # Volumen visto por la camara: los subarboles fuera de el no se dibujan
+        frustum.update(projection, view)
+
         # Clearing the screen in both, color and depth
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
@@ -316,112 +354,57 @@ if __name__ == "__main__":
         lightposition2 = [25, light_movement.pos, 30] # Mueve en eje y
         lightposition3 = [-36, light_movement.pos, 39] # Mueve en eje y
 
-        # Setting uniforms
+        # Luces y camara se escriben una vez en el uniform buffer compartido,
+        # asi cambiar entre phong y cel shading no requiere subir uniforms
+        lightingBlock.setLights(
+            [lightposition0, lightposition1, lightposition2, lightposition3],
+            [spotDirection1, spotDirection2, spotDirection3, spotDirection4],
+            [Ld1, Ld2, Ld3, Ld4],
+            [Ls1, Ls2, Ls3, Ls4])
+        lightingBlock.setCamera(view, projection, cam_movement.pos)
+        lightingBlock.upload()
+
         # Pipeline sin texturas
         glUseProgram(pipeline.shaderProgram)
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "spotDirection1"), spotDirection1[0], spotDirection1[1], spotDirection1[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "spotDirection2"), spotDirection2[0], spotDirection2[1], spotDirection2[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "spotDirection3"), spotDirection3[0], spotDirection3[1], spotDirection3[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "spotDirection4"), spotDirection4[0], spotDirection4[1], spotDirection4[2])
-
-        glUniform1f(glGetUniformLocation(pipeline.shaderProgram, "spotConcentration"), spotConcentration)
-
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "La"), La[0], La[1], La[2])
-
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "Ld1"), Ld1[0], Ld1[1], Ld1[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "Ld2"), Ld2[0], Ld2[1], Ld2[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "Ld3"), Ld3[0], Ld3[1], Ld3[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "Ld4"), Ld4[0], Ld4[1], Ld4[2])
-
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "Ls1"), Ls1[0], Ls1[1], Ls1[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "Ls2"), Ls2[0], Ls2[1], Ls2[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "Ls3"), Ls3[0], Ls3[1], Ls3[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "Ls4"), Ls4[0], Ls4[1], Ls4[2])
-
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "Ka"), Ka[0], Ka[1], Ka[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "Kd"), Kd[0], Kd[1], Kd[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "Ks"), Ks[0], Ks[1], Ks[2])
-
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "lightPosition0"), lightposition0[0], lightposition0[1], lightposition0[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "lightPosition1"), lightposition1[0], lightposition1[1], lightposition1[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "lightPosition2"), lightposition2[0], lightposition2[1], lightposition2[2])
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "lightPosition3"), lightposition3[0], lightposition3[1], lightposition3[2])
-
-        glUniform1ui(glGetUniformLocation(pipeline.shaderProgram, "shininess"), shininess)
-        glUniform1f(glGetUniformLocation(pipeline.shaderProgram, "constantAttenuation"), 0.001)
-        glUniform1f(glGetUniformLocation(pipeline.shaderProgram, "linearAttenuation"), 0.03)
-        glUniform1f(glGetUniformLocation(pipeline.shaderProgram, "quadraticAttenuation"), 0.01)
-
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, "projection"), 1, GL_TRUE, projection)
-        glUniform3f(glGetUniformLocation(pipeline.shaderProgram, "viewPosition"), cam_movement.pos[0], cam_movement.pos[1], cam_movement.pos[2])
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, "view"), 1, GL_TRUE, view)
-
         glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, "model"), 1, GL_TRUE, tr.identity())
 
         # Dibuja solo la cabeza -> Unica sin texturas (solo color)
-        sg.drawSceneGraphNode(sg.findNode(model_3D, "rotate head"), pipeline, "model")
+        sg.drawSceneGraphNode(sg.findNode(model_3D, "rotate head"), pipeline, "model", frustum=frustum)
 
         # Pipeline de texturas
         glUseProgram(tex_pipeline.shaderProgram)
 
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "spotDirection1"), spotDirection1[0], spotDirection1[1], spotDirection1[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "spotDirection2"), spotDirection2[0], spotDirection2[1], spotDirection2[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "spotDirection3"), spotDirection3[0], spotDirection3[1], spotDirection3[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "spotDirection4"), spotDirection4[0], spotDirection4[1], spotDirection4[2])
-
-        glUniform1f(glGetUniformLocation(tex_pipeline.shaderProgram, "spotConcentration"), spotConcentration)
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "La"), La[0], La[1], La[2])
-
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ld1"), Ld1[0], Ld1[1], Ld1[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ld2"), Ld2[0], Ld2[1], Ld2[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ld3"), Ld3[0], Ld3[1], Ld3[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ld4"), Ld4[0], Ld4[1], Ld4[2])
-
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ls1"), Ls1[0], Ls1[1], Ls1[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ls2"), Ls2[0], Ls2[1], Ls2[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ls3"), Ls3[0], Ls3[1], Ls3[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ls4"), Ls4[0], Ls4[1], Ls4[2])
-
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ka"), Ka[0], Ka[1], Ka[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Kd"), Kd[0], Kd[1], Kd[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ks"), Ks[0], Ks[1], Ks[2])
-
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "lightPosition0"), lightposition0[0], lightposition0[1], lightposition0[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "lightPosition1"), lightposition1[0], lightposition1[1], lightposition1[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "lightPosition2"), lightposition2[0], lightposition2[1], lightposition2[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "lightPosition3"), lightposition3[0], lightposition3[1], lightposition3[2])
-
-        glUniform1ui(glGetUniformLocation(tex_pipeline.shaderProgram, "shininess"), shininess)
-        glUniform1f(glGetUniformLocation(tex_pipeline.shaderProgram, "constantAttenuation"), 0.001)
-        glUniform1f(glGetUniformLocation(tex_pipeline.shaderProgram, "linearAttenuation"), 0.03)
-        glUniform1f(glGetUniformLocation(tex_pipeline.shaderProgram, "quadraticAttenuation"), 0.01)
-
-        glUniformMatrix4fv(glGetUniformLocation(tex_pipeline.shaderProgram, "projection"), 1, GL_TRUE, projection)
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "viewPosition"), cam_movement.pos[0], cam_movement.pos[1], cam_movement.pos[2])
-        glUniformMatrix4fv(glGetUniformLocation(tex_pipeline.shaderProgram, "view"), 1, GL_TRUE, view)
-
         glUniformMatrix4fv(glGetUniformLocation(tex_pipeline.shaderProgram, "model"), 1, GL_TRUE, tr.identity())
 
         # Dibuja objetos con texturas
-        sg.drawSceneGraphNode(skybox, tex_pipeline, "model")
-        sg.drawSceneGraphNode(floor, tex_pipeline, "model")
-        sg.drawSceneGraphNode(sg.findNode(model_3D, "jump model"), tex_pipeline, "model")
+        sg.drawSceneGraphNode(skybox, tex_pipeline, "model", frustum=frustum)
+        sg.drawSceneGraphNode(floor, tex_pipeline, "model", frustum=frustum)
+        # Brazos, antebrazos, muslos y pies se repiten a cada lado: una llamada instanciada por pieza
+        sg.drawSceneGraphInstanced(sg.findNode(model_3D, "jump model"), tex_pipeline, "model", frustum=frustum)
 
         # Once the drawing is rendered, buffers are swap so an uncomplete drawing is never seen.
 
         # Activa slow motion dibujando cada 15 fps
         if controller.slowMotion:
             if (t1 - lastFrameTime) >= fpsLimit:
-                glfw.swap_buffers(window)
+                headless.swapBuffers(window)
                 lastFrameTime = t1
 
         else:
-            glfw.swap_buffers(window)
+            headless.swapBuffers(window)
 
 
     # freeing GPU memory
     model_3D.clear()
     skybox.clear()
     floor.clear()
+    lightingBlock.clear()
+    for instancedPipeline in (textPhongPipeline, texCelShadingPipeline):
+        instancedPipeline.clearInstancing()
+
+    if glAccounting is not None:
+        print(perfMonitor.report())
+        print(glAccounting.report())
 
+    headless.clear()
     glfw.terminate()
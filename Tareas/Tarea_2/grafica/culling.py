@@ -0,0 +1,121 @@
+# coding=utf-8
+"""Axis aligned bounding boxes and view frustum culling"""
+
+import numpy as np
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+
+class AABB:
+    """Axis aligned bounding box, given by its min and max corners"""
+
+    def __init__(self, minCorner, maxCorner):
+        self.minCorner = np.asarray(minCorner, dtype=np.float32)
+        self.maxCorner = np.asarray(maxCorner, dtype=np.float32)
+
+    @property
+    def center(self):
+        return (self.minCorner + self.maxCorner) / 2
+
+    @property
+    def extent(self):
+        """Half the size of the box along each axis"""
+        return (self.maxCorner - self.minCorner) / 2
+
+    def boundingSphere(self):
+        """(center, radius) of a sphere containing the box"""
+        return self.center, float(np.linalg.norm(self.extent))
+
+    def transformed(self, transform):
+        """Box in another space containing this one once multiplied by an affine transform"""
+
+        rotation = transform[:3, :3]
+        center = np.matmul(rotation, self.center) + transform[:3, 3]
+        extent = np.matmul(np.abs(rotation), self.extent)
+        return AABB(center - extent, center + extent)
+
+    def __str__(self):
+        return "AABB " + str(self.minCorner) + " - " + str(self.maxCorner)
+
+
+def shapeBounds(vertices, indices, stride):
+    """
+    AABB of the positions (first 3 floats of every vertex) referenced by indices,
+    for vertices of stride floats. None is returned if the vertex data does not
+    fit that stride or the indices.
+    """
+    vertexData = np.asarray(vertices, dtype=np.float32).reshape(-1)
+    indexData = np.asarray(indices, dtype=np.uint32).reshape(-1)
+
+    if indexData.size == 0 or stride < 3 or vertexData.size % stride != 0:
+        return None
+
+    vertexCount = vertexData.size // stride
+    if int(indexData.max()) >= vertexCount:
+        return None
+
+    positions = vertexData.reshape(vertexCount, stride)[indexData, :3]
+    return AABB(positions.min(axis=0), positions.max(axis=0))
+
+
+def mergeBounds(boxes):
+    """
+    Smallest AABB containing every box of the list. None for an empty list or
+    if any box is None: a shape without bounds must never be culled, and
+    neither can anything grouped with it.
+    """
+    if len(boxes) == 0 or any(box is None for box in boxes):
+        return None
+
+    minCorner = np.min([box.minCorner for box in boxes], axis=0)
+    maxCorner = np.max([box.maxCorner for box in boxes], axis=0)
+    return AABB(minCorner, maxCorner)
+
+
+class Frustum:
+    """
+    The 6 planes of the volume seen by a camera, extracted from its projection
+    and view matrices (as built by transformations.perspective and lookAt).
+
+    It also counts the shapes submitted and culled while drawing with it,
+    reset() must be called once per frame.
+    """
+    def __init__(self, projection=None, view=None):
+        self.planes = np.zeros((6, 4), dtype=np.float32)
+        if projection is not None and view is not None:
+            self.update(projection, view)
+        self.reset()
+
+    def update(self, projection, view):
+        clip = np.matmul(projection, view)
+
+        # A point is inside when dot(plane, (x, y, z, 1)) >= 0 for every plane:
+        # left, right, bottom, top, near and far
+        self.planes[0] = clip[3] + clip[0]
+        self.planes[1] = clip[3] - clip[0]
+        self.planes[2] = clip[3] + clip[1]
+        self.planes[3] = clip[3] - clip[1]
+        self.planes[4] = clip[3] + clip[2]
+        self.planes[5] = clip[3] - clip[2]
+
+        self.planes /= np.linalg.norm(self.planes[:, :3], axis=1)[:, np.newaxis]
+
+    def reset(self):
+        self.submitted = 0
+        self.culled = 0
+
+    def intersects(self, box, transform):
+        """True if the box, multiplied by transform, may be seen through the frustum"""
+
+        worldBox = box.transformed(transform)
+        center = worldBox.center
+        extent = worldBox.extent
+
+        # The box is out if it lies fully behind any plane
+        distances = np.matmul(self.planes[:, :3], center) + self.planes[:, 3]
+        radii = np.matmul(np.abs(self.planes[:, :3]), extent)
+        return bool(np.all(distances + radii >= 0))
+
+    def __str__(self):
+        return f" [{self.submitted} drawn - {self.culled} culled]"
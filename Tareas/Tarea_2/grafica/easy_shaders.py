@@ -51,6 +51,9 @@ def textureSimpleSetup(imgName, sWrapMode, tWrapMode, minFilterMode, maxFilterMo
 
 class SimpleShaderProgram:
 
+    # Floats per vertex, as laid out by setupVAO
+    vertexStride = 6
+
     def __init__(self):
 
         vertex_shader = """
@@ -116,6 +119,9 @@ class SimpleShaderProgram:
 
 class SimpleTextureShaderProgram:
 
+    # Floats per vertex, as laid out by setupVAO
+    vertexStride = 5
+
     def __init__(self):
 
         vertex_shader = """
@@ -185,6 +191,9 @@ class SimpleTextureShaderProgram:
 
 class SimpleTransformShaderProgram:
 
+    # Floats per vertex, as laid out by setupVAO
+    vertexStride = 6
+
     def __init__(self):
 
         vertex_shader = """
@@ -252,6 +261,9 @@ class SimpleTransformShaderProgram:
 
 class SimpleTextureTransformShaderProgram:
 
+    # Floats per vertex, as laid out by setupVAO
+    vertexStride = 5
+
     def __init__(self):
 
         vertex_shader = """
@@ -325,6 +337,9 @@ class SimpleTextureTransformShaderProgram:
 
 class SimpleModelViewProjectionShaderProgram:
 
+    # Floats per vertex, as laid out by setupVAO
+    vertexStride = 6
+
     def __init__(self):
 
         vertex_shader = """
@@ -394,6 +409,9 @@ class SimpleModelViewProjectionShaderProgram:
 
 class SimpleTextureModelViewProjectionShaderProgram:
 
+    # Floats per vertex, as laid out by setupVAO
+    vertexStride = 5
+
     def __init__(self):
 
         vertex_shader = """
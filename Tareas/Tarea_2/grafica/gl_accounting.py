@@ -0,0 +1,234 @@
+# coding=utf-8
+"""Opt-in counting of the OpenGL calls, state changes and bytes uploaded per frame"""
+
+import os
+import re
+import sys
+import OpenGL.GL as gl
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+# Environment variable enabling the accounting in the applications
+ENVIRONMENT_VARIABLE = "GL_ACCOUNTING"
+
+DRAW_FUNCTIONS = ["glDrawArrays", "glDrawElements", "glDrawArraysInstanced", "glDrawElementsInstanced"]
+
+# Functions setting a piece of state, and which of their arguments identify it
+STATE_FUNCTIONS = {
+    "glUseProgram": 0,
+    "glBindVertexArray": 0,
+    "glBindBuffer": 1,
+    "glBindFramebuffer": 1,
+    "glActiveTexture": 0,
+    "glBindTexture": 1,
+    "glEnable": 1,
+    "glDisable": 1,
+    "glPolygonMode": 1,
+    "glBlendFunc": 0,
+    "glClearColor": 0,
+}
+
+UPLOAD_FUNCTIONS = ["glBufferData", "glBufferSubData", "glTexImage2D", "glTexSubImage2D"]
+
+UNIFORM_PATTERN = re.compile(r"glUniform(Matrix)?([1-4])(f|i|ui)(v?)$")
+
+CHANNELS = {gl.GL_RED: 1, gl.GL_RG: 2, gl.GL_RGB: 3, gl.GL_BGR: 3, gl.GL_RGBA: 4, gl.GL_BGRA: 4,
+    gl.GL_DEPTH_COMPONENT: 1}
+
+TYPE_BYTES = {gl.GL_UNSIGNED_BYTE: 1, gl.GL_BYTE: 1, gl.GL_UNSIGNED_SHORT: 2, gl.GL_SHORT: 2,
+    gl.GL_UNSIGNED_INT: 4, gl.GL_INT: 4, gl.GL_FLOAT: 4}
+
+
+def trackedFunctions():
+    """Names of every GL function counted, the uniform setters included"""
+
+    uniforms = [name for name in dir(gl) if UNIFORM_PATTERN.match(name)]
+    return DRAW_FUNCTIONS + list(STATE_FUNCTIONS) + UPLOAD_FUNCTIONS + uniforms
+
+
+def uploadBytes(name, args):
+    """Bytes sent to the GPU by a buffer or texture upload, 0 if it only allocates"""
+
+    if name == "glBufferData":
+        return 0 if len(args) < 4 or args[2] is None else int(args[1])
+
+    if name == "glBufferSubData":
+        return int(args[2]) if len(args) >= 4 else 0
+
+    # glTexImage2D(target, level, internalFormat, width, height, border, format, type, pixels)
+    # glTexSubImage2D(target, level, xoffset, yoffset, width, height, format, type, pixels)
+    if name == "glTexImage2D" and len(args) >= 9 and args[8] is not None:
+        width, height, format, type = args[3], args[4], args[6], args[7]
+    elif name == "glTexSubImage2D" and len(args) >= 9 and args[8] is not None:
+        width, height, format, type = args[4], args[5], args[6], args[7]
+    else:
+        return 0
+
+    return int(width) * int(height) * CHANNELS.get(format, 4) * TYPE_BYTES.get(type, 1)
+
+
+def uniformBytes(match, args):
+    matrix, size, _, vector = match.groups()
+    size = int(size)
+
+    if matrix:
+        return int(args[1]) * size * size * 4
+    if vector:
+        return int(args[1]) * size * 4
+    return size * 4
+
+
+class GLAccounting:
+    """
+    Replaces the GL functions imported by the loaded modules with wrappers
+    counting them. Nothing is replaced until install() is called, so the
+    applications pay nothing when the accounting is off.
+
+    Counters are per frame: collectCounters hands them to a PerformanceMonitor
+    and starts the next frame, totals keeps the calls of every function.
+    """
+    def __init__(self):
+        self.installed = []      # (namespace, name, original function)
+        self.state = {}
+        self.totals = {}
+        self.lastFrame = ""
+        self.resetFrame()
+
+    def resetFrame(self):
+        self.calls = 0
+        self.drawCalls = 0
+        self.stateChanges = 0
+        self.redundantStateChanges = 0
+        self.uniformUploads = 0
+        self.uniformBytes = 0
+        self.uploads = 0
+        self.uploadBytes = 0
+
+    def wrap(self, name, function):
+        totals = self.totals
+        totals.setdefault(name, 0)
+
+        if name in DRAW_FUNCTIONS:
+            def counted(*args, **kwargs):
+                self.calls += 1
+                self.drawCalls += 1
+                totals[name] += 1
+                return function(*args, **kwargs)
+
+        elif name in STATE_FUNCTIONS:
+            keyArguments = STATE_FUNCTIONS[name]
+
+            def counted(*args, **kwargs):
+                self.calls += 1
+                totals[name] += 1
+
+                # glBindTexture state is per texture unit
+                key = (name,) + args[:keyArguments]
+                if name == "glBindTexture":
+                    key += (self.state.get(("glActiveTexture",)),)
+                elif name == "glDisable":
+                    key = ("glEnable",) + args[:keyArguments]
+
+                value = (name,) + args[keyArguments:]
+                if self.state.get(key) == value:
+                    self.redundantStateChanges += 1
+                else:
+                    self.state[key] = value
+                self.stateChanges += 1
+                return function(*args, **kwargs)
+
+        elif name in UPLOAD_FUNCTIONS:
+            def counted(*args, **kwargs):
+                self.calls += 1
+                self.uploads += 1
+                self.uploadBytes += uploadBytes(name, args)
+                totals[name] += 1
+                return function(*args, **kwargs)
+
+        else:
+            match = UNIFORM_PATTERN.match(name)
+
+            def counted(*args, **kwargs):
+                self.calls += 1
+                self.uniformUploads += 1
+                self.uniformBytes += uniformBytes(match, args)
+                totals[name] += 1
+                return function(*args, **kwargs)
+
+        counted.__wrapped__ = function
+        return counted
+
+    def install(self, modules=None):
+        """
+        Wraps the GL functions in the given modules, by default in every loaded
+        module that imported them from OpenGL.GL (the applications included).
+        """
+        if modules is None:
+            modules = [module for name, module in list(sys.modules.items())
+                if hasattr(module, "__dict__") and not name.startswith("OpenGL")]
+
+        wrappers = {}
+        for name in trackedFunctions():
+            original = getattr(gl, name, None)
+            if original is not None:
+                wrappers[name] = (original, self.wrap(name, original))
+
+        for module in modules:
+            namespace = vars(module)
+            for name, (original, counted) in wrappers.items():
+                if namespace.get(name) is original:
+                    namespace[name] = counted
+                    self.installed.append((namespace, name, original))
+
+        return self
+
+    def uninstall(self):
+        for namespace, name, original in self.installed:
+            namespace[name] = original
+        self.installed.clear()
+
+    def forgetState(self):
+        """To call after changing GL state with functions not tracked, or a new context"""
+        self.state.clear()
+
+    def collectCounters(self, monitor):
+        monitor.setCounter("gl calls", self.calls)
+        monitor.setCounter("draw calls", self.drawCalls)
+        monitor.setCounter("state changes", self.stateChanges)
+        monitor.setCounter("redundant states", self.redundantStateChanges)
+        monitor.setCounter("uniform uploads", self.uniformUploads)
+        monitor.setCounter("uniform bytes", self.uniformBytes)
+        monitor.setCounter("upload bytes", self.uploadBytes)
+
+        self.lastFrame = self.frameSummary()
+        self.resetFrame()
+
+    def report(self):
+        """Calls of every function since install, most called first"""
+
+        counts = sorted(self.totals.items(), key=lambda item: -item[1])
+        return "\n".join(f"{name:>28s}: {count}" for name, count in counts if count > 0)
+
+    def frameSummary(self):
+        return f" [{self.calls} gl - {self.drawCalls} draws - {self.stateChanges} states " +\
+            f"({self.redundantStateChanges} redundant) - {self.uploadBytes + self.uniformBytes} bytes]"
+
+    def __str__(self):
+        """Counters of the last frame collected by the monitor"""
+        return self.lastFrame
+
+
+def fromEnvironment(monitor=None):
+    """
+    GLAccounting installed in every loaded module if the environment variable
+    GL_ACCOUNTING is set (and not "0"), None otherwise. It must be called once
+    the application modules are imported.
+    """
+    if os.environ.get(ENVIRONMENT_VARIABLE, "0") in ("", "0"):
+        return None
+
+    accounting = GLAccounting().install()
+    if monitor is not None:
+        monitor.addCounterSource(accounting)
+    return accounting
@@ -4,6 +4,7 @@
 #import OpenGL.GL as ogl
 from OpenGL.GL import *
 import numpy as np
+import grafica.culling as cl
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
@@ -22,6 +23,12 @@ class GPUShape:
         self.texture = None
         self.size = None
 
+        # ResourceRegistry owning the vbo, ebo and texture, if they are shared
+        self.registry = None
+
+        # Bounding box of the vertices, computed by fillBuffers
+        self.aabb = None
+
     def initBuffers(self):
         """Convenience function for initialization of OpenGL buffers.
         It returns itself to enable the convenience call:
@@ -41,31 +48,51 @@ class GPUShape:
             "  ebo=" + str(self.ebo) +\
             "  tex=" + str(self.texture)
 
-    def fillBuffers(self, vertices, indices, usage):
+    def fillBuffers(self, vertices, indices, usage, stride=None):
+        """
+        Uploads vertices and indices to the GPU.
+        Contiguous float32/uint32 arrays (as the ones of an ArrayShape) are
+        passed straight to glBufferData, lists are converted first.
+        stride, the floats per vertex, gives the bounding box used by frustum
+        culling; shapes filled without it are never culled.
+        """
 
-        vertexData = np.array(vertices, dtype=np.float32)
-        indices = np.array(indices, dtype=np.uint32)
+        vertexData = np.ascontiguousarray(vertices, dtype=np.float32)
+        indices = np.ascontiguousarray(indices, dtype=np.uint32)
 
-        self.size = len(indices)
+        self.size = indices.size
+        self.aabb = None if stride is None else cl.shapeBounds(vertexData, indices, stride)
 
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, len(vertexData) * SIZE_IN_BYTES, vertexData, usage)
+        glBufferData(GL_ARRAY_BUFFER, vertexData.nbytes, vertexData, usage)
 
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, len(indices) * SIZE_IN_BYTES, indices, usage)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, usage)
 
     def clear(self):
-        """Freeing GPU memory"""
+        """Freeing GPU memory.
+        Handles are reset, so clearing a shape reachable from several nodes
+        of a scene graph deletes its buffers only once.
+        """
 
-        if self.texture != None:
-            glDeleteTextures(1, [self.texture])
-        
-        if self.ebo != None:
-            glDeleteBuffers(1, [self.ebo])
+        if self.registry is not None:
+            self.registry.release(self)
+
+        else:
+            if self.texture != None:
+                glDeleteTextures(1, [self.texture])
 
-        if self.vbo != None:
-            glDeleteBuffers(1, [self.vbo])
+            if self.ebo != None:
+                glDeleteBuffers(1, [self.ebo])
+
+            if self.vbo != None:
+                glDeleteBuffers(1, [self.vbo])
 
         if self.vao != None:
             glDeleteVertexArrays(1, [self.vao])
-        
\ No newline at end of file
+
+        self.vao = None
+        self.vbo = None
+        self.ebo = None
+        self.texture = None
+        self.registry = None
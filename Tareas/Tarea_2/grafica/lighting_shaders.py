@@ -4,9 +4,14 @@
 from OpenGL.GL import *
 import OpenGL.GL.shaders
 from grafica.gpu_shape import GPUShape
+from grafica.instancing import InstancedShaderProgram
+import grafica.lighting_block as lb
 
 # Shader con multiples spotlights usando phong
-class MultiplePhongShaderProgram:
+class MultiplePhongShaderProgram(InstancedShaderProgram):
+
+    # Floats per vertex, as laid out by setupVAO
+    vertexStride = 9
 
     def __init__(self):
         vertex_shader = """
@@ -21,8 +26,7 @@ class MultiplePhongShaderProgram:
             out vec3 fragNormal;
 
             uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
+""" + lb.LIGHTING_BLOCK + """
 
             void main()
             {
@@ -43,38 +47,12 @@ class MultiplePhongShaderProgram:
             in vec3 fragPosition;
             in vec3 fragOriginalColor;
 
-            uniform vec3 lightPosition0; 
-            uniform vec3 lightPosition1; 
-            uniform vec3 lightPosition2;
-            uniform vec3 lightPosition3; 
-
-            uniform vec3 spotDirection1;
-            uniform vec3 spotDirection2;
-            uniform vec3 spotDirection3;
-            uniform vec3 spotDirection4;
-
-            uniform float spotConcentration;
-
-            uniform vec3 viewPosition;
-            uniform vec3 La;
-
-            uniform vec3 Ld1;
-            uniform vec3 Ld2;
-            uniform vec3 Ld3;
-            uniform vec3 Ld4;
-
-            uniform vec3 Ls1;
-            uniform vec3 Ls2;
-            uniform vec3 Ls3;
-            uniform vec3 Ls4;
+""" + lb.LIGHTING_BLOCK + """
 
             uniform vec3 Ka;
             uniform vec3 Kd;
             uniform vec3 Ks;
             uniform uint shininess;
-            uniform float constantAttenuation;
-            uniform float linearAttenuation;
-            uniform float quadraticAttenuation;
 
             void main()
             {
@@ -86,23 +64,19 @@ class MultiplePhongShaderProgram:
                 vec3 normalizedNormal = normalize(fragNormal);
 
                 vec3 result = vec3(0.0f, 0.0f, 0.0f);
-                vec3 lights[4] = vec3[](lightPosition0, lightPosition1, lightPosition2, lightPosition3);
-                vec3 spotDirections[4] = vec3[](spotDirection1, spotDirection2, spotDirection3, spotDirection4);
-                vec3 Ld[4] = vec3[](Ld1, Ld2, Ld3, Ld4);
-                vec3 Ls[4] = vec3[](Ls1, Ls2, Ls3, Ls4);
 
-                for (int i = 0; i < 4; i++)
+                for (int i = 0; i < lightCount; i++)
                 {
-                    vec3 toLight = lights[i] - fragPosition;
+                    vec3 toLight = lights[i].position - fragPosition;
                     vec3 lightDir = normalize(toLight);
                     float diff = max(dot(normalizedNormal, lightDir), 0.0);
-                    vec3 diffuse = Kd * Ld[i] * diff;
+                    vec3 diffuse = Kd * lights[i].Ld * diff;
                     
                     // specular
                     vec3 viewDir = normalize(viewPosition - fragPosition);
                     vec3 reflectDir = reflect(-lightDir, normalizedNormal);  
                     float spec = pow(max(dot(viewDir, reflectDir), 0.0), shininess);
-                    vec3 specular = Ks * Ls[i] * spec;
+                    vec3 specular = Ks * lights[i].Ls * spec;
 
                     // attenuation
                     float distToLight = length(toLight);
@@ -110,7 +84,7 @@ class MultiplePhongShaderProgram:
                         + linearAttenuation * distToLight
                         + quadraticAttenuation * distToLight * distToLight;
                     
-                    result += ((diffuse + specular) *  pow(max(dot(-spotDirections[i], lightDir), 0), spotConcentration)/ attenuation);
+                    result += ((diffuse + specular) *  pow(max(dot(-lights[i].spotDirection, lightDir), 0), spotConcentration)/ attenuation);
                 }
 
                 result = (ambient + result) * fragOriginalColor;
@@ -159,7 +133,10 @@ class MultiplePhongShaderProgram:
 
 
 # Shader con multiples spotlights con cel shading
-class MultipleCelShadingShaderProgram:
+class MultipleCelShadingShaderProgram(InstancedShaderProgram):
+
+    # Floats per vertex, as laid out by setupVAO
+    vertexStride = 9
 
     def __init__(self):
         vertex_shader = """
@@ -174,8 +151,7 @@ class MultipleCelShadingShaderProgram:
             out vec3 fragNormal;
 
             uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
+""" + lb.LIGHTING_BLOCK + """
 
             void main()
             {
@@ -196,38 +172,12 @@ class MultipleCelShadingShaderProgram:
             in vec3 fragPosition;
             in vec3 fragOriginalColor;
             
-            uniform vec3 lightPosition0; 
-            uniform vec3 lightPosition1; 
-            uniform vec3 lightPosition2; 
-            uniform vec3 lightPosition3;
-
-            uniform vec3 spotDirection1;
-            uniform vec3 spotDirection2;
-            uniform vec3 spotDirection3;
-            uniform vec3 spotDirection4;
-
-            uniform float spotConcentration;
-
-            uniform vec3 viewPosition;
-            uniform vec3 La;
-
-            uniform vec3 Ld1;
-            uniform vec3 Ld2;
-            uniform vec3 Ld3;
-            uniform vec3 Ld4;
-
-            uniform vec3 Ls1;
-            uniform vec3 Ls2;
-            uniform vec3 Ls3;
-            uniform vec3 Ls4;
+""" + lb.LIGHTING_BLOCK + """
 
             uniform vec3 Ka;
             uniform vec3 Kd;
             uniform vec3 Ks;
             uniform uint shininess;
-            uniform float constantAttenuation;
-            uniform float linearAttenuation;
-            uniform float quadraticAttenuation;
 
             // Niveles de discretizacion
             const float levels = 3.0;
@@ -242,20 +192,16 @@ class MultipleCelShadingShaderProgram:
                 vec3 normalizedNormal = normalize(fragNormal);
 
                 vec3 result = vec3(0.0f, 0.0f, 0.0f);
-                vec3 lights[4] = vec3[](lightPosition0, lightPosition1, lightPosition2, lightPosition3);
-                vec3 spotDirections[4] = vec3[](spotDirection1, spotDirection2, spotDirection3, spotDirection4);
-                vec3 Ld[4] = vec3[](Ld1, Ld2, Ld3, Ld4);
-                vec3 Ls[4] = vec3[](Ls1, Ls2, Ls3, Ls4);
 
-                for (int i = 0; i < 4; i++){
+                for (int i = 0; i < lightCount; i++){
 
-                    vec3 toLight = lights[i]- fragPosition;
+                    vec3 toLight = lights[i].position- fragPosition;
                     vec3 lightDir = normalize(toLight);
                     float diff = max(dot(normalizedNormal, lightDir), 0.0);
                     float level = floor(diff * levels);
                     
                     diff = level / levels;
-                    vec3 diffuse = Kd * Ld[i] * diff;
+                    vec3 diffuse = Kd * lights[i].Ld * diff;
                     
                     // specular
                     vec3 viewDir = normalize(viewPosition - fragPosition);
@@ -264,7 +210,7 @@ class MultipleCelShadingShaderProgram:
                     level = floor(spec * levels);
 
                     spec = level / levels;
-                    vec3 specular = Ks * Ls[i] * spec;
+                    vec3 specular = Ks * lights[i].Ls * spec;
 
                     // attenuation
                     float distToLight = length(toLight);
@@ -272,7 +218,7 @@ class MultipleCelShadingShaderProgram:
                         + linearAttenuation * distToLight
                         + quadraticAttenuation * distToLight * distToLight;
 
-                    result += ((diffuse + specular) *  pow(max(dot(-spotDirections[i], lightDir), 0), spotConcentration) / attenuation);
+                    result += ((diffuse + specular) *  pow(max(dot(-lights[i].spotDirection, lightDir), 0), spotConcentration) / attenuation);
                 }
 
                 result = (ambient + result) * fragOriginalColor;
@@ -356,7 +302,10 @@ class MultipleCelShadingShaderProgram:
 
 
 # Shader para texturas con multiples spotlights usando phong
-class MultipleTexturePhongShaderProgram:
+class MultipleTexturePhongShaderProgram(InstancedShaderProgram):
+
+    # Floats per vertex, as laid out by setupVAO
+    vertexStride = 8
 
     def __init__(self):
         vertex_shader = """
@@ -371,14 +320,18 @@ class MultipleTexturePhongShaderProgram:
             out vec3 fragNormal;
 
             uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
+
+            // Read instead of model by instanced draw calls
+            uniform bool instanced;
+            layout (location = 3) in mat4 instanceModel;
+""" + lb.LIGHTING_BLOCK + """
 
             void main()
             {
-                fragPosition = vec3(model * vec4(position, 1.0));
+                mat4 modelMatrix = instanced ? instanceModel : model;
+                fragPosition = vec3(modelMatrix * vec4(position, 1.0));
                 fragTexCoords = texCoords;
-                fragNormal = mat3(transpose(inverse(model))) * normal;  
+                fragNormal = mat3(transpose(inverse(modelMatrix))) * normal;  
                 
                 gl_Position = projection * view * vec4(fragPosition, 1.0);
             }
@@ -393,38 +346,12 @@ class MultipleTexturePhongShaderProgram:
 
             out vec4 fragColor;
 
-            uniform vec3 lightPosition0; 
-            uniform vec3 lightPosition1; 
-            uniform vec3 lightPosition2; 
-            uniform vec3 lightPosition3;
-
-            uniform vec3 spotDirection1;
-            uniform vec3 spotDirection2;
-            uniform vec3 spotDirection3;
-            uniform vec3 spotDirection4;
-
-            uniform float spotConcentration;
-
-            uniform vec3 viewPosition; 
-            uniform vec3 La;
-
-            uniform vec3 Ld1;
-            uniform vec3 Ld2;
-            uniform vec3 Ld3;
-            uniform vec3 Ld4;
-
-            uniform vec3 Ls1;
-            uniform vec3 Ls2;
-            uniform vec3 Ls3;
-            uniform vec3 Ls4;
+""" + lb.LIGHTING_BLOCK + """
 
             uniform vec3 Ka;
             uniform vec3 Kd;
             uniform vec3 Ks;
             uniform uint shininess;
-            uniform float constantAttenuation;
-            uniform float linearAttenuation;
-            uniform float quadraticAttenuation;
 
             uniform sampler2D samplerTex;
 
@@ -438,22 +365,18 @@ class MultipleTexturePhongShaderProgram:
                 vec3 normalizedNormal = normalize(fragNormal);
 
                 vec3 result = vec3(0.0f, 0.0f, 0.0f);
-                vec3 lights[4] = vec3[](lightPosition0, lightPosition1, lightPosition2, lightPosition3);
-                vec3 spotDirections[4] = vec3[](spotDirection1, spotDirection2, spotDirection3, spotDirection4);
-                vec3 Ld[4] = vec3[](Ld1, Ld2, Ld3, Ld4);
-                vec3 Ls[4] = vec3[](Ls1, Ls2, Ls3, Ls4);
 
-                for (int i = 0; i < 4; i++){
-                    vec3 toLight = lights[i] - fragPosition;
+                for (int i = 0; i < lightCount; i++){
+                    vec3 toLight = lights[i].position - fragPosition;
                     vec3 lightDir = normalize(toLight);
                     float diff = max(dot(normalizedNormal, lightDir), 0.0);
-                    vec3 diffuse = Kd * Ld[i] * diff;
+                    vec3 diffuse = Kd * lights[i].Ld * diff;
 
                     // specular
                     vec3 viewDir = normalize(viewPosition - fragPosition);
                     vec3 reflectDir = reflect(-lightDir, normalizedNormal);  
                     float spec = pow(max(dot(viewDir, reflectDir), 0.0), shininess);
-                    vec3 specular = Ks * Ls[i] * spec;
+                    vec3 specular = Ks * lights[i].Ls * spec;
 
                     // attenuation
                     float distToLight = length(toLight);
@@ -461,7 +384,7 @@ class MultipleTexturePhongShaderProgram:
                         + linearAttenuation * distToLight
                         + quadraticAttenuation * distToLight * distToLight;
 
-                    result += ((diffuse + specular) *  pow(max(dot(-spotDirections[i], lightDir), 0), spotConcentration)/ attenuation);
+                    result += ((diffuse + specular) *  pow(max(dot(-lights[i].spotDirection, lightDir), 0), spotConcentration)/ attenuation);
                 }
 
                 vec4 fragOriginalColor = texture(samplerTex, fragTexCoords);
@@ -514,7 +437,10 @@ class MultipleTexturePhongShaderProgram:
 
 
 # Shader para texturas con multiples spotlights usando cel shading
-class MultipleTextureCelShadingShaderProgram:
+class MultipleTextureCelShadingShaderProgram(InstancedShaderProgram):
+
+    # Floats per vertex, as laid out by setupVAO
+    vertexStride = 8
 
     def __init__(self):
         vertex_shader = """
@@ -529,14 +455,18 @@ class MultipleTextureCelShadingShaderProgram:
             out vec3 fragNormal;
 
             uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
+
+            // Read instead of model by instanced draw calls
+            uniform bool instanced;
+            layout (location = 3) in mat4 instanceModel;
+""" + lb.LIGHTING_BLOCK + """
 
             void main()
             {
-                fragPosition = vec3(model * vec4(position, 1.0));
+                mat4 modelMatrix = instanced ? instanceModel : model;
+                fragPosition = vec3(modelMatrix * vec4(position, 1.0));
                 fragTexCoords = texCoords;
-                fragNormal = mat3(transpose(inverse(model))) * normal;  
+                fragNormal = mat3(transpose(inverse(modelMatrix))) * normal;  
                 
                 gl_Position = projection * view * vec4(fragPosition, 1.0);
             }
@@ -551,38 +481,12 @@ class MultipleTextureCelShadingShaderProgram:
 
             out vec4 fragColor;
 
-            uniform vec3 lightPosition0; 
-            uniform vec3 lightPosition1; 
-            uniform vec3 lightPosition2; 
-            uniform vec3 lightPosition3;
-
-            uniform vec3 spotDirection1;
-            uniform vec3 spotDirection2;
-            uniform vec3 spotDirection3;
-            uniform vec3 spotDirection4;
-
-            uniform float spotConcentration;
-
-            uniform vec3 viewPosition; 
-            uniform vec3 La;
-
-            uniform vec3 Ld1;
-            uniform vec3 Ld2;
-            uniform vec3 Ld3;
-            uniform vec3 Ld4;
-
-            uniform vec3 Ls1;
-            uniform vec3 Ls2;
-            uniform vec3 Ls3;
-            uniform vec3 Ls4;
+""" + lb.LIGHTING_BLOCK + """
 
             uniform vec3 Ka;
             uniform vec3 Kd;
             uniform vec3 Ks;
             uniform uint shininess;
-            uniform float constantAttenuation;
-            uniform float linearAttenuation;
-            uniform float quadraticAttenuation;
 
             // Niveles de discretizacion
             const float levels = 3.0;
@@ -599,20 +503,16 @@ class MultipleTextureCelShadingShaderProgram:
                 vec3 normalizedNormal = normalize(fragNormal);
 
                 vec3 result = vec3(0.0f, 0.0f, 0.0f);
-                vec3 lights[4] = vec3[](lightPosition0, lightPosition1, lightPosition2, lightPosition3);
-                vec3 spotDirections[4] = vec3[](spotDirection1, spotDirection2, spotDirection3, spotDirection4);
-                vec3 Ld[4] = vec3[](Ld1, Ld2, Ld3, Ld4);
-                vec3 Ls[4] = vec3[](Ls1, Ls2, Ls3, Ls4);
 
-                for( int i = 0; i < 4; i++){
-                    vec3 toLight = lights[i] - fragPosition;
+                for( int i = 0; i < lightCount; i++){
+                    vec3 toLight = lights[i].position - fragPosition;
                     vec3 lightDir = normalize(toLight);
                     float diff = max(dot(normalizedNormal, lightDir), 0.0);
 
                     float level = floor(diff * levels);
                     diff = level / levels;
 
-                    vec3 diffuse = Kd * Ld[i] * diff;
+                    vec3 diffuse = Kd * lights[i].Ld * diff;
                     
                     // specular
                     vec3 viewDir = normalize(viewPosition - fragPosition);
@@ -622,7 +522,7 @@ class MultipleTextureCelShadingShaderProgram:
                     level = floor(spec * levels);
                     spec = level / levels;
 
-                    vec3 specular = Ks * Ls[i] * spec;
+                    vec3 specular = Ks * lights[i].Ls * spec;
 
                     // attenuation
                     float distToLight = length(toLight);
@@ -630,7 +530,7 @@ class MultipleTextureCelShadingShaderProgram:
                         + linearAttenuation * distToLight
                         + quadraticAttenuation * distToLight * distToLight;
 
-                    result += ((diffuse + specular) *  pow(max(dot(-spotDirections[i], lightDir), 0), spotConcentration) / attenuation);
+                    result += ((diffuse + specular) *  pow(max(dot(-lights[i].spotDirection, lightDir), 0), spotConcentration) / attenuation);
                 }
                     
                 vec4 fragOriginalColor = texture(samplerTex, fragTexCoords);
@@ -1,15 +1,53 @@
 # coding=utf-8
 """Simple class to monitor the frames per second of an application"""
 
+import time
+import json
+import csv
+import numpy as np
+
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
 
+# Upper edges in miliseconds of the frame time histogram, the last bin takes every longer frame
+HISTOGRAM_EDGES = [4.0, 8.0, 12.0, 16.7, 20.0, 33.3, 50.0, 100.0]
+
+PERCENTILES = [50, 95, 99]
+
+
+class SectionTimer:
+    """
+    Context manager adding the time spent inside it to a section of the monitor.
+    Every section keeps a single timer, so timing a section allocates nothing.
+    """
+    def __init__(self, monitor, name):
+        self.monitor = monitor
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.monitor.sectionTotals[self.name] += time.perf_counter() - self.start
+        self.monitor.sectionsEntered.add(self.name)
+        return False
+
+
 class PerformanceMonitor:
     """
     Convenience class to measure simple performance metrics
+
+    Besides the averaged fps, it keeps the last historySize frame times and the
+    time spent on every named section in them, to compute rolling percentiles,
+    and a histogram of every frame time since the start to spot hitches.
+
+    Per frame counters (as GL calls) are given by sources added with
+    addCounterSource, whose collectCounters(monitor) is called on every update.
     """
-    
-    def __init__(self, currentTime, period):
+
+    def __init__(self, currentTime, period, historySize=1000):
         """
         Set the first reference time and the period of time over to compute the average frames per second
         """
@@ -19,32 +57,170 @@ class PerformanceMonitor:
         self.framesCounter = 0
         self.framesPerSecond = 0.0
         self.milisecondsPerFrame = 0.0
+        self.deltaTime = 0.0
+
+        # Rolling window, entries are overwritten once historySize frames are stored
+        self.historySize = historySize
+        self.historyIndex = 0
+        self.totalFrames = 0
+        self.frameTimes = np.full(historySize, np.nan)
+        self.sectionTimes = {}     # name -> miliseconds per frame, aligned with frameTimes
+        self.sectionTotals = {}    # name -> seconds in the current frame
+        self.sectionsEntered = set()  # names timed in the current frame
+        self.sectionTimers = {}
+        self.counters = {}         # name -> value per frame, aligned with frameTimes
+        self.counterSources = []
+        self.histogram = np.zeros(len(HISTOGRAM_EDGES) + 1, dtype=np.int64)
 
     def update(self, currentTime):
         """
         It must be called once per frame to update the internal metrics
         """
         self.framesCounter += 1
-        self.timer += currentTime - self.currentTime
+        self.deltaTime = currentTime - self.currentTime
+        self.timer += self.deltaTime
         self.currentTime = currentTime
-        
+
         if self.timer > self.period:
             self.framesPerSecond = self.framesCounter / self.timer
             self.milisecondsPerFrame = 1000.0 * self.timer / self.framesCounter
             self.framesCounter = 0
             self.timer = 0.0
-        
+
+        # A counter its sources do not set this frame is left undefined, not
+        # with the value stored historySize frames ago
+        for counter in self.counters.values():
+            counter[self.historyIndex] = np.nan
+        for source in self.counterSources:
+            source.collectCounters(self)
+
+        # The sections timed since the previous update belong to the frame just
+        # finished, the ones not entered in it are undefined rather than 0 ms
+        frameTime = 1000.0 * self.deltaTime
+        self.frameTimes[self.historyIndex] = frameTime
+        for name, total in self.sectionTotals.items():
+            self.sectionTimes[name][self.historyIndex] = 1000.0 * total if name in self.sectionsEntered else np.nan
+            self.sectionTotals[name] = 0.0
+        self.sectionsEntered.clear()
+
+        self.histogram[np.searchsorted(HISTOGRAM_EDGES, frameTime)] += 1
+        self.historyIndex = (self.historyIndex + 1) % self.historySize
+        self.totalFrames += 1
+
+    def section(self, name):
+        """
+        Timer to use as "with monitor.section(name):", the time of every
+        block with the same name is added up until the next update
+        """
+        timer = self.sectionTimers.get(name)
+        if timer is None:
+            timer = SectionTimer(self, name)
+            self.sectionTimers[name] = timer
+            self.sectionTotals[name] = 0.0
+            self.sectionTimes[name] = np.full(self.historySize, np.nan)
+        return timer
+
+    def addCounterSource(self, source):
+        self.counterSources.append(source)
+
+    def setCounter(self, name, value):
+        """Value of a counter for the frame being finished, to call from collectCounters"""
+
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = np.full(self.historySize, np.nan)
+            self.counters[name] = counter
+        counter[self.historyIndex] = value
+
+    def getDeltaTime(self):
+        """
+        Get the time spent since the latest update.
+        """
+        return self.deltaTime
+
     def getFPS(self):
         """
         Returns the latest fps measure
         """
         return self.framesPerSecond
-    
+
     def getMS(self):
         """
         Returns the latest miliseconds per frame measure
         """
         return self.milisecondsPerFrame
 
+    def statistics(self, name=None):
+        """
+        Dictionary with the p50, p95, p99, max and mean over the rolling window
+        of the frame time, or of a section time or a counter given its name
+        """
+        if name is None:
+            times = self.frameTimes
+        elif name in self.sectionTimes:
+            times = self.sectionTimes[name]
+        else:
+            times = self.counters[name]
+        times = times[~np.isnan(times)]
+
+        if times.size == 0:
+            return {}
+
+        statistics = {f"p{p}": float(value) for p, value in zip(PERCENTILES, np.percentile(times, PERCENTILES))}
+        statistics["max"] = float(times.max())
+        statistics["mean"] = float(times.mean())
+        return statistics
+
+    def histogramBins(self):
+        """List of (label, frames) for every bin of the frame time histogram"""
+
+        labels = [f"< {edge} ms" for edge in HISTOGRAM_EDGES] + [f">= {HISTOGRAM_EDGES[-1]} ms"]
+        return list(zip(labels, self.histogram.tolist()))
+
+    def report(self):
+        """Percentiles of the frame and of every section, plus the histogram"""
+
+        def line(title, statistics):
+            values = " - ".join(f"{key} {value:.2f}" for key, value in statistics.items())
+            return f"{title:>16s}: {values}"
+
+        lines = [f"{self.totalFrames} frames, statistics of the last {min(self.totalFrames, self.historySize)} (times in ms)"]
+        lines += [line("frame", self.statistics())]
+        lines += [line(name, self.statistics(name)) for name in self.sectionTimes]
+        lines += [line(name, self.statistics(name)) for name in self.counters]
+        lines += [f"{label:>16s}: {frames}" for label, frames in self.histogramBins()]
+        return "\n".join(lines)
+
+    def history(self):
+        """Rows (frame, frame ms, section ms..., counters...) of the rolling window, oldest first"""
+
+        stored = min(self.totalFrames, self.historySize)
+        order = (np.arange(stored) + self.historyIndex - stored) % self.historySize
+        first = self.totalFrames - stored
+
+        columns = [self.frameTimes[order]] + [times[order] for times in self.sectionTimes.values()] +\
+            [counter[order] for counter in self.counters.values()]
+        return [[first + row] + [float(column[row]) for column in columns] for row in range(stored)]
+
+    def exportJSON(self, path):
+        data = {
+            "frames": self.totalFrames,
+            "frame": self.statistics(),
+            "sections": {name: self.statistics(name) for name in self.sectionTimes},
+            "counters": {name: self.statistics(name) for name in self.counters},
+            "histogram": dict(self.histogramBins())
+        }
+        with open(path, "w") as file:
+            json.dump(data, file, indent=4)
+
+    def exportCSV(self, path):
+        """Frame times and counters of the rolling window, empty where a section was not timed"""
+
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["frame", "frame_ms"] + [name + "_ms" for name in self.sectionTimes] + list(self.counters))
+            for row in self.history():
+                writer.writerow(["" if np.isnan(value) else value for value in row])
+
     def __str__(self):
-        return f" [{self.framesPerSecond:.2f} fps - {self.milisecondsPerFrame:.2f} ms]"
\ No newline at end of file
+        return f" [{self.framesPerSecond:.2f} fps - {self.milisecondsPerFrame:.2f} ms]"
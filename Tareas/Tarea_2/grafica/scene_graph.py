@@ -6,10 +6,68 @@ import OpenGL.GL.shaders
 import numpy as np
 import grafica.transformations as tr
 import grafica.gpu_shape as gs
+import grafica.culling as cl
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
 
+# A node shared by several parents keeps one world transform per parent,
+# up to this many, before its cache is emptied
+MAX_CACHED_PARENTS = 4
+
+
+class ChildList(list):
+    """
+    List of childs of a SceneGraphNode.
+    Every change goes through the owner, which keeps parent pointers and
+    name indices up to date. Node names must not change once added.
+    """
+    def __init__(self, owner, childs=()):
+        super().__init__()
+        self.owner = owner
+        self.extend(childs)
+
+    def append(self, child):
+        self.owner.attach(child)
+        super().append(child)
+
+    def insert(self, position, child):
+        self.owner.attach(child)
+        super().insert(position, child)
+
+    def extend(self, childs):
+        for child in list(childs):
+            self.append(child)
+
+    def __iadd__(self, childs):
+        self.extend(childs)
+        return self
+
+    def remove(self, child):
+        super().remove(child)
+        self.owner.detach(child)
+
+    def pop(self, position=-1):
+        child = super().pop(position)
+        self.owner.detach(child)
+        return child
+
+    def clear(self):
+        while len(self) > 0:
+            self.pop()
+
+    def __setitem__(self, position, child):
+        if isinstance(position, slice):
+            raise TypeError("Slice assignment is not supported on scene graph childs")
+        self.owner.attach(child)
+        self.owner.detach(self[position])
+        super().__setitem__(position, child)
+
+    def __delitem__(self, position):
+        if isinstance(position, slice):
+            raise TypeError("Slice deletion is not supported on scene graph childs")
+        self.pop(position)
+
 
 class SceneGraphNode:
     """
@@ -17,12 +75,192 @@ class SceneGraphNode:
     Each node represents a group of objects
     Each leaf represents a basic figure (GPUShape)
     To identify each node properly, it MUST have a unique name
+
+    Every node indexes the names of its subtree, so findNode takes constant
+    time, and knows its parents. Adding a node whose name is already used by
+    a different node of the graph raises ValueError.
+
+    Keeping the index up to date is what adding and removing cost: every
+    distinct ancestor updates one entry per name of the moved subtree, so a
+    subtree of k names under a tree of depth d takes O(d * k). Removing also
+    searches the childs of the parent, O(siblings), since their order is the
+    drawing order.
+
+    World transforms are cached: they are recomputed only after a new matrix
+    is assigned to transform, or when the world transform of the parent
+    changed. Matrices must be replaced, not modified in place.
+
+    Bounds of the subtree are cached as well, and recomputed only after a
+    transform below the node is replaced or nodes are added or removed.
     """
     def __init__(self, name):
         self.name = name
+        self.parents = []
+        self.boundsValid = False
         self.transform = tr.identity()
+
+        # name -> [node, number of paths from this node to it]
+        self.index = {name: [self, 1]}
         self.childs = []
 
+    def __setattr__(self, name, value):
+        # Assigned childs go through the index, reading them is a plain attribute access
+        if name == "childs":
+            value = self.replaceChilds(value)
+        super().__setattr__(name, value)
+
+    def replaceChilds(self, childs):
+        current = self.__dict__.get("childs")
+
+        # node.childs += [...] extends the list in place and assigns it back
+        if current is childs:
+            return childs
+
+        if current is not None:
+            current.clear()
+        return ChildList(self, childs)
+
+    @property
+    def parent(self):
+        """First parent of the node, None for a root"""
+        return self.parents[0] if len(self.parents) > 0 else None
+
+    def ancestors(self):
+        """This node and its ancestors, once for each path reaching them"""
+
+        yield self
+        for parent in self.parents:
+            yield from parent.ancestors()
+
+    def ancestorPaths(self):
+        """This node and each of its distinct ancestors, with the number of paths reaching it"""
+
+        counts = {}
+        for ancestor in self.ancestors():
+            entry = counts.setdefault(id(ancestor), [ancestor, 0])
+            entry[1] += 1
+        return list(counts.values())
+
+    def attach(self, child):
+        """Registers the names of a new child subtree in this node and its ancestors"""
+
+        if not isinstance(child, SceneGraphNode):
+            return
+
+        ancestors = self.ancestorPaths()
+        if any(ancestor is child for ancestor, _ in ancestors):
+            raise ValueError("A scene graph node can not be its own descendant: " + str(child.name))
+
+        # Checked before changing anything, so a failed add leaves the graph as it was
+        for ancestor, _ in ancestors:
+            for name, (node, _) in child.index.items():
+                entry = ancestor.index.get(name)
+                if entry is not None and entry[0] is not node:
+                    raise ValueError("Duplicated scene graph node name: " + str(name))
+
+        # An ancestor reached by several paths reaches the subtree through each of them
+        for ancestor, count in ancestors:
+            for name, (node, paths) in child.index.items():
+                entry = ancestor.index.setdefault(name, [node, 0])
+                entry[1] += count * paths
+
+        child.parents.append(self)
+        self.boundsChanged()
+
+    def detach(self, child):
+        """Removes the names of a removed child subtree from this node and its ancestors"""
+
+        if not isinstance(child, SceneGraphNode):
+            return
+
+        for ancestor, count in self.ancestorPaths():
+            for name, (_, paths) in child.index.items():
+                entry = ancestor.index[name]
+                entry[1] -= count * paths
+                if entry[1] == 0:
+                    del ancestor.index[name]
+
+        child.parents.remove(self)
+        self.boundsChanged()
+
+    def remove(self):
+        """Takes this node out of every parent"""
+
+        for parent in list(self.parents):
+            parent.childs.remove(self)
+
+    @property
+    def transform(self):
+        return self._transform
+
+    @transform.setter
+    def transform(self, transform):
+        self._transform = transform
+        self.worldTransforms = {}
+
+        # The bounds of this node do not include its own transform, the ones of its parents do
+        for parent in self.parents:
+            parent.boundsChanged()
+
+    def boundsChanged(self):
+        """Invalidates the bounds of this node and its ancestors"""
+
+        # An invalid node never has valid ancestors, so the walk stops at the first one
+        if not self.boundsValid:
+            return
+
+        self.boundsValid = False
+        for parent in self.parents:
+            parent.boundsChanged()
+
+    def bounds(self):
+        """
+        AABB of the subtree in the coordinates of this node, before its own
+        transform. None if some shape below it has no bounds, so the subtree
+        is never culled.
+        """
+        if self.boundsValid:
+            return self._bounds
+
+        boxes = []
+        self.leafCount = 0
+        for child in self.childs:
+            if isinstance(child, gs.GPUShape):
+                box = child.aabb
+                self.leafCount += 1
+            else:
+                box = child.bounds()
+                self.leafCount += child.leafCount
+                if box is not None:
+                    box = box.transformed(child.transform)
+
+            boxes.append(box)
+
+        self._bounds = cl.mergeBounds(boxes)
+        self.boundsValid = True
+        return self._bounds
+
+    def worldTransform(self, parentTransform):
+        """
+        parentTransform times transform, computed once per parent matrix.
+        Cached parents are recognized by identity, so an unchanged parent hands
+        the same array to its childs and their products are reused too.
+        The returned matrix is read only.
+        """
+        cached = self.worldTransforms.get(id(parentTransform))
+        if cached is not None and cached[0] is parentTransform:
+            return cached[1]
+
+        worldTransform = np.matmul(parentTransform, self._transform)
+        worldTransform.flags.writeable = False
+
+        if len(self.worldTransforms) >= MAX_CACHED_PARENTS:
+            self.worldTransforms.clear()
+
+        # The parent matrix is kept alive, so its id is never reused while cached
+        self.worldTransforms[id(parentTransform)] = (parentTransform, worldTransform)
+        return worldTransform
+
     def clear(self):
         """Freeing GPU memory"""
 
@@ -38,18 +276,9 @@ def findNode(node, name):
     if isinstance(node, gs.GPUShape):
         return None
 
-    # This is the requested node
-    if node.name == name:
-        return node
-    
-    # All childs are checked for the requested name
-    for child in node.childs:
-        foundNode = findNode(child, name)
-        if foundNode != None:
-            return foundNode
-
-    # No child of this node had the requested name
-    return None
+    # Every node indexes the names of its subtree
+    entry = node.index.get(name)
+    return None if entry is None else entry[0]
 
 
 def findTransform(node, name, parentTransform=tr.identity()):
@@ -58,7 +287,7 @@ def findTransform(node, name, parentTransform=tr.identity()):
     if isinstance(node, gs.GPUShape):
         return None
 
-    newTransform = np.matmul(parentTransform, node.transform)
+    newTransform = node.worldTransform(parentTransform)
 
     # This is the requested node
     if node.name == name:
@@ -85,11 +314,18 @@ def findPosition(node, name, parentTransform=tr.identity()):
     return None
 
 
-def drawSceneGraphNode(node, pipeline, transformName, parentTransform=tr.identity()):
+def drawSceneGraphNode(node, pipeline, transformName, parentTransform=tr.identity(), frustum=None):
     assert(isinstance(node, SceneGraphNode))
 
-    # Composing the transformations through this path
-    newTransform = np.matmul(parentTransform, node.transform)
+    # Composing the transformations through this path, cached while unchanged
+    newTransform = node.worldTransform(parentTransform)
+
+    # Subtrees out of the view are skipped as a whole
+    if frustum is not None:
+        bounds = node.bounds()
+        if bounds is not None and not frustum.intersects(bounds, newTransform):
+            frustum.culled += node.leafCount
+            return
 
     # If the child node is a leaf, it should be a GPUShape.
     # Hence, it can be drawn with drawCall
@@ -98,9 +334,47 @@ def drawSceneGraphNode(node, pipeline, transformName, parentTransform=tr.identit
         glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, transformName), 1, GL_TRUE, newTransform)
         pipeline.drawCall(leaf)
 
+        if frustum is not None:
+            frustum.submitted += 1
+
     # If the child node is not a leaf, it MUST be a SceneGraphNode,
     # so this draw function is called recursively
     else:
         for child in node.childs:
-            drawSceneGraphNode(child, pipeline, transformName, newTransform)
+            drawSceneGraphNode(child, pipeline, transformName, newTransform, frustum)
+
+
+
+def collectLeaves(node, parentTransform, gpuShapes, transforms, frustum=None):
+    """Appends the GPUShapes below node and their world transforms, in drawing order"""
+
+    newTransform = node.worldTransform(parentTransform)
 
+    if frustum is not None:
+        bounds = node.bounds()
+        if bounds is not None and not frustum.intersects(bounds, newTransform):
+            frustum.culled += node.leafCount
+            return
+
+    if len(node.childs) == 1 and isinstance(node.childs[0], gs.GPUShape):
+        gpuShapes.append(node.childs[0])
+        transforms.append(newTransform)
+
+        if frustum is not None:
+            frustum.submitted += 1
+        return
+
+    for child in node.childs:
+        collectLeaves(child, newTransform, gpuShapes, transforms, frustum)
+
+
+def drawSceneGraphInstanced(node, pipeline, transformName, parentTransform=tr.identity(), frustum=None):
+    """
+    As drawSceneGraphNode, but every copy of a shape in the subtree is drawn by
+    one instanced call when the pipeline supports it. Leaves are grouped by
+    shape instead of following the graph, so the subtree must be opaque.
+    """
+    gpuShapes = []
+    transforms = []
+    collectLeaves(node, parentTransform, gpuShapes, transforms, frustum)
+    pipeline.drawShapes(gpuShapes, transforms, transformName, ordered=False)
@@ -10,33 +10,28 @@ import grafica.basic_shapes as bs
 import grafica.transformations as tr
 import grafica.scene_graph as sg
 import grafica.easy_shaders as es
+import grafica.resource_registry as rr
 from grafica.assets_path import *
 from obj_reader import *
 
 
+# Registro de recursos: las partes del modelo comparten la textura de la camiseta,
+# que se carga una sola vez y se libera con el ultimo clear()
+resourceRegistry = rr.ResourceRegistry()
+
 # Convenience function to ease initialization
 def createGPUShape(pipeline, shape, draw = GL_DYNAMIC_DRAW):
-    gpuShape = es.GPUShape().initBuffers()
-    pipeline.setupVAO(gpuShape)
-    gpuShape.fillBuffers(shape.vertices, shape.indices, draw)
-    return gpuShape
+    return resourceRegistry.createGPUShape(pipeline, shape, draw)
 
 # Crea gpu de texturas
-def createTextureGPUShape(shape, pipeline, path):
+def createTextureGPUShape(shape, pipeline, path, wrapMode=GL_CLAMP_TO_EDGE, filterMode=GL_NEAREST):
     # Funcion Conveniente para facilitar la inicializacion de un GPUShape con texturas
-    gpuShape = es.GPUShape().initBuffers()
-    pipeline.setupVAO(gpuShape)
-    gpuShape.fillBuffers(shape.vertices, shape.indices, GL_STATIC_DRAW)
-    gpuShape.texture = es.textureSimpleSetup(
-        path, GL_CLAMP_TO_EDGE, GL_CLAMP_TO_EDGE, GL_NEAREST, GL_NEAREST)
-    return gpuShape
+    return resourceRegistry.createGPUShape(pipeline, shape, GL_STATIC_DRAW, path, wrapMode, filterMode)
 
 # Skybox con fondo de estadio
 def createSceneSkybox(pipeline):
     shapeStadium = bs.createTextureNormalsCube('estadio.jpg')
-    gpuStadium = createGPUShape(pipeline, shapeStadium, GL_STATIC_DRAW)
-    gpuStadium.texture = es.textureSimpleSetup(
-        getAssetPath("estadio.jpg"), GL_REPEAT, GL_REPEAT, GL_LINEAR, GL_LINEAR)
+    gpuStadium = createTextureGPUShape(shapeStadium, pipeline, getAssetPath("estadio.jpg"), GL_REPEAT, GL_LINEAR)
     
     skybox = sg.SceneGraphNode("skybox")
     skybox.transform = tr.matmul([tr.translate(0, 0, 24.8), tr.scale(1, 2, 1), tr.uniformScale(70)])
@@ -46,9 +41,7 @@ def createSceneSkybox(pipeline):
 # Piso con textura de cancha de futbol
 def createFloor(pipeline):
     shapeFloor = bs.createTextureNormalsQuad(1,1)
-    gpuFloor = createGPUShape(pipeline, shapeFloor, GL_STATIC_DRAW)
-    gpuFloor.texture = es.textureSimpleSetup(
-        getAssetPath("cancha.jpg"), GL_REPEAT, GL_REPEAT, GL_LINEAR, GL_LINEAR)
+    gpuFloor = createTextureGPUShape(shapeFloor, pipeline, getAssetPath("cancha.jpg"), GL_REPEAT, GL_LINEAR)
 
     floor = sg.SceneGraphNode("floor")
     floor.transform = tr.matmul([tr.translate(0, 0, -0.38),tr.scale(70, 140, 1), tr.rotationZ(np.pi/2)])
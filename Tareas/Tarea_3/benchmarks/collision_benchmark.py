@@ -0,0 +1,101 @@
+# coding=utf-8
+"""Time per physics step of the ball-ball collisions: pair by pair loop against sweep and prune, and settled tables"""
+
+import sys
+import os.path
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pool_physics as pp
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+BORDER_WIDTH = 1.46
+BORDER_HEIGHT = 2.74
+RADIUS = 0.028875
+
+# Beyond this the pair by pair loop takes too long to be worth measuring
+MAX_LOOP_BALLS = 800
+
+
+def createScene(count, rng):
+    """
+    count balls spread over the table, shrunk when needed so they cover at most a
+    third of it, moving in random directions
+    """
+    free = pp.CUSHION_OFFSET + RADIUS
+    area = (BORDER_WIDTH - 2 * free) * (BORDER_HEIGHT - 2 * free)
+    radius = min(RADIUS, np.sqrt(area / (3 * np.pi * count)))
+
+    positions = np.zeros((count, 3))
+    positions[:, 0] = rng.uniform(-BORDER_WIDTH / 2 + free, BORDER_WIDTH / 2 - free, count)
+    positions[:, 1] = rng.uniform(-BORDER_HEIGHT / 2 + free, BORDER_HEIGHT / 2 - free, count)
+
+    velocities = np.zeros((count, 3))
+    velocities[:, :2] = rng.uniform(-1, 1, (count, 2))
+
+    return pp.PoolPhysics(positions, velocities, np.full(count, radius), 0.5, 0.98, 0.9999,
+        BORDER_WIDTH, BORDER_HEIGHT, [(10.0, 10.0, 0.0)], RADIUS)
+
+
+def loopPairs(positions, radii):
+    """Every pair checked one at a time, as the pool loop did before the broad phase"""
+
+    pairs = []
+    for i in range(len(positions)):
+        for j in range(i + 1, len(positions)):
+            if np.linalg.norm(positions[i] - positions[j]) < radii[i] + radii[j]:
+                pairs.append((i, j))
+    return pairs
+
+
+def measureSteps(physics, steps, deltaTime):
+    start = time.perf_counter()
+    collisions = 0
+    moved = 0
+    for _ in range(steps):
+        physics.step(deltaTime)
+        collisions += physics.collisions
+        moved += physics.broadPhase.moved
+    milliseconds = 1000.0 * (time.perf_counter() - start) / steps
+    return milliseconds, collisions / steps, moved / steps
+
+
+if __name__ == "__main__":
+
+    counts = [int(argument) for argument in sys.argv[1:]] or [16, 100, 500, 1000, 2000, 5000]
+    steps = 60
+    deltaTime = 1 / 120
+    rng = np.random.default_rng(0)
+
+    print(f"{steps} steps of {1000 * deltaTime:.2f} ms, milliseconds per step")
+    print("loop: finding the touching pairs one at a time, sweep: whole step of the engine,")
+    print("settled: whole step once every ball is sleeping")
+    print(f"{'balls':>6s} {'loop':>10s} {'sweep':>10s} {'settled':>8s} {'candidates':>11s} {'collisions':>11s} {'moved':>8s}")
+
+    for count in counts:
+        physics = createScene(count, rng)
+
+        # Same pairs as the loop, on the starting positions
+        loopTime = float("nan")
+        if count <= MAX_LOOP_BALLS:
+            start = time.perf_counter()
+            pairs = loopPairs(physics.positions, physics.radii)
+            loopTime = 1000.0 * (time.perf_counter() - start)
+
+            first, second = physics.collidingPairs()
+            assert pairs == list(zip(first.tolist(), second.tolist())), count
+
+        physics.step(deltaTime)
+        sweepTime, collisions, moved = measureSteps(physics, steps, deltaTime)
+        candidates = physics.broadPhase.candidates
+
+        # Every ball stopped, after sleepSteps steps they all sleep
+        physics.velocities[:] = 0.0
+        for _ in range(physics.sleepSteps + 1):
+            physics.step(deltaTime)
+        assert not physics.awake().any()
+        settledTime = measureSteps(physics, steps, deltaTime)[0]
+
+        print(f"{count:6d} {loopTime:10.2f} {sweepTime:10.2f} {settledTime:8.3f} {candidates:11d} {collisions:11.1f} {moved:8.1f}")
@@ -0,0 +1,83 @@
+# coding=utf-8
+"""Event driven physics against fixed steps: cost of a break and tunneling at high cue speeds"""
+
+import sys
+import os.path
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pool_physics as pp
+import event_physics as ep
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+BORDER_WIDTH = 1.46
+BORDER_HEIGHT = 2.74
+RADIUS = 0.028875
+MU = 0.5
+GRAVITY = 0.98
+RESTITUTION = 0.9999
+
+OFFSET = 0.1
+HOLES = [(x, y, 0.0) for x in (BORDER_WIDTH / 2 - OFFSET, -BORDER_WIDTH / 2 + OFFSET)
+    for y in (BORDER_HEIGHT / 2 - OFFSET, 0.0, -BORDER_HEIGHT / 2 + OFFSET)]
+
+
+def createBreak(engine, speed):
+    """Fifteen racked balls and the cue ball shot straight at them"""
+
+    rack = [((k - row / 2) * 2.001 * RADIUS, -0.5 - row * 2.001 * RADIUS * 0.87, 0.0)
+        for row in range(5) for k in range(row + 1)]
+    positions = np.array(rack + [(0.0, 0.5, 0.0)])
+    velocities = np.zeros_like(positions)
+    velocities[-1] = (0.01, -speed, 0.0)
+
+    return engine(positions, velocities, np.full(len(positions), RADIUS), MU, GRAVITY, RESTITUTION,
+        BORDER_WIDTH, BORDER_HEIGHT, HOLES, RADIUS, pocketable=[True] * (len(positions) - 1) + [False])
+
+
+def simulate(physics, duration, deltaTime):
+    start = time.perf_counter()
+    for _ in range(int(round(duration / deltaTime))):
+        physics.step(deltaTime)
+    return time.perf_counter() - start
+
+
+def hitsObjectBall(engine, speed, deltaTime):
+    """True if a cue ball at speed moves the object ball placed in its way"""
+
+    positions = [(0.0, -1.0, 0.0), (0.0, 0.2, 0.0)]
+    velocities = [(0.0, speed, 0.0), (0.0, 0.0, 0.0)]
+    physics = engine(positions, velocities, [RADIUS, RADIUS], MU, GRAVITY, RESTITUTION,
+        BORDER_WIDTH, BORDER_HEIGHT, HOLES, RADIUS, pocketable=[False, False])
+
+    # Hasta antes del rebote en la banda del fondo
+    for _ in range(int(round(1.3 / speed / deltaTime)) + 1):
+        physics.step(deltaTime)
+        if physics.velocities[1, 1] != 0.0:
+            return True
+    return False
+
+
+if __name__ == "__main__":
+
+    duration = 10.0
+    frame = 1 / 60
+
+    print(f"Break at 3 m/s, {duration} simulated seconds")
+    for name, engine, deltaTime in [("fixed 120 Hz", pp.PoolPhysics, 1 / 120), ("fixed 1000 Hz", pp.PoolPhysics, 1 / 1000),
+            ("events, 60 fps", ep.EventPhysics, frame)]:
+        physics = createBreak(engine, 3.0)
+        seconds = simulate(physics, duration, deltaTime)
+        print(f"{name:>16s}: {1000 * seconds:8.1f} ms, pocketed {int(physics.pocketed.sum())}", end="")
+        if engine is ep.EventPhysics:
+            print(f", {physics.eventCounts}, {physics.searches} event searches", end="")
+        print()
+
+    print("Cue ball hitting a ball 1.2 m away, step of the fixed engine 1/120 s")
+    print(f"{'speed':>8s} {'fixed':>6s} {'events':>7s}")
+    for speed in [2, 10, 20, 40, 80, 160]:
+        fixed = hitsObjectBall(pp.PoolPhysics, speed, 1 / 120)
+        events = hitsObjectBall(ep.EventPhysics, speed, 1 / 120)
+        print(f"{speed:8d} {str(fixed):>6s} {str(events):>7s}")
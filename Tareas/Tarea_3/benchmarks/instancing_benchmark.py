@@ -0,0 +1,98 @@
+# coding=utf-8
+"""Frame time and draw calls of thousands of spheres, drawn one by one and instanced"""
+
+import sys
+import os.path
+import time
+import glfw
+from OpenGL.GL import *
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import grafica.transformations as tr
+import grafica.headless as hl
+import grafica.lighting_shaders as ls
+import grafica.lighting_block as lb
+import grafica.shader_program as sp
+import grafica.resource_registry as rr
+import grafica.assets_path as ap
+import shapes_3D as s3d
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+
+def createTransforms(count):
+    side = int(np.ceil(np.sqrt(count)))
+    return [tr.matmul([tr.translate(i % side - side / 2, i // side - side / 2, 0), tr.uniformScale(0.8)])
+        for i in range(count)]
+
+
+def drawOneByOne(pipeline, gpuShape, transforms):
+    for transform in transforms:
+        pipeline.setMat4("model", transform)
+        pipeline.drawCall(gpuShape)
+
+
+def measure(headless, window, draw, frames):
+    sp.callCounter.reset()
+    draw()
+    glFinish()
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        draw()
+        headless.swapBuffers(window)
+    glFinish()
+    milliseconds = 1000.0 * (time.perf_counter() - start) / frames
+    return milliseconds, sp.callCounter.drawCalls // (frames + 1)
+
+
+if __name__ == "__main__":
+
+    # Always offscreen, so it also runs without a display: PYOPENGL_PLATFORM=egl
+    headless = hl.HeadlessMode(frames=0)
+    if not headless.init():
+        sys.exit(1)
+
+    glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 4)
+    glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 1)
+    glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, GL_TRUE)
+    glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
+    window = headless.createWindow(640, 640, "Instancing benchmark")
+    if not window:
+        glfw.terminate()
+        sys.exit(1)
+
+    glEnable(GL_DEPTH_TEST)
+
+    pipeline = ls.MultipleTexturePhongShaderProgram()
+    lightingBlock = lb.LightingBlock()
+    lightingBlock.attach(pipeline)
+    lightingBlock.setCamera(tr.lookAt(np.array([0, 0, 60]), np.array([0, 0, 0]), np.array([0, 1, 0])),
+        tr.perspective(60, 1, 0.1, 200), [0, 0, 60])
+    lightingBlock.setAmbient([1.0, 1.0, 1.0])
+    lightingBlock.upload()
+
+    glUseProgram(pipeline.shaderProgram)
+    pipeline.setVec3("Ka", (1.0, 1.0, 1.0))
+
+    registry = rr.ResourceRegistry()
+    gpuShape = registry.createGPUShape(pipeline, s3d.createTextureNormalSphere(20),
+        texturePath=ap.getAssetPath("sombra.png"))
+
+    frames = 20
+    print(f"Average over {frames} frames")
+    for count in [16, 1000, 5000, 10000]:
+        transforms = createTransforms(count)
+        oneByOne, oneByOneCalls = measure(headless, window, lambda: drawOneByOne(pipeline, gpuShape, transforms), frames)
+        instanced, instancedCalls = measure(headless, window, lambda: pipeline.drawInstanced(gpuShape, transforms), frames)
+        print(f"  {count} spheres: one by one {oneByOne:.2f} ms ({oneByOneCalls} draws), " +
+            f"instanced {instanced:.2f} ms ({instancedCalls} draws)")
+
+    pipeline.clearInstancing()
+    gpuShape.clear()
+    registry.clear()
+    lightingBlock.clear()
+    headless.clear()
+    glfw.terminate()
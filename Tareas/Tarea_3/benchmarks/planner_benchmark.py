@@ -0,0 +1,56 @@
+# coding=utf-8
+"""Candidates per second of the shot planner, in process and over worker processes"""
+
+import sys
+import os.path
+import time
+import copy
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pool_simulation as ps
+import shot_planner as sp
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+RATE = 120
+
+
+def simulateOne(physics, cue, shot, maxTime):
+    """Pocketed balls of a shot simulated alone on a copy of physics, to check the batched tables"""
+
+    initial = int(np.count_nonzero(physics.pocketed))
+    physics = copy.deepcopy(physics)
+    physics.velocities[cue] = shot.velocity()
+    for _ in range(int(np.ceil(maxTime * RATE - 1e-9))):
+        physics.step(1 / RATE)
+        if not physics.isMoving(ps.REST_SPEED):
+            break
+    return int(np.count_nonzero(physics.pocketed)) - initial
+
+
+if __name__ == "__main__":
+
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    physics = ps.createTable(0.5, 0.999999999)
+    cue = len(physics) - 1
+    # The planner runs on a table at rest, with its balls asleep
+    while not physics.sleeping.all():
+        physics.step(1 / RATE)
+
+    print(f"Break position, {budget} s budget, {os.cpu_count()} cores")
+    for workers in sorted({0, 1, os.cpu_count() or 1}):
+        planner = sp.ShotPlanner(workers=workers, deltaTime=1 / RATE)
+        # The first plan starts the worker processes
+        planner.plan(physics, cue, budget=0.1, seed=0)
+
+        start = time.perf_counter()
+        shots = planner.plan(physics, cue, budget=budget, seed=0)
+        print(f"{workers:2d} workers: {planner.report()}, {time.perf_counter() - start:.2f} s wall")
+        planner.close()
+
+    # A partial shot was cut at the deadline, its pocketed balls are a lower bound
+    for shot in shots[:3]:
+        pocketed = simulateOne(physics, cue, shot, planner.maxTime)
+        assert pocketed >= shot.pocketed if shot.partial else pocketed == shot.pocketed
+        print(f"  {shot}")
@@ -0,0 +1,77 @@
+# coding=utf-8
+"""Cost of recording every physics step of a break, and of seeking in the recording"""
+
+import sys
+import os.path
+import time
+import tempfile
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pool_simulation as ps
+import pool_recording as pr
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+RATE = 120
+FRAME_MILISECONDS = 1000.0 / 60
+
+
+def breakShot():
+    physics = ps.createTable(0.5, 0.999999999)
+    physics.velocities[-1, :2] = (0.05, -4.0)
+    return physics
+
+
+def simulate(physics, steps, recorder=None):
+    """Miliseconds spent stepping and recording, measured apart"""
+
+    stepTime = 0.0
+    recordTime = 0.0
+    for _ in range(steps):
+        start = time.perf_counter()
+        physics.step(1 / RATE)
+        middle = time.perf_counter()
+        if recorder is not None:
+            recorder.record(physics, 1 / RATE)
+        stepTime += middle - start
+        recordTime += time.perf_counter() - middle
+    return 1000.0 * stepTime, 1000.0 * recordTime
+
+
+if __name__ == "__main__":
+
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    path = os.path.join(tempfile.mkdtemp(), "break.rec")
+
+    physics = breakShot()
+    with pr.PoolRecorder(path, len(physics), 1 / RATE) as recorder:
+        stepTime, recordTime = simulate(physics, steps, recorder)
+
+    perStep = 1000.0 * recordTime / steps
+    perFrame = perStep * RATE / 60
+    print(f"{steps} steps at {RATE} Hz, {os.path.getsize(path) / 1024:.1f} KiB, "
+        f"{os.path.getsize(path) / steps:.0f} bytes per step")
+    print(f"physics {1000.0 * stepTime / steps:.1f} us per step - recording {perStep:.2f} us per step")
+    print(f"recording at 60 fps: {perFrame:.2f} us per frame, {100 * perFrame / (1000 * FRAME_MILISECONDS):.3f}% of a frame")
+
+    # Every recorded step comes back as stored, in float32
+    recording = pr.PoolRecording(path)
+    assert len(recording) == steps
+
+    reference = breakShot()
+    for index in range(steps):
+        reference.step(1 / RATE)
+        if index % 97 == 0:
+            positions, velocities, pocketed = recording.state(recording.times[index])
+            assert np.allclose(positions, reference.positions, atol=1e-5)
+            assert np.array_equal(pocketed, reference.pocketed)
+
+    replay = pr.PoolReplay(recording)
+    replayed = breakShot()
+    seeks = np.random.default_rng(0).uniform(0, recording.duration, 10000)
+    start = time.perf_counter()
+    for seek in seeks:
+        replay.seek(seek)
+        replay.apply(replayed)
+    print(f"random seek and apply: {1e6 * (time.perf_counter() - start) / len(seeks):.1f} us")
@@ -0,0 +1,76 @@
+# coding=utf-8
+"""Texture loads served by the registry cache, and eviction of unreferenced textures over budget"""
+
+import sys
+import os.path
+import time
+import glfw
+from OpenGL.GL import *
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import grafica.headless as hl
+import grafica.resource_registry as rr
+import grafica.assets_path as ap
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+# Ball textures
+TEXTURES = [ap.getAssetPath(f"{number}.png") for number in range(1, 16)]
+
+# Unreferenced textures the budget can keep loaded, about
+CACHED = 4
+
+
+def loadAll(registry, paths):
+    """Acquires and releases every texture, as a scene loaded and unloaded in turn"""
+
+    start = time.perf_counter()
+    for path in paths:
+        registry.releaseTexture(registry.acquireTexture(path))
+    return 1000.0 * (time.perf_counter() - start) / len(paths)
+
+
+if __name__ == "__main__":
+
+    # Always offscreen, so it also runs without a display: PYOPENGL_PLATFORM=egl
+    headless = hl.HeadlessMode(frames=0)
+    if not headless.init():
+        sys.exit(1)
+
+    glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 3)
+    glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 3)
+    glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, GL_TRUE)
+    glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
+    window = headless.createWindow(64, 64, "Texture budget benchmark")
+    if not window:
+        glfw.terminate()
+        sys.exit(1)
+
+    probe = rr.ResourceRegistry(maxTextureBytes=0)
+    probe.acquireTexture(TEXTURES[0])
+    textureBytes = probe.textureBytes()
+    probe.clear()
+
+    budget = CACHED * textureBytes
+    registry = rr.ResourceRegistry(maxTextureBytes=budget)
+    print(f"{len(TEXTURES)} textures, budget of {budget} bytes ({CACHED} times the first one)")
+
+    # Filling the budget with unreferenced textures, then acquiring past it
+    # without releasing anything must free the least recently used ones
+    loadAll(registry, TEXTURES[:CACHED])
+    held = [registry.acquireTexture(path) for path in TEXTURES[CACHED:CACHED + 2]]
+    assert registry.textureBytes() <= budget, registry.report()
+    assert all(registry.textures[key].refCount > 0 for key in list(registry.textures)[-2:])
+    print(f"  after acquiring past the budget: {len(registry.textures)} textures loaded, "
+        f"{registry.textureBytes()} bytes")
+    for texture in held:
+        registry.releaseTexture(texture)
+
+    cold = loadAll(registry, TEXTURES)
+    warm = loadAll(registry, TEXTURES[-CACHED:])
+    print(f"  load from disk {cold:.2f} ms, load from cache {warm:.3f} ms per texture")
+    assert registry.textureBytes() <= budget
+
+    registry.clear()
+    headless.clear()
+    glfw.terminate()
@@ -0,0 +1,82 @@
+# coding=utf-8
+"""Time per transform of tr.matmul chains against closed form quaternion and TRS matrices"""
+
+import sys
+import os.path
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import grafica.transformations as tr
+import grafica.quaternion as qt
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+
+def measure(function, arguments):
+    start = time.perf_counter()
+    for argument in arguments:
+        function(*argument)
+    return (time.perf_counter() - start) / len(arguments) * 1e6
+
+
+def jointMatmul(thetaX, thetaY, thetaZ):
+    return tr.matmul([tr.rotationX(thetaX), tr.rotationY(thetaY), tr.rotationZ(thetaZ)])
+
+
+def jointQuaternion(thetaX, thetaY, thetaZ):
+    return qt.Quaternion.fromEuler(thetaX, thetaY, thetaZ).matrix()
+
+
+def ballMatmul(x, y, scale):
+    return tr.matmul([tr.translate(x, y, 0.0), tr.uniformScale(scale), tr.rotationZ(np.pi)])
+
+
+HALF_TURN = qt.Quaternion.fromEuler(0, 0, np.pi)
+
+def ballTRS(x, y, scale):
+    return qt.trsMatrix((x, y, 0.0), HALF_TURN, (scale, scale, scale))
+
+
+def composeMatmul(x, y, thetaX, thetaY):
+    parent = tr.matmul([tr.translate(x, y, 0), tr.rotationX(thetaX)])
+    child = tr.matmul([tr.translate(0, 0, 1), tr.rotationY(thetaY), tr.uniformScale(0.5)])
+    return tr.matmul([parent, child])
+
+
+def composeTRS(x, y, thetaX, thetaY):
+    parent = qt.TRS((x, y, 0), qt.Quaternion.fromEuler(thetaX, 0, 0))
+    child = qt.TRS((0, 0, 1), qt.Quaternion.fromEuler(0, thetaY, 0), (0.5, 0.5, 0.5))
+    return (parent * child).matrix()
+
+
+def slerpMatrices(thetaX, thetaY, t):
+    q1 = qt.Quaternion.fromEuler(thetaX, 0, 0)
+    q2 = qt.Quaternion.fromEuler(0, thetaY, 0)
+    return qt.slerp(q1, q2, t).matrix()
+
+
+if __name__ == "__main__":
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = np.random.default_rng(0)
+
+    cases = [
+        ("joint rotation X·Y·Z", jointMatmul, jointQuaternion, rng.uniform(-np.pi, np.pi, (count, 3))),
+        ("ball translate·scale·rotate", ballMatmul, ballTRS, rng.uniform(0.1, 1, (count, 3))),
+        ("parent·child composition", composeMatmul, composeTRS, rng.uniform(-np.pi, np.pi, (count, 4))),
+    ]
+
+    print(f"{count} transforms per case, microseconds per transform")
+    for name, reference, closedForm, arguments in cases:
+        arguments = arguments.tolist()
+
+        for argument in arguments[:100]:
+            assert np.allclose(reference(*argument), closedForm(*argument), atol=1e-5), name
+
+        matmulTime = measure(reference, arguments)
+        closedTime = measure(closedForm, arguments)
+        print(f"{name:30s} tr.matmul {matmulTime:7.2f} us - quaternion {closedTime:7.2f} us - {matmulTime / closedTime:.2f}x")
+
+    arguments = rng.uniform(0, 1, (count, 3)).tolist()
+    print(f"{'slerp to matrix':30s} {measure(slerpMatrices, arguments):7.2f} us")
@@ -0,0 +1,104 @@
+# coding=utf-8
+"""Fase amplia de choques entre bolas: ordenar y barrer a lo largo de la mesa"""
+
+import numpy as np
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+
+# Con mas elementos fuera de lugar conviene el ordenamiento estable de NumPy, que
+# sobre datos casi ordenados solo mezcla los tramos ya ordenados
+INSERTION_LIMIT = 32
+
+
+def insertionSort(order, keys):
+    """
+    Ordena order en su lugar segun keys[order], moviendo solo los elementos fuera
+    de lugar. Entre frames las bolas se mueven poco, asi casi todo ya esta ordenado.
+    Devuelve cuantos elementos estaban fuera de lugar.
+    """
+    sortedKeys = keys[order]
+
+    # Un elemento esta en su lugar si no es menor que ninguno anterior, el maximo
+    # de los anteriores no cambia al reordenarlos
+    previousMax = np.maximum.accumulate(sortedKeys)
+    outOfPlace = np.flatnonzero(sortedKeys[1:] < previousMax[:-1]) + 1
+
+    if len(outOfPlace) > INSERTION_LIMIT:
+        order[:] = order[np.argsort(sortedKeys, kind="stable")]
+        return len(outOfPlace)
+
+    # En listas de Python, indexar arreglos elemento a elemento es mas lento
+    indices = order.tolist()
+    sortedKeys = sortedKeys.tolist()
+    for i in outOfPlace.tolist():
+        index = indices[i]
+        key = sortedKeys[i]
+        j = i
+        while j > 0 and sortedKeys[j - 1] > key:
+            indices[j] = indices[j - 1]
+            sortedKeys[j] = sortedKeys[j - 1]
+            j -= 1
+        indices[j] = index
+        sortedKeys[j] = key
+
+    if len(outOfPlace) > 0:
+        order[:] = indices
+    return len(outOfPlace)
+
+
+class SweepAndPrune:
+    """
+    Mantiene las bolas ordenadas por el inicio de su intervalo en un eje (y, el
+    largo de la mesa) y entrega como candidatos los pares cuyos intervalos se
+    cruzan en ese eje y en el otro. El orden se corrige con insertionSort en
+    cada paso en vez de ordenar desde cero.
+    """
+    def __init__(self, axis=1):
+        self.axis = axis
+        self.otherAxis = 1 - axis
+        self.order = np.zeros(0, dtype=np.int64)
+        self.moved = 0
+        self.candidates = 0
+
+    def update(self, positions, radii):
+        """Corrige el orden de las bolas, se ordenan desde cero si cambio su numero"""
+
+        count = len(positions)
+        if len(self.order) != count:
+            self.order = np.argsort(positions[:, self.axis] - radii, kind="stable")
+
+        self.moved = insertionSort(self.order, positions[:, self.axis] - radii)
+
+    def candidatePairs(self, positions, radii, active=None):
+        """
+        Pares (i, j) con i < j cuyas cajas se cruzan, ordenados por i y luego j.
+        Llamar despues de update con las mismas posiciones.
+        """
+        order = self.order if active is None else self.order[active[self.order]]
+
+        center = positions[order, self.axis]
+        radius = radii[order]
+        minimum = center - radius
+        maximum = center + radius
+
+        # Cada bola se cruza con las siguientes del orden hasta la primera que parte despues de su fin
+        end = np.searchsorted(minimum, maximum, side="right")
+        counts = np.maximum(end - np.arange(len(order)) - 1, 0)
+
+        first = np.repeat(np.arange(len(order)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = first + 1 + offsets
+
+        # Se descartan los que no se cruzan en el otro eje
+        other = positions[order, self.otherAxis]
+        overlap = np.abs(other[first] - other[second]) < radius[first] + radius[second]
+        first = order[first[overlap]]
+        second = order[second[overlap]]
+
+        # Mismo orden que el doble ciclo sobre los indices originales
+        first, second = np.minimum(first, second), np.maximum(first, second)
+        sorting = np.lexsort((second, first))
+        self.candidates = len(sorting)
+        return first[sorting], second[sorting]
@@ -0,0 +1,348 @@
+# coding=utf-8
+"""Fisica de pool por eventos: las bolas avanzan en forma exacta hasta el siguiente choque"""
+
+import bisect
+import numpy as np
+from pool_physics import PoolPhysics, collisionImpulse, CUSHION_OFFSET
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+# Tipos de evento
+STOP = "stop"
+CUSHION = "cushion"
+POCKET = "pocket"
+BALL = "ball"
+
+# Con bolas atrapadas entre otras los choques se repiten sin fin, sobre este
+# numero de eventos en un paso el resto del paso avanza sin buscar eventos
+MAX_EVENTS = 10000
+
+
+def quadraticRoot(a, b, c):
+    """
+    Menor raiz de a t^2 + b t + c con a > 0, inf si no hay. Escrita de la forma
+    que no resta numeros parecidos.
+    """
+    discriminant = b * b - 4 * a * c
+    root = np.full(np.shape(a), np.inf)
+    real = discriminant >= 0
+    sqrt = np.sqrt(np.where(real, discriminant, 0.0))
+
+    # Con b < 0 ambas raices son positivas o ninguna lo es
+    q = -0.5 * (b - sqrt)
+    smaller = np.where(b < 0, c / np.where(q != 0, q, 1.0), (-b - sqrt) / (2 * a))
+    root[real] = smaller[real]
+    return root
+
+
+def contactTimes(d0, dv, da, distance, limit):
+    """
+    Primer instante en (0, limit] en que la distancia entre dos puntos llega a
+    distance acercandose, con diferencia de posicion d0 + dv t + da t^2 / 2.
+    Vectorizado sobre K pares (arreglos (K, 2) y (K,)), inf si no hay contacto.
+
+    |d(t)|^2 - distance^2 es un polinomio de grado 4, de grado 2 si las
+    aceleraciones son iguales. Las raices de grado 4 son los valores propios de
+    la matriz companera, calculados para todos los pares a la vez.
+    """
+    c4 = 0.25 * np.sum(da * da, axis=1)
+    c3 = np.sum(dv * da, axis=1)
+    c2 = np.sum(dv * dv, axis=1) + np.sum(d0 * da, axis=1)
+    c1 = 2 * np.sum(d0 * dv, axis=1)
+    c0 = np.sum(d0 * d0, axis=1) - distance * distance
+
+    times = np.full(len(d0), np.inf)
+
+    # Ya se tocan y se siguen acercando
+    times[(c0 <= 0) & (c1 < 0)] = 0.0
+
+    # Misma aceleracion: c2 t^2 + c1 t + c0, solo se tocan si se acercan
+    quadratic = (c4 == 0) & (c0 > 0) & (c1 < 0) & (c2 > 0)
+    if np.any(quadratic):
+        times[quadratic] = quadraticRoot(c2[quadratic], c1[quadratic], c0[quadratic])
+
+    quartic = np.flatnonzero((c4 > 0) & (c0 > 0))
+    if len(quartic) > 0:
+        coefficients = np.stack([c3, c2, c1, c0], axis=1)[quartic] / c4[quartic, np.newaxis]
+        companion = np.zeros((len(quartic), 4, 4))
+        companion[:, 0, :] = -coefficients
+        companion[:, 1, 0] = companion[:, 2, 1] = companion[:, 3, 2] = 1.0
+        roots = np.linalg.eigvals(companion)
+
+        real = np.abs(roots.imag) <= 1e-7 * (1.0 + np.abs(roots.real))
+        roots = np.where(real, roots.real, np.inf)
+
+        # Newton sobre el polinomio original para recuperar la precision
+        polynomial = np.stack([c4, c3, c2, c1, c0], axis=1)[quartic]
+        finite = np.isfinite(roots)
+        t = np.where(finite, roots, 0.0)
+        for _ in range(2):
+            value = (((polynomial[:, 0:1] * t + polynomial[:, 1:2]) * t + polynomial[:, 2:3]) * t
+                + polynomial[:, 3:4]) * t + polynomial[:, 4:5]
+            slope = ((4 * polynomial[:, 0:1] * t + 3 * polynomial[:, 1:2]) * t
+                + 2 * polynomial[:, 2:3]) * t + polynomial[:, 3:4]
+            t = t - np.where(slope != 0, value / np.where(slope != 0, slope, 1.0), 0.0)
+
+        # Solo cuentan las raices donde la distancia baja: el contacto de entrada
+        slope = ((4 * polynomial[:, 0:1] * t + 3 * polynomial[:, 1:2]) * t
+            + 2 * polynomial[:, 2:3]) * t + polynomial[:, 3:4]
+        valid = finite & (t > 0) & (slope < 0)
+        times[quartic] = np.min(np.where(valid, t, np.inf), axis=1)
+
+    times[times > limit] = np.inf
+    return times
+
+
+class EventPhysics(PoolPhysics):
+    """
+    Con roce constante cada componente de la velocidad baja linealmente hasta
+    detenerse, y la posicion es una parabola. En vez de integrar en pasos, se
+    calcula el instante exacto del siguiente evento (una componente se detiene,
+    una bola llega a una banda, a un hoyo o a otra bola), todas las bolas avanzan
+    en forma exacta hasta ese instante y se resuelve el evento.
+
+    No hay tuneleo a cualquier velocidad y entre eventos no hay costo: el
+    siguiente evento se busca de nuevo solo al resolver uno o si las posiciones
+    o velocidades cambiaron desde fuera, como en un disparo. Se guarda el estado
+    de cada evento para obtener las posiciones en cualquier instante pasado con
+    positionsAtTime.
+    """
+    def __init__(self, *args, historyDuration=10.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.time = 0.0
+        self.historyDuration = historyDuration
+        self.keyframeTimes = []
+        self.keyframes = []         # (posiciones, velocidades) desde cada instante de keyframeTimes
+        self.events = 0             # eventos del ultimo paso
+        self.eventCounts = {STOP: 0, CUSHION: 0, POCKET: 0, BALL: 0}
+        self.truncatedSteps = 0
+        self.searches = 0           # busquedas del siguiente evento, en total
+        self.upcoming = None        # (instante absoluto, tipo, datos) o None si todo esta quieto
+        self.expected = None        # estado dejado por el ultimo paso, para notar cambios externos
+
+    def accelerations(self, velocities):
+        return -np.sign(velocities) * self.mu * self.gravity
+
+    def stopTimes(self, velocities):
+        """Instante en que se detiene cada componente en movimiento, inf si esta quieta"""
+
+        friction = self.mu * self.gravity
+        with np.errstate(divide="ignore", invalid="ignore"):
+            times = np.abs(velocities) / friction
+        return np.where(velocities != 0, times, np.inf)
+
+    def motion(self, positions, velocities, deltaTime):
+        """Posiciones y velocidades en x e y tras deltaTime sin eventos entremedio"""
+
+        stops = self.stopTimes(velocities)
+        elapsed = np.minimum(deltaTime, stops)
+        accelerations = self.accelerations(velocities)
+
+        newPositions = positions + velocities * elapsed + 0.5 * accelerations * elapsed * elapsed
+        newVelocities = np.where(stops <= deltaTime, 0.0, velocities + accelerations * elapsed)
+        return newPositions, newVelocities
+
+    def moveTo(self, deltaTime):
+        positions, velocities = self.motion(self.positions[:, :2], self.velocities[:, :2], deltaTime)
+        self.positions[:, :2] = positions
+        self.velocities[:, :2] = velocities
+        self.time += deltaTime
+
+    def cushionTimes(self):
+        """Instante en que cada bola llega a la banda hacia la que va, por eje (N, 2)"""
+
+        bounds = np.array([self.borderWidth / 2, self.borderHeight / 2]) - CUSHION_OFFSET
+        bounds = bounds[np.newaxis, :] - self.radii[:, np.newaxis]
+
+        positions = self.positions[:, :2]
+        velocities = self.velocities[:, :2]
+        speeds = np.abs(velocities)
+
+        # Distancia a recorrer: s(t) = |v| t - mu g t^2 / 2 = distance
+        distances = np.maximum(bounds - np.sign(velocities) * positions, 0.0)
+        discriminant = speeds * speeds - 2 * self.mu * self.gravity * distances
+        reaches = (velocities != 0) & (discriminant >= 0) & self.active()[:, np.newaxis]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            times = 2 * distances / (speeds + np.sqrt(np.maximum(discriminant, 0.0)))
+        return np.where(reaches, times, np.inf)
+
+    def pocketTimes(self, limit):
+        """Instante en que cada bola entra a un hoyo, (N, hoyos)"""
+
+        candidates = np.flatnonzero(self.active() & self.pocketable)
+        times = np.full((len(self), len(self.holes)), np.inf)
+        if len(candidates) == 0 or len(self.holes) == 0:
+            return times
+
+        balls, holes = np.meshgrid(candidates, np.arange(len(self.holes)), indexing="ij")
+        balls = balls.reshape(-1)
+        holes = holes.reshape(-1)
+
+        velocities = self.velocities[balls, :2]
+        ballTimes = contactTimes(self.positions[balls, :2] - self.holes[holes, :2], velocities,
+            self.accelerations(velocities), self.radii[balls] + self.holeRadius, limit)
+
+        # Como collideWithHoles, basta con estar dentro del hoyo
+        inside = np.linalg.norm(self.positions[balls, :2] - self.holes[holes, :2], axis=1) <\
+            self.radii[balls] + self.holeRadius
+        ballTimes[inside] = 0.0
+
+        times[balls, holes] = ballTimes
+        return times
+
+    def ballPairs(self):
+        active = np.flatnonzero(self.active())
+        first, second = np.triu_indices(len(active), 1)
+        return active[first], active[second]
+
+    def ballTimes(self, first, second, limit):
+        """Instante en que cada par de bolas se toca"""
+
+        velocities = self.velocities[:, :2]
+        accelerations = self.accelerations(velocities)
+        return contactTimes(self.positions[second, :2] - self.positions[first, :2],
+            velocities[second] - velocities[first], accelerations[second] - accelerations[first],
+            self.radii[first] + self.radii[second], limit)
+
+    def nextEvent(self, horizon=np.inf):
+        """(instante, tipo, datos) del siguiente evento antes de horizon, None si no hay"""
+
+        velocities = self.velocities[:, :2].copy()
+        velocities[self.pocketed] = 0.0
+
+        stops = self.stopTimes(velocities)
+        best = (np.inf, None, None)
+        if np.isfinite(stops).any():
+            index = np.unravel_index(np.argmin(stops), stops.shape)
+            best = (stops[index], STOP, index)
+
+        # Con cada componente en la misma parabola hasta la primera detencion
+        limit = min(best[0], horizon)
+
+        cushions = self.cushionTimes()
+        if np.isfinite(cushions).any():
+            index = np.unravel_index(np.argmin(cushions), cushions.shape)
+            if cushions[index] < best[0]:
+                best = (cushions[index], CUSHION, index)
+
+        pockets = self.pocketTimes(limit)
+        if np.isfinite(pockets).any():
+            index = np.unravel_index(np.argmin(pockets), pockets.shape)
+            if pockets[index] < best[0]:
+                best = (pockets[index], POCKET, index)
+
+        first, second = self.ballPairs()
+        if len(first) > 0:
+            times = self.ballTimes(first, second, limit)
+            index = np.argmin(times)
+            if times[index] < best[0]:
+                best = (times[index], BALL, (first[index], second[index]))
+
+        if best[1] is None or best[0] > horizon:
+            return None
+        return best
+
+    def resolve(self, kind, data):
+        if kind == STOP:
+            self.velocities[data] = 0.0
+
+        elif kind == CUSHION:
+            # Rebote como en collideWithBorders: la componente vuelve hacia la mesa
+            ball, axis = data
+            self.velocities[ball, axis] = -self.velocities[ball, axis]
+
+        elif kind == POCKET:
+            ball, _ = data
+            self.pocketed[ball] = True
+            self.pocketEnergyLoss += 0.5 * float(np.sum(self.velocities[ball, :2] ** 2))
+            self.velocities[ball] = 0.0
+            return ball
+
+        else:
+            i, j = data
+            energy = 0.5 * np.sum(self.velocities[[i, j], :2] ** 2)
+            self.velocities[i], self.velocities[j] = collisionImpulse(self.positions[i], self.positions[j],
+                self.velocities[i], self.velocities[j], self.restitution)
+            self.collisions += 1
+            self.collisionEnergyLoss += float(energy - 0.5 * np.sum(self.velocities[[i, j], :2] ** 2))
+
+        return None
+
+    def recordKeyframe(self):
+        self.keyframeTimes.append(self.time)
+        self.keyframes.append((self.positions[:, :2].copy(), self.velocities[:, :2].copy()))
+
+        # Se olvidan los keyframes que ya no cubren historyDuration segundos hacia atras
+        forget = bisect.bisect_right(self.keyframeTimes, self.time - self.historyDuration) - 1
+        if forget > 0:
+            del self.keyframeTimes[:forget]
+            del self.keyframes[:forget]
+
+    def advance(self, deltaTime):
+        """
+        Avanza deltaTime segundos resolviendo cada evento en su instante exacto.
+        Devuelve los indices de las bolas que cayeron a un hoyo.
+        """
+        if not self.unchanged():
+            self.recordKeyframe()
+            self.searchNextEvent()
+
+        end = self.time + deltaTime
+        self.collisions = 0
+        self.collisionEnergyLoss = 0.0
+        self.pocketEnergyLoss = 0.0
+        pocketed = []
+        events = 0
+        while self.upcoming is not None and self.upcoming[0] <= end:
+            if events == MAX_EVENTS:
+                self.truncatedSteps += 1
+                break
+
+            time, kind, data = self.upcoming
+            self.moveTo(max(time - self.time, 0.0))
+            ball = self.resolve(kind, data)
+            if ball is not None:
+                pocketed.append(ball)
+
+            self.eventCounts[kind] += 1
+            events += 1
+            self.recordKeyframe()
+            self.searchNextEvent()
+
+        self.moveTo(max(end - self.time, 0.0))
+        self.events = events
+        self.expected = (self.positions[:, :2].copy(), self.velocities[:, :2].copy())
+        return np.array(pocketed, dtype=np.int64)
+
+    def searchNextEvent(self):
+        event = self.nextEvent()
+        self.upcoming = None if event is None else (self.time + event[0], event[1], event[2])
+        self.searches += 1
+
+    def unchanged(self):
+        """True si nadie modifico las bolas desde el ultimo paso"""
+
+        if self.expected is None:
+            return False
+        positions, velocities = self.expected
+        return np.array_equal(positions, self.positions[:, :2]) and np.array_equal(velocities, self.velocities[:, :2])
+
+    def step(self, deltaTime):
+        """Mismo uso que PoolPhysics.step, pero sin error de integracion"""
+
+        self.previousPositions[:] = self.positions
+        return self.advance(deltaTime)
+
+    def positionsAtTime(self, time):
+        """
+        Posiciones (N, 2) en un instante entre el inicio de la historia guardada y
+        el tiempo actual, evaluando la parabola desde el ultimo evento anterior
+        """
+        if not self.keyframeTimes or not self.keyframeTimes[0] <= time <= self.time:
+            raise ValueError(f"Instante {time} fuera de la historia [{self.keyframeTimes[:1]}, {self.time}]")
+
+        index = bisect.bisect_right(self.keyframeTimes, time) - 1
+        positions, velocities = self.keyframes[index]
+        return self.motion(positions, velocities, time - self.keyframeTimes[index])[0]
@@ -8,6 +8,7 @@ from PIL import Image
 
 import grafica.basic_shapes as bs
 from grafica.gpu_shape import GPUShape
+from grafica.shader_program import ShaderProgram
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
@@ -51,7 +52,7 @@ def textureSimpleSetup(imgName, sWrapMode, tWrapMode, minFilterMode, maxFilterMo
     return texture
 
 
-class SimpleShaderProgram:
+class SimpleShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -111,12 +112,13 @@ class SimpleShaderProgram:
         # Binding the VAO and executing the draw call
         glBindVertexArray(gpuShape.vao)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
-class SimpleTextureShaderProgram:
+class SimpleTextureShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -180,12 +182,13 @@ class SimpleTextureShaderProgram:
         glBindVertexArray(gpuShape.vao)
         glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
         
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
-class SimpleTransformShaderProgram:
+class SimpleTransformShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -247,12 +250,13 @@ class SimpleTransformShaderProgram:
         # Binding the VAO and executing the draw call
         glBindVertexArray(gpuShape.vao)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
         
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
-class SimpleTextureTransformShaderProgram:
+class SimpleTextureTransformShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -320,12 +324,13 @@ class SimpleTextureTransformShaderProgram:
         glBindVertexArray(gpuShape.vao)
         glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
-class SimpleModelViewProjectionShaderProgram:
+class SimpleModelViewProjectionShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -389,12 +394,13 @@ class SimpleModelViewProjectionShaderProgram:
         # Binding the VAO and executing the draw call
         glBindVertexArray(gpuShape.vao)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
-class SimpleTextureModelViewProjectionShaderProgram:
+class SimpleTextureModelViewProjectionShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -464,6 +470,7 @@ class SimpleTextureModelViewProjectionShaderProgram:
         glBindVertexArray(gpuShape.vao)
         glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
@@ -0,0 +1,185 @@
+# coding=utf-8
+"""Memoization of generated shapes with LRU eviction and optional .npz persistence"""
+
+import os
+import sys
+import types
+import inspect
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import grafica.basic_shapes as bs
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+
+def shapeBytes(shape):
+    """Memory held by the vertices and indices of a shape, in bytes"""
+
+    if isinstance(shape.vertices, np.ndarray) and isinstance(shape.indices, np.ndarray):
+        return shape.vertices.nbytes + shape.indices.nbytes
+
+    # Python lists keep a pointer per element plus the float object itself
+    return 32 * (len(shape.vertices) + len(shape.indices))
+
+
+def sourceDigest(generator):
+    """
+    Hash of the code a generator is built from: the file of its module and
+    the files of the modules it imports from the same directory tree, as the
+    grafica helpers imported by shapes_3D. Generators without a module file
+    are hashed by their own source.
+    """
+    module = sys.modules.get(generator.__module__)
+    moduleFile = getattr(module, "__file__", None)
+    if moduleFile is None:
+        return hashlib.sha1(inspect.getsource(generator).encode("utf-8")).hexdigest()
+
+    root = os.path.dirname(os.path.abspath(moduleFile))
+    files = {os.path.abspath(moduleFile)}
+    for value in vars(module).values():
+        dependency = getattr(value, "__file__", None) if isinstance(value, types.ModuleType) else None
+        if dependency is not None and os.path.abspath(dependency).startswith(root + os.sep):
+            files.add(os.path.abspath(dependency))
+
+    digest = hashlib.sha1()
+    for path in sorted(files):
+        with open(path, "rb") as sourceFile:
+            digest.update(sourceFile.read())
+    return digest.hexdigest()
+
+
+class GeometryCache:
+    """
+    Returns the already built shape for a (generator, parameters) pair.
+
+    Shapes are kept in memory up to maxBytes, evicting the least recently used
+    ones. If cacheDirectory is given, every generated shape is also stored there
+    as an .npz file and loaded from it in later runs. Files are keyed by the
+    generator name, its parameters and a hash of its source (see sourceDigest),
+    so editing a generator makes the old files unreachable instead of stale.
+
+    Cached shapes are shared by every caller, so they must not be modified.
+    """
+    def __init__(self, maxBytes=64 * 1024 * 1024, cacheDirectory=None):
+        self.maxBytes = maxBytes
+        self.cacheDirectory = cacheDirectory
+        self.shapes = OrderedDict()
+        self.bytes = 0
+
+        # Source hash of every generator, its files are read once per run
+        self.digests = {}
+
+        # Counters exposed for benchmarking
+        self.hits = 0
+        self.misses = 0
+        self.diskHits = 0
+        self.evictions = 0
+
+        if cacheDirectory is not None:
+            os.makedirs(cacheDirectory, exist_ok=True)
+
+    def key(self, generator, args, kwargs):
+        digest = self.digests.get(generator)
+        if digest is None:
+            digest = sourceDigest(generator)
+            self.digests[generator] = digest
+
+        return (generator.__module__, generator.__qualname__, args, tuple(sorted(kwargs.items())), digest)
+
+    def get(self, generator, *args, **kwargs):
+        """Returns generator(*args, **kwargs), building it only on the first request"""
+
+        key = self.key(generator, args, kwargs)
+
+        if key in self.shapes:
+            self.hits += 1
+            self.shapes.move_to_end(key)
+            return self.shapes[key]
+
+        self.misses += 1
+        shape = self.load(key)
+
+        if shape is None:
+            shape = generator(*args, **kwargs)
+            self.store(key, shape)
+        else:
+            self.diskHits += 1
+
+        self.insert(key, shape)
+        return shape
+
+    def insert(self, key, shape):
+        self.shapes[key] = shape
+        self.bytes += shapeBytes(shape)
+
+        # The newest shape is kept even if it alone is over the budget
+        while self.bytes > self.maxBytes and len(self.shapes) > 1:
+            _, evicted = self.shapes.popitem(last=False)
+            self.bytes -= shapeBytes(evicted)
+            self.evictions += 1
+
+    def path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cacheDirectory, key[1] + "_" + digest[:16] + ".npz")
+
+    def load(self, key):
+        if self.cacheDirectory is None:
+            return None
+
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as data:
+            # The key is stored too, so that hash collisions are detected
+            if str(data["key"]) != repr(key):
+                return None
+
+            vertices = data["vertices"]
+            indices = data["indices"]
+            imageFilename = str(data["image_filename"]) or None
+
+            if "layout" in data:
+                layout = bs.VertexLayout(*[(name, int(size)) for name, size in data["layout"]])
+                return bs.ArrayShape(vertices, indices, layout, imageFilename)
+
+            return bs.Shape(vertices, indices, imageFilename)
+
+    def store(self, key, shape):
+        if self.cacheDirectory is None:
+            return
+
+        arrays = {
+            "key": np.array(repr(key)),
+            "vertices": np.ascontiguousarray(shape.vertices, dtype=np.float32).reshape(-1),
+            "indices": np.ascontiguousarray(shape.indices, dtype=np.uint32).reshape(-1),
+            "image_filename": np.array(shape.image_filename or "")
+        }
+        if isinstance(shape, bs.ArrayShape):
+            arrays["layout"] = np.array([(name, str(size)) for name, size in shape.layout.attributes])
+
+        # Written to a temporary file first, so an interrupted run never leaves a broken cache
+        path = self.path(key)
+        temporaryPath = path + ".tmp.npz"
+        np.savez(temporaryPath, **arrays)
+        os.replace(temporaryPath, path)
+
+    def clear(self):
+        """Empties the memory cache, files on disk are kept"""
+        self.shapes.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "diskHits": self.diskHits,
+            "evictions": self.evictions,
+            "shapes": len(self.shapes),
+            "bytes": self.bytes
+        }
+
+    def __str__(self):
+        return f"GeometryCache [{self.hits} hits - {self.misses} misses - {self.diskHits} from disk - {self.bytes} bytes]"
@@ -0,0 +1,130 @@
+# coding=utf-8
+"""Uniform buffer with the camera and lights shared by every lighting pipeline"""
+
+from OpenGL.GL import *
+import numpy as np
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+# The shaders are compiled with room for this many lights,
+# the ones actually used are set with LightingBlock.setLights
+MAX_LIGHTS = 8
+
+# Default binding point of the buffer and the programs using the block
+LIGHTING_BINDING = 0
+
+# GLSL declaration to paste in the vertex and fragment shaders.
+# row_major lets matrices from transformations be copied as they are.
+LIGHTING_BLOCK = """
+            #define MAX_LIGHTS %d
+
+            struct Light
+            {
+                vec3 position;
+                vec3 spotDirection;
+                vec3 Ld;
+                vec3 Ls;
+            };
+
+            layout (std140, row_major) uniform Lighting
+            {
+                mat4 view;
+                mat4 projection;
+                vec3 viewPosition;
+                float spotConcentration;
+                vec3 La;
+                int lightCount;
+                float constantAttenuation;
+                float linearAttenuation;
+                float quadraticAttenuation;
+                Light lights[MAX_LIGHTS];
+            };
+""" % MAX_LIGHTS
+
+# std140 offsets of the block members, in floats
+VIEW = 0
+PROJECTION = 16
+VIEW_POSITION = 32
+SPOT_CONCENTRATION = 35
+LA = 36
+LIGHT_COUNT = 39
+ATTENUATION = 40
+LIGHTS = 44
+
+# Every Light takes 4 vec3 padded to vec4
+LIGHT_SIZE = 16
+
+
+class LightingBlock:
+    """
+    Camera and lights written once per frame into a single uniform buffer.
+
+    Every program attached with attach() reads the same buffer, so switching
+    pipelines does not need any uniform upload. Only the model matrix and the
+    material (Ka, Kd, Ks, shininess) stay as plain uniforms of each program.
+
+    Programs lit by different lights use one block each, with its own binding.
+    """
+    def __init__(self, binding=LIGHTING_BINDING):
+        self.binding = binding
+        self.data = np.zeros(LIGHTS + LIGHT_SIZE * MAX_LIGHTS, dtype=np.float32)
+        self.lights = self.data[LIGHTS:].reshape(MAX_LIGHTS, 4, 4)
+        self.uploaded = None
+
+        self.ubo = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferData(GL_UNIFORM_BUFFER, self.data.nbytes, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+
+        glBindBufferBase(GL_UNIFORM_BUFFER, self.binding, self.ubo)
+
+    def attach(self, pipeline):
+        """Makes the Lighting block of a program read from this buffer"""
+
+        index = glGetUniformBlockIndex(pipeline.shaderProgram, "Lighting")
+        if index != GL_INVALID_INDEX:
+            glUniformBlockBinding(pipeline.shaderProgram, index, self.binding)
+
+    def setCamera(self, view, projection, viewPosition):
+        self.data[VIEW:VIEW + 16] = np.asarray(view, dtype=np.float32).reshape(-1)
+        self.data[PROJECTION:PROJECTION + 16] = np.asarray(projection, dtype=np.float32).reshape(-1)
+        self.data[VIEW_POSITION:VIEW_POSITION + 3] = viewPosition
+
+    def setAmbient(self, La):
+        self.data[LA:LA + 3] = La
+
+    def setAttenuation(self, constant, linear, quadratic):
+        self.data[ATTENUATION:ATTENUATION + 3] = (constant, linear, quadratic)
+
+    def setSpotConcentration(self, spotConcentration):
+        self.data[SPOT_CONCENTRATION] = spotConcentration
+
+    def setLights(self, positions, spotDirections, Ld, Ls):
+        """Lists with the position, spot direction and colors of every light"""
+
+        count = len(positions)
+        assert count <= MAX_LIGHTS, f"At most {MAX_LIGHTS} lights are supported"
+
+        self.lights[:count, 0, :3] = positions
+        self.lights[:count, 1, :3] = spotDirections
+        self.lights[:count, 2, :3] = Ld
+        self.lights[:count, 3, :3] = Ls
+        self.data[LIGHT_COUNT:LIGHT_COUNT + 1].view(np.int32)[0] = count
+
+    def upload(self):
+        """Sends the block to the GPU, only if it changed since the last upload"""
+
+        # Compared as bytes, lightCount is an integer stored among the floats
+        data = self.data.tobytes()
+        if data == self.uploaded:
+            return
+
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, self.data.nbytes, self.data)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        self.uploaded = data
+
+    def clear(self):
+        """Freeing GPU memory"""
+        glDeleteBuffers(1, [self.ubo])
@@ -4,8 +4,10 @@
 from OpenGL.GL import *
 import OpenGL.GL.shaders
 from grafica.gpu_shape import GPUShape
+from grafica.shader_program import ShaderProgram
+import grafica.lighting_block as lb
 
-class SimpleFlatShaderProgram():
+class SimpleFlatShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -114,12 +116,13 @@ class SimpleFlatShaderProgram():
         # Binding the VAO and executing the draw call
         glBindVertexArray(gpuShape.vao)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
-class SimpleTextureFlatShaderProgram():
+class SimpleTextureFlatShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -237,12 +240,13 @@ class SimpleTextureFlatShaderProgram():
         glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
 
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
-class SimpleGouraudShaderProgram():
+class SimpleGouraudShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -351,12 +355,13 @@ class SimpleGouraudShaderProgram():
         # Binding the VAO and executing the draw call
         glBindVertexArray(gpuShape.vao)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
-class SimpleTextureGouraudShaderProgram():
+class SimpleTextureGouraudShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -474,12 +479,13 @@ class SimpleTextureGouraudShaderProgram():
         glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
 
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
-class SimplePhongShaderProgram:
+class SimplePhongShaderProgram(ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
@@ -594,12 +600,13 @@ class SimplePhongShaderProgram:
         # Binding the VAO and executing the draw call
         glBindVertexArray(gpuShape.vao)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
-class SimpleTexturePhongShaderProgram:
+class SimpleTexturePhongShaderProgram(ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
@@ -720,12 +727,13 @@ class SimpleTexturePhongShaderProgram:
         glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
 
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
-class SimplePhongDirectionalShaderProgram:
+class SimplePhongDirectionalShaderProgram(ShaderProgram):
     # Pipeline para luz direccional sin texturas
 
     def __init__(self):
@@ -837,11 +845,12 @@ class SimplePhongDirectionalShaderProgram:
         # Binding the VAO and executing the draw call
         glBindVertexArray(gpuShape.vao)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
 
-class SimplePhongTextureDirectionalShaderProgram:
+class SimplePhongTextureDirectionalShaderProgram(ShaderProgram):
     # Pipeline para luz direccional con texturas
 
     def __init__(self):
@@ -959,13 +968,14 @@ class SimplePhongTextureDirectionalShaderProgram:
         glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
 
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
 # Shader con multiples spotlights usando phong
-class MultiplePhongShaderProgram:
+class MultiplePhongShaderProgram(ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
@@ -980,14 +990,18 @@ class MultiplePhongShaderProgram:
             out vec3 fragNormal;
 
             uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
+
+            // Read instead of model by instanced draw calls
+            uniform bool instanced;
+            layout (location = 3) in mat4 instanceModel;
+""" + lb.LIGHTING_BLOCK + """
 
             void main()
             {
-                fragPosition = vec3(model * vec4(position, 1.0));
+                mat4 modelMatrix = instanced ? instanceModel : model;
+                fragPosition = vec3(modelMatrix * vec4(position, 1.0));
                 fragOriginalColor = color;
-                fragNormal = mat3(transpose(inverse(model))) * normal;  
+                fragNormal = mat3(transpose(inverse(modelMatrix))) * normal;  
                 
                 gl_Position = projection * view * vec4(fragPosition, 1.0);
             }
@@ -1002,30 +1016,12 @@ class MultiplePhongShaderProgram:
             in vec3 fragPosition;
             in vec3 fragOriginalColor;
 
-            uniform vec3 lightPosition0; 
-            uniform vec3 lightPosition1;
-
-            uniform vec3 spotDirection1;
-            uniform vec3 spotDirection2;
-
-            uniform float spotConcentration;
-
-            uniform vec3 viewPosition;
-            uniform vec3 La;
-
-            uniform vec3 Ld1;
-            uniform vec3 Ld2;
-
-            uniform vec3 Ls1;
-            uniform vec3 Ls2;
+""" + lb.LIGHTING_BLOCK + """
 
             uniform vec3 Ka;
             uniform vec3 Kd;
             uniform vec3 Ks;
             uniform uint shininess;
-            uniform float constantAttenuation;
-            uniform float linearAttenuation;
-            uniform float quadraticAttenuation;
 
             void main()
             {
@@ -1037,23 +1033,19 @@ class MultiplePhongShaderProgram:
                 vec3 normalizedNormal = normalize(fragNormal);
 
                 vec3 result = vec3(0.0f, 0.0f, 0.0f);
-                vec3 lights[2] = vec3[](lightPosition0, lightPosition1);
-                vec3 spotDirections[2] = vec3[](spotDirection1, spotDirection2);
-                vec3 Ld[2] = vec3[](Ld1, Ld2);
-                vec3 Ls[2] = vec3[](Ls1, Ls2);
 
-                for (int i = 0; i < 2; i++)
+                for (int i = 0; i < lightCount; i++)
                 {
-                    vec3 toLight = lights[i] - fragPosition;
+                    vec3 toLight = lights[i].position - fragPosition;
                     vec3 lightDir = normalize(toLight);
                     float diff = max(dot(normalizedNormal, lightDir), 0.0);
-                    vec3 diffuse = Kd * Ld[i] * diff;
+                    vec3 diffuse = Kd * lights[i].Ld * diff;
                     
                     // specular
                     vec3 viewDir = normalize(viewPosition - fragPosition);
                     vec3 reflectDir = reflect(-lightDir, normalizedNormal);  
                     float spec = pow(max(dot(viewDir, reflectDir), 0.0), shininess);
-                    vec3 specular = Ks * Ls[i] * spec;
+                    vec3 specular = Ks * lights[i].Ls * spec;
 
                     // attenuation
                     float distToLight = length(toLight);
@@ -1061,7 +1053,7 @@ class MultiplePhongShaderProgram:
                         + linearAttenuation * distToLight
                         + quadraticAttenuation * distToLight * distToLight;
                     
-                    result += ((diffuse + specular) *  pow(max(dot(-spotDirections[i], lightDir), 0), spotConcentration)/ attenuation);
+                    result += ((diffuse + specular) *  pow(max(dot(-lights[i].spotDirection, lightDir), 0), spotConcentration)/ attenuation);
                 }
 
                 result = (ambient + result) * fragOriginalColor;
@@ -1104,13 +1096,14 @@ class MultiplePhongShaderProgram:
         # Binding the VAO and executing the draw call
         glBindVertexArray(gpuShape.vao)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
 # Shader para texturas con multiples spotlights usando phong
-class MultipleTexturePhongShaderProgram:
+class MultipleTexturePhongShaderProgram(ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
@@ -1125,14 +1118,18 @@ class MultipleTexturePhongShaderProgram:
             out vec3 fragNormal;
 
             uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
+
+            // Read instead of model by instanced draw calls
+            uniform bool instanced;
+            layout (location = 3) in mat4 instanceModel;
+""" + lb.LIGHTING_BLOCK + """
 
             void main()
             {
-                fragPosition = vec3(model * vec4(position, 1.0));
+                mat4 modelMatrix = instanced ? instanceModel : model;
+                fragPosition = vec3(modelMatrix * vec4(position, 1.0));
                 fragTexCoords = texCoords;
-                fragNormal = mat3(transpose(inverse(model))) * normal;  
+                fragNormal = mat3(transpose(inverse(modelMatrix))) * normal;  
                 
                 gl_Position = projection * view * vec4(fragPosition, 1.0);
             }
@@ -1147,30 +1144,12 @@ class MultipleTexturePhongShaderProgram:
 
             out vec4 fragColor;
 
-            uniform vec3 lightPosition0; 
-            uniform vec3 lightPosition1;
-
-            uniform vec3 spotDirection1;
-            uniform vec3 spotDirection2;
-
-            uniform float spotConcentration;
-
-            uniform vec3 viewPosition; 
-            uniform vec3 La;
-
-            uniform vec3 Ld1;
-            uniform vec3 Ld2;
-
-            uniform vec3 Ls1;
-            uniform vec3 Ls2;
+""" + lb.LIGHTING_BLOCK + """
 
             uniform vec3 Ka;
             uniform vec3 Kd;
             uniform vec3 Ks;
             uniform uint shininess;
-            uniform float constantAttenuation;
-            uniform float linearAttenuation;
-            uniform float quadraticAttenuation;
 
             uniform sampler2D samplerTex;
 
@@ -1184,22 +1163,18 @@ class MultipleTexturePhongShaderProgram:
                 vec3 normalizedNormal = normalize(fragNormal);
 
                 vec3 result = vec3(0.0f, 0.0f, 0.0f);
-                vec3 lights[2] = vec3[](lightPosition0, lightPosition1);
-                vec3 spotDirections[2] = vec3[](spotDirection1, spotDirection2);
-                vec3 Ld[2] = vec3[](Ld1, Ld2);
-                vec3 Ls[2] = vec3[](Ls1, Ls2);
 
-                for (int i = 0; i < 2; i++){
-                    vec3 toLight = lights[i] - fragPosition;
+                for (int i = 0; i < lightCount; i++){
+                    vec3 toLight = lights[i].position - fragPosition;
                     vec3 lightDir = normalize(toLight);
                     float diff = max(dot(normalizedNormal, lightDir), 0.0);
-                    vec3 diffuse = Kd * Ld[i] * diff;
+                    vec3 diffuse = Kd * lights[i].Ld * diff;
 
                     // specular
                     vec3 viewDir = normalize(viewPosition - fragPosition);
                     vec3 reflectDir = reflect(-lightDir, normalizedNormal);  
                     float spec = pow(max(dot(viewDir, reflectDir), 0.0), shininess);
-                    vec3 specular = Ks * Ls[i] * spec;
+                    vec3 specular = Ks * lights[i].Ls * spec;
 
                     // attenuation
                     float distToLight = length(toLight);
@@ -1207,7 +1182,7 @@ class MultipleTexturePhongShaderProgram:
                         + linearAttenuation * distToLight
                         + quadraticAttenuation * distToLight * distToLight;
 
-                    result += ((diffuse + specular) *  pow(max(dot(-spotDirections[i], lightDir), 0), spotConcentration)/ attenuation);
+                    result += ((diffuse + specular) *  pow(max(dot(-lights[i].spotDirection, lightDir), 0), spotConcentration)/ attenuation);
                 }
 
                 vec4 fragOriginalColor = texture(samplerTex, fragTexCoords);
@@ -1253,13 +1228,14 @@ class MultipleTexturePhongShaderProgram:
         glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
 
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
 
 
 # Shader con heatmap para texturas con multiples spotlights usando phong
-class HeatMapTexturePhongShaderProgram:
+class HeatMapTexturePhongShaderProgram(ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
@@ -1274,14 +1250,18 @@ class HeatMapTexturePhongShaderProgram:
             out vec3 fragNormal;
 
             uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
+
+            // Read instead of model by instanced draw calls
+            uniform bool instanced;
+            layout (location = 3) in mat4 instanceModel;
+""" + lb.LIGHTING_BLOCK + """
 
             void main()
             {
-                fragPosition = vec3(model * vec4(position, 1.0));
+                mat4 modelMatrix = instanced ? instanceModel : model;
+                fragPosition = vec3(modelMatrix * vec4(position, 1.0));
                 fragTexCoords = texCoords;
-                fragNormal = mat3(transpose(inverse(model))) * normal;  
+                fragNormal = mat3(transpose(inverse(modelMatrix))) * normal;  
                 
                 gl_Position = projection * view * vec4(fragPosition, 1.0);
             }
@@ -1296,30 +1276,12 @@ class HeatMapTexturePhongShaderProgram:
 
             out vec4 fragColor;
 
-            uniform vec3 lightPosition0; 
-            uniform vec3 lightPosition1;
-
-            uniform vec3 spotDirection1;
-            uniform vec3 spotDirection2;
-
-            uniform float spotConcentration;
-
-            uniform vec3 viewPosition; 
-            uniform vec3 La;
-
-            uniform vec3 Ld1;
-            uniform vec3 Ld2;
-
-            uniform vec3 Ls1;
-            uniform vec3 Ls2;
+""" + lb.LIGHTING_BLOCK + """
 
             uniform vec3 Ka;
             uniform vec3 Kd;
             uniform vec3 Ks;
             uniform uint shininess;
-            uniform float constantAttenuation;
-            uniform float linearAttenuation;
-            uniform float quadraticAttenuation;
 
             // Niveles de discretizacion
             const float levels = 4.0;
@@ -1336,26 +1298,22 @@ class HeatMapTexturePhongShaderProgram:
                 vec3 normalizedNormal = normalize(fragNormal);
 
                 vec3 result = vec3(0.0f, 0.0f, 0.0f);
-                vec3 lights[2] = vec3[](lightPosition0, lightPosition1);
-                vec3 spotDirections[2] = vec3[](spotDirection1, spotDirection2);
-                vec3 Ld[2] = vec3[](Ld1, Ld2);
-                vec3 Ls[2] = vec3[](Ls1, Ls2);
 
                 float distToLight;
 
-                for (int i = 0; i < 2; i++){
-                    vec3 toLight = lights[i] - fragPosition;
+                for (int i = 0; i < lightCount; i++){
+                    vec3 toLight = lights[i].position - fragPosition;
                     vec3 lightDir = normalize(toLight);
                     float diff = max(dot(normalizedNormal, lightDir), 0.0);
 
-                    vec3 diffuse = Kd * Ld[i] * diff;
+                    vec3 diffuse = Kd * lights[i].Ld * diff;
 
                     // specular
                     vec3 viewDir = normalize(viewPosition - fragPosition);
                     vec3 reflectDir = reflect(-lightDir, normalizedNormal);  
                     float spec = pow(max(dot(viewDir, reflectDir), 0.0), shininess);
 
-                    vec3 specular = Ks * Ls[i] * spec;
+                    vec3 specular = Ks * lights[i].Ls * spec;
 
                     // attenuation
                     distToLight = length(toLight);
@@ -1363,7 +1321,7 @@ class HeatMapTexturePhongShaderProgram:
                         + linearAttenuation * distToLight
                         + quadraticAttenuation * distToLight * distToLight;
 
-                    result += ((diffuse + specular) *  pow(max(dot(-spotDirections[i], lightDir), 0), spotConcentration)/ attenuation);
+                    result += ((diffuse + specular) *  pow(max(dot(-lights[i].spotDirection, lightDir), 0), spotConcentration)/ attenuation);
                 }
 
                 vec4 fragOriginalColor = texture(samplerTex, fragTexCoords);
@@ -1426,6 +1384,7 @@ class HeatMapTexturePhongShaderProgram:
         glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
 
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
 
         # Unbind the current VAO
         glBindVertexArray(0)
\ No newline at end of file
@@ -0,0 +1,251 @@
+# coding=utf-8
+"""Vectorized parametric surfaces evaluated over a (u, v) grid"""
+
+import numpy as np
+import grafica.basic_shapes as bs
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+
+def gridParameters(nu, nv, uRange, vRange):
+    """
+    Parameters of a (nv + 1) x (nu + 1) vertex grid, as broadcastable arrays.
+    Rows follow the v parameter and columns follow the u parameter, so u has
+    shape (1, nu + 1) and v has shape (nv + 1, 1). Functions of a single
+    parameter are then evaluated once per row or column, not once per vertex.
+    """
+    u = np.linspace(uRange[0], uRange[1], nu + 1, dtype=np.float32)
+    v = np.linspace(vRange[0], vRange[1], nv + 1, dtype=np.float32)
+    return u[None, :], v[:, None]
+
+
+def gridIndices(nu, nv):
+    """
+    Indices of two triangles per grid cell, sharing the grid vertices.
+
+     v0 -------------- v3
+     | \                |
+     |    \             |
+     |       \          |
+     |          \       |
+     |             \    |
+     |                \ |
+     v1 -------------- v2
+    """
+    columns = nu + 1
+    i, j = np.meshgrid(np.arange(nv, dtype=np.uint32), np.arange(nu, dtype=np.uint32), indexing="ij")
+
+    v0 = i * columns + j
+    v1 = v0 + columns
+    v2 = v1 + 1
+    v3 = v0 + 1
+
+    triangles = np.stack([v0, v1, v2, v2, v3, v0], axis=-1)
+    return triangles.reshape(-1, 3)
+
+
+def numericalNormals(positions):
+    """
+    Normals of a (rows, columns, 3) grid of positions using finite differences.
+    The orientation is dP/dv x dP/du, the same one used by the sphere and torus.
+    """
+    dPdv, dPdu = np.gradient(positions, axis=(0, 1))
+    normals = np.cross(dPdv, dPdu)
+    norm = np.linalg.norm(normals, axis=-1, keepdims=True)
+    np.divide(normals, norm, out=normals, where=norm > 0)
+    return normals
+
+
+def collapsedEdges(positions, axis, epsilon=1e-6):
+    """
+    Flags the grid rows (axis=0) or columns (axis=1) whose vertices all lie
+    on the same point, as the poles of a sphere.
+    """
+    lines = positions if axis == 0 else positions.swapaxes(0, 1)
+
+    # Only the lines whose first two vertices coincide are fully checked
+    collapsed = np.all(np.abs(lines[:, 1] - lines[:, 0]) <= epsilon, axis=-1)
+    for line in np.flatnonzero(collapsed):
+        collapsed[line] = np.all(np.abs(lines[line] - lines[line, 0]) <= epsilon)
+    return collapsed
+
+
+def removeDegenerateTriangles(positions, triangles, epsilon=1e-6):
+    """
+    Removes the triangles with a collapsed edge from a (rows, columns, 3) grid.
+    triangles holds the two triangles of every cell as produced by gridIndices.
+    """
+    nv, nu = positions.shape[0] - 1, positions.shape[1] - 1
+    collapsedRows = collapsedEdges(positions, 0, epsilon)
+    collapsedColumns = collapsedEdges(positions, 1, epsilon)
+
+    if not (collapsedRows.any() or collapsedColumns.any()):
+        return triangles
+
+    # Triangle (v0, v1, v2) collapses with the bottom or left edge of its cell,
+    # triangle (v2, v3, v0) collapses with the top or right edge of its cell
+    degenerate = np.zeros((nv, nu, 2), dtype=bool)
+    degenerate[:, :, 0] |= collapsedRows[1:, None] | collapsedColumns[None, :-1]
+    degenerate[:, :, 1] |= collapsedRows[:-1, None] | collapsedColumns[None, 1:]
+
+    return triangles[~degenerate.reshape(-1)]
+
+
+def createParametricShape(surface, nu, nv, uRange=(0.0, 1.0), vRange=(0.0, 1.0),
+                          normals=None, color=None, uvScale=(1.0, 1.0)):
+    """
+    Builds an indexed shape from a parametric surface in a single vectorized pass.
+
+    surface(u, v) and normals(u, v) receive the broadcastable grid parameters
+    from gridParameters and must return a tuple (x, y, z) of values that
+    broadcast to the grid shape. If normals is
+    None, they are approximated with finite differences over the grid.
+
+    Vertex layout:
+      - color is None: positions, texture coordinates, normals (8 floats)
+      - color=(r, g, b): positions, color, normals (9 floats)
+
+    Texture coordinates go from 0 to uvScale along each parameter.
+    Returns an ArrayShape with float32 vertices and uint32 indices, ready for fillBuffers.
+    """
+    u, v = gridParameters(nu, nv, uRange, vRange)
+    stride = 8 if color is None else 9
+
+    # Every attribute is written in place on a single (rows, columns, stride) buffer
+    vertexData = np.empty((nv + 1, nu + 1, stride), dtype=np.float32)
+    positions = vertexData[:, :, 0:3]
+    for k, coordinate in enumerate(surface(u, v)):
+        positions[:, :, k] = coordinate
+
+    normalVectors = vertexData[:, :, stride - 3:stride]
+    if normals is None:
+        normalVectors[:] = numericalNormals(positions)
+    else:
+        for k, coordinate in enumerate(normals(u, v)):
+            normalVectors[:, :, k] = coordinate
+
+    if color is None:
+        vertexData[:, :, 3] = (uvScale[0] / (uRange[1] - uRange[0])) * (u - uRange[0])
+        vertexData[:, :, 4] = (uvScale[1] / (vRange[1] - vRange[0])) * (v - vRange[0])
+    else:
+        vertexData[:, :, 3:6] = color
+
+    triangles = removeDegenerateTriangles(positions, gridIndices(nu, nv))
+    layout = bs.TEXTURE_NORMAL_LAYOUT if color is None else bs.COLOR_NORMAL_LAYOUT
+
+    return bs.ArrayShape(vertexData.reshape(-1, stride), triangles.reshape(-1), layout)
+
+
+def cellParameters(nu, nv, du, dv):
+    """
+    Parameters of the corners v0, v1, v2, v3 of every cell of a grid walked
+    with steps du and dv (see gridIndices), as arrays of shape (nv, nu, 4).
+    They are computed as the original loops did, j * du and i * dv, so the
+    vertices come out identical.
+    """
+    i = np.arange(nv)[:, None, None] + np.array([0, 1, 1, 0])
+    j = np.arange(nu)[None, :, None] + np.array([0, 0, 1, 1])
+    return np.broadcast_arrays(j * du, i * dv)
+
+
+def createCellShape(cells, layout, capped=False):
+    """
+    Shape with its own vertices for every grid cell, in the order of the loops
+    over rows and columns that built these shapes one vertex at a time.
+    cells holds the (rows, columns, 4, stride) vertex data of the corners
+    v0, v1, v2, v3 of every cell. Each cell gives the two triangles of
+    gridIndices, but with capped the first row only gives (v0, v1, v2) and the
+    last one only (v0, v1, v3), as the poles of a sphere.
+    """
+    rows, stride = cells.shape[0], cells.shape[-1]
+    if not capped:
+        blocks = [cells]
+    elif rows == 1:
+        blocks = [cells[0][:, [0, 1, 2]]]
+    else:
+        blocks = [cells[0][:, [0, 1, 2]], cells[1:-1], cells[-1][:, [0, 1, 3]]]
+
+    indices = []
+    offset = 0
+    for block in blocks:
+        vertices = block.size // stride
+        if block.shape[-2] == 4:
+            quads = offset + 4 * np.arange(vertices // 4, dtype=np.uint32)
+            indices.append((quads[:, None] + np.array([0, 1, 2, 2, 3, 0], dtype=np.uint32)).reshape(-1))
+        else:
+            indices.append(np.arange(offset, offset + vertices, dtype=np.uint32))
+        offset += vertices
+
+    vertexData = np.concatenate([block.reshape(-1, stride) for block in blocks]).astype(np.float32)
+    return bs.ArrayShape(vertexData, np.concatenate(indices), layout)
+
+
+def sphereCells(phi, theta, rho, attributes):
+    """
+    Vertex data of a sphere of radius rho at the cell corners given by phi and
+    theta, with attributes (texture coordinates or color) between positions and normals
+    """
+    normals = np.stack([np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)], axis=-1)
+    positions = np.stack([rho * np.sin(theta) * np.cos(phi), rho * np.sin(theta) * np.sin(phi),
+                          rho * np.cos(theta)], axis=-1)
+    attributes = np.broadcast_to(attributes, positions.shape[:-1] + (np.shape(attributes)[-1],))
+    return np.concatenate([positions, attributes, normals], axis=-1)
+
+
+def torusCells(phi, theta, R, r, attributes):
+    """Vertex data of a torus with radii R and r at the cell corners given by phi and theta"""
+
+    normals = np.stack([np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)], axis=-1)
+    positions = np.stack([(R + r * np.sin(theta)) * np.cos(phi), (R + r * np.sin(theta)) * np.sin(phi),
+                          r * np.cos(theta)], axis=-1)
+    attributes = np.broadcast_to(attributes, positions.shape[:-1] + (np.shape(attributes)[-1],))
+    return np.concatenate([positions, attributes, normals], axis=-1)
+
+
+def sphereSurface(rho):
+    """Sphere of radius rho, with u = phi in [0, 2pi] and v = theta in [0, pi]"""
+
+    def normals(phi, theta):
+        sinTheta = np.sin(theta)
+        return (sinTheta * np.cos(phi),
+                sinTheta * np.sin(phi),
+                np.cos(theta))
+
+    def surface(phi, theta):
+        return tuple(rho * coordinate for coordinate in normals(phi, theta))
+
+    return surface, normals
+
+
+def torusSurface(R, r):
+    """Torus with radii R and r, with u = phi in [0, 2pi] and v = theta in [0, 2pi]"""
+
+    def surface(phi, theta):
+        ringRadius = R + r * np.sin(theta)
+        return (ringRadius * np.cos(phi),
+                ringRadius * np.sin(phi),
+                r * np.cos(theta))
+
+    def normals(phi, theta):
+        sinTheta = np.sin(theta)
+        return (sinTheta * np.cos(phi),
+                sinTheta * np.sin(phi),
+                np.cos(theta))
+
+    return surface, normals
+
+
+def createTextureNormalSphere(N, rho=0.5, uvScale=(1.0, 1.0)):
+    surface, normals = sphereSurface(rho)
+    return createParametricShape(surface, N, N, (0, 2 * np.pi), (0, np.pi), normals, uvScale=uvScale)
+
+
+def createColorNormalSphere(N, r, g, b, rho=0.5):
+    surface, normals = sphereSurface(rho)
+    return createParametricShape(surface, N, N, (0, 2 * np.pi), (0, np.pi), normals, color=(r, g, b))
+
+
+def createTextureNormalsTorus(N, R, r, uvScale=(1.0, 1.0)):
+    surface, normals = torusSurface(R, r)
+    return createParametricShape(surface, N, N, (0, 2 * np.pi), (0, 2 * np.pi), normals, uvScale=uvScale)
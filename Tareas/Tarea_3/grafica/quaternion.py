@@ -0,0 +1,190 @@
+# coding=utf-8
+"""Quaternions and translation-rotation-scale transforms, converted to 4x4 matrices in closed form"""
+
+import math
+import numpy as np
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+
+class Quaternion:
+    """
+    Rotation stored as w + xi + yj + zk, with plain floats so composing a
+    few rotations does not pay for small numpy arrays.
+
+    The product follows the matrix convention of transformations:
+    (q1 * q2).matrix() equals tr.matmul([q1.matrix(), q2.matrix()]).
+    """
+    __slots__ = ("w", "x", "y", "z")
+
+    def __init__(self, w=1.0, x=0.0, y=0.0, z=0.0):
+        self.w = float(w)
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+    @classmethod
+    def fromAxisAngle(cls, axis, theta):
+        """Rotation of theta radians around axis, as transformations.rotationA"""
+
+        norm = math.sqrt(axis[0] * axis[0] + axis[1] * axis[1] + axis[2] * axis[2])
+        s = math.sin(theta / 2) / norm
+        return cls(math.cos(theta / 2), axis[0] * s, axis[1] * s, axis[2] * s)
+
+    @classmethod
+    def fromEuler(cls, thetaX, thetaY, thetaZ, order="XYZ"):
+        """
+        Same rotation as multiplying rotationX, rotationY and rotationZ in the
+        given order, e.g. order="YXZ" is tr.matmul([rotationY, rotationX, rotationZ]).
+        """
+        w, x, y, z = 1.0, 0.0, 0.0, 0.0
+        for axis in order:
+            # Product by a rotation around a single axis, written out
+            if axis == "X":
+                c, s = math.cos(thetaX / 2), math.sin(thetaX / 2)
+                w, x, y, z = w * c - x * s, x * c + w * s, y * c + z * s, z * c - y * s
+            elif axis == "Y":
+                c, s = math.cos(thetaY / 2), math.sin(thetaY / 2)
+                w, x, y, z = w * c - y * s, x * c - z * s, y * c + w * s, z * c + x * s
+            else:
+                c, s = math.cos(thetaZ / 2), math.sin(thetaZ / 2)
+                w, x, y, z = w * c - z * s, x * c + y * s, y * c - x * s, z * c + w * s
+
+        return cls(w, x, y, z)
+
+    def __mul__(self, other):
+        w1, x1, y1, z1 = self.w, self.x, self.y, self.z
+        w2, x2, y2, z2 = other.w, other.x, other.y, other.z
+        return Quaternion(
+            w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+            w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+            w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+            w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2)
+
+    def dot(self, other):
+        return self.w * other.w + self.x * other.x + self.y * other.y + self.z * other.z
+
+    def norm(self):
+        return math.sqrt(self.dot(self))
+
+    def normalized(self):
+        norm = self.norm()
+        return Quaternion(self.w / norm, self.x / norm, self.y / norm, self.z / norm)
+
+    def conjugate(self):
+        """Inverse rotation, for unit quaternions"""
+        return Quaternion(self.w, -self.x, -self.y, -self.z)
+
+    def rotate(self, vector):
+        """Rotates a 3D vector, returned as a tuple"""
+
+        w, x, y, z = self.w, self.x, self.y, self.z
+        vx, vy, vz = vector[0], vector[1], vector[2]
+
+        # v + 2w (u x v) + 2 u x (u x v), with u = (x, y, z)
+        cx = 2 * (y * vz - z * vy)
+        cy = 2 * (z * vx - x * vz)
+        cz = 2 * (x * vy - y * vx)
+        return (vx + w * cx + y * cz - z * cy,
+                vy + w * cy + z * cx - x * cz,
+                vz + w * cz + x * cy - y * cx)
+
+    def matrix(self):
+        """4x4 rotation matrix"""
+        return trsMatrix((0.0, 0.0, 0.0), self, (1.0, 1.0, 1.0))
+
+    def __repr__(self):
+        return f"Quaternion({self.w}, {self.x}, {self.y}, {self.z})"
+
+
+# Shared by transforms without rotation, quaternions are never modified in place
+IDENTITY = Quaternion()
+
+
+def slerp(q1, q2, t):
+    """Spherical interpolation between unit quaternions, along the shortest path"""
+
+    w2, x2, y2, z2 = q2.w, q2.x, q2.y, q2.z
+    cosTheta = q1.dot(q2)
+
+    # q and -q are the same rotation, the closest one is taken
+    if cosTheta < 0:
+        w2, x2, y2, z2 = -w2, -x2, -y2, -z2
+        cosTheta = -cosTheta
+
+    # Almost the same rotation, sin(theta) would vanish
+    if cosTheta > 0.9995:
+        a, b = 1 - t, t
+    else:
+        theta = math.acos(cosTheta)
+        sinTheta = math.sin(theta)
+        a = math.sin((1 - t) * theta) / sinTheta
+        b = math.sin(t * theta) / sinTheta
+
+    return Quaternion(a * q1.w + b * w2, a * q1.x + b * x2, a * q1.y + b * y2, a * q1.z + b * z2).normalized()
+
+
+def trsMatrix(translation, rotation, scale):
+    """
+    tr.matmul([tr.translate(*translation), rotation.matrix(), tr.scale(*scale)])
+    written out from the quaternion, without intermediate matrices.
+    """
+    w, x, y, z = rotation.w, rotation.x, rotation.y, rotation.z
+    sx, sy, sz = scale[0], scale[1], scale[2]
+
+    xx, yy, zz = 2 * x * x, 2 * y * y, 2 * z * z
+    xy, xz, yz = 2 * x * y, 2 * x * z, 2 * y * z
+    wx, wy, wz = 2 * w * x, 2 * w * y, 2 * w * z
+
+    return np.array([
+        (1 - yy - zz) * sx, (xy - wz) * sy, (xz + wy) * sz, translation[0],
+        (xy + wz) * sx, (1 - xx - zz) * sy, (yz - wx) * sz, translation[1],
+        (xz - wy) * sx, (yz + wx) * sy, (1 - xx - yy) * sz, translation[2],
+        0, 0, 0, 1], dtype=np.float32).reshape(4, 4)
+
+
+class TRS:
+    """
+    Transform made of a translation, a rotation and a scale, applied to
+    points in the order scale, rotate, translate.
+    """
+    __slots__ = ("translation", "rotation", "scale")
+
+    def __init__(self, translation=(0.0, 0.0, 0.0), rotation=None, scale=(1.0, 1.0, 1.0)):
+        self.translation = (float(translation[0]), float(translation[1]), float(translation[2]))
+        self.rotation = IDENTITY if rotation is None else rotation
+        self.scale = (float(scale[0]), float(scale[1]), float(scale[2]))
+
+    def matrix(self):
+        return trsMatrix(self.translation, self.rotation, self.scale)
+
+    def transformPoint(self, point):
+        sx, sy, sz = self.scale
+        rx, ry, rz = self.rotation.rotate((point[0] * sx, point[1] * sy, point[2] * sz))
+        tx, ty, tz = self.translation
+        return (rx + tx, ry + ty, rz + tz)
+
+    def __mul__(self, other):
+        """
+        Composition, applying other first. Exact when this scale is uniform,
+        otherwise a non uniform scale followed by a rotation would need a shear.
+        """
+        sx, sy, sz = self.scale
+        ox, oy, oz = other.scale
+        return TRS(
+            self.transformPoint(other.translation),
+            self.rotation * other.rotation,
+            (sx * ox, sy * oy, sz * oz))
+
+    def __repr__(self):
+        return f"TRS({self.translation}, {self.rotation}, {self.scale})"
+
+
+def interpolate(trs1, trs2, t):
+    """Linear interpolation of translation and scale, spherical of the rotation"""
+
+    return TRS(
+        [a + (b - a) * t for a, b in zip(trs1.translation, trs2.translation)],
+        slerp(trs1.rotation, trs2.rotation, t),
+        [a + (b - a) * t for a, b in zip(trs1.scale, trs2.scale)])
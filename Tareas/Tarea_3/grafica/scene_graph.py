@@ -6,10 +6,81 @@ import OpenGL.GL.shaders
 import numpy as np
 import grafica.transformations as tr
 import grafica.gpu_shape as gs
+import grafica.shader_program as sp
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
 
+# A node shared by several parents keeps one world transform per parent,
+# up to this many, before its cache is emptied
+MAX_CACHED_PARENTS = 4
+
+# Parent transform of every root, read only so it can be shared
+IDENTITY = tr.identity()
+IDENTITY.flags.writeable = False
+
+# Increased whenever nodes are added, removed, enabled, disabled or moved to
+# another layer, so compiled DrawLists know they must be built again
+structureVersion = 0
+
+
+def structureChanged():
+    global structureVersion
+    structureVersion += 1
+
+
+class ChildList(list):
+    """
+    List of childs of a SceneGraphNode.
+    Every change goes through the owner, which keeps parent pointers and
+    name indices up to date. Node names must not change once added.
+    """
+    def __init__(self, owner, childs=()):
+        super().__init__()
+        self.owner = owner
+        self.extend(childs)
+
+    def append(self, child):
+        self.owner.attach(child)
+        super().append(child)
+
+    def insert(self, position, child):
+        self.owner.attach(child)
+        super().insert(position, child)
+
+    def extend(self, childs):
+        for child in list(childs):
+            self.append(child)
+
+    def __iadd__(self, childs):
+        self.extend(childs)
+        return self
+
+    def remove(self, child):
+        super().remove(child)
+        self.owner.detach(child)
+
+    def pop(self, position=-1):
+        child = super().pop(position)
+        self.owner.detach(child)
+        return child
+
+    def clear(self):
+        while len(self) > 0:
+            self.pop()
+
+    def __setitem__(self, position, child):
+        if isinstance(position, slice):
+            raise TypeError("Slice assignment is not supported on scene graph childs")
+        self.owner.attach(child)
+        self.owner.detach(self[position])
+        super().__setitem__(position, child)
+
+    def __delitem__(self, position):
+        if isinstance(position, slice):
+            raise TypeError("Slice deletion is not supported on scene graph childs")
+        self.pop(position)
+
 
 class SceneGraphNode:
     """
@@ -17,12 +88,153 @@ class SceneGraphNode:
     Each node represents a group of objects
     Each leaf represents a basic figure (GPUShape)
     To identify each node properly, it MUST have a unique name
+
+    Every node indexes the names of its subtree, so findNode takes constant
+    time, and knows its parents. Adding a node whose name is already used by
+    a different node of the graph raises ValueError.
+
+    Keeping the index up to date is what adding and removing cost: every
+    distinct ancestor updates one entry per name of the moved subtree, so a
+    subtree of k names under a tree of depth d takes O(d * k). Removing also
+    searches the childs of the parent, O(siblings), since their order is the
+    drawing order.
+
+    World transforms are cached: they are recomputed only after a new matrix
+    is assigned to transform, or when the world transform of the parent
+    changed. Matrices must be replaced, not modified in place.
+
+    Disabled nodes are not drawn, neither their subtrees. The layer sets the
+    drawing order of a DrawList, None takes the layer of the parent.
     """
     def __init__(self, name):
         self.name = name
         self.transform = tr.identity()
+        self.parents = []
+        self.enabled = True
+        self.layer = None
+
+        # name -> [node, number of paths from this node to it]
+        self.index = {name: [self, 1]}
         self.childs = []
 
+    def __setattr__(self, name, value):
+        # Assigned childs go through the index, reading them is a plain attribute access
+        if name == "childs":
+            value = self.replaceChilds(value)
+        elif (name == "enabled" or name == "layer") and self.__dict__.get(name) != value:
+            structureChanged()
+        super().__setattr__(name, value)
+
+    def replaceChilds(self, childs):
+        current = self.__dict__.get("childs")
+
+        # node.childs += [...] extends the list in place and assigns it back
+        if current is childs:
+            return childs
+
+        if current is not None:
+            current.clear()
+        return ChildList(self, childs)
+
+    @property
+    def parent(self):
+        """First parent of the node, None for a root"""
+        return self.parents[0] if len(self.parents) > 0 else None
+
+    def ancestors(self):
+        """This node and its ancestors, once for each path reaching them"""
+
+        yield self
+        for parent in self.parents:
+            yield from parent.ancestors()
+
+    def ancestorPaths(self):
+        """This node and each of its distinct ancestors, with the number of paths reaching it"""
+
+        counts = {}
+        for ancestor in self.ancestors():
+            entry = counts.setdefault(id(ancestor), [ancestor, 0])
+            entry[1] += 1
+        return list(counts.values())
+
+    def attach(self, child):
+        """Registers the names of a new child subtree in this node and its ancestors"""
+
+        structureChanged()
+        if not isinstance(child, SceneGraphNode):
+            return
+
+        ancestors = self.ancestorPaths()
+        if any(ancestor is child for ancestor, _ in ancestors):
+            raise ValueError("A scene graph node can not be its own descendant: " + str(child.name))
+
+        # Checked before changing anything, so a failed add leaves the graph as it was
+        for ancestor, _ in ancestors:
+            for name, (node, _) in child.index.items():
+                entry = ancestor.index.get(name)
+                if entry is not None and entry[0] is not node:
+                    raise ValueError("Duplicated scene graph node name: " + str(name))
+
+        # An ancestor reached by several paths reaches the subtree through each of them
+        for ancestor, count in ancestors:
+            for name, (node, paths) in child.index.items():
+                entry = ancestor.index.setdefault(name, [node, 0])
+                entry[1] += count * paths
+
+        child.parents.append(self)
+
+    def detach(self, child):
+        """Removes the names of a removed child subtree from this node and its ancestors"""
+
+        structureChanged()
+        if not isinstance(child, SceneGraphNode):
+            return
+
+        for ancestor, count in self.ancestorPaths():
+            for name, (_, paths) in child.index.items():
+                entry = ancestor.index[name]
+                entry[1] -= count * paths
+                if entry[1] == 0:
+                    del ancestor.index[name]
+
+        child.parents.remove(self)
+
+    def remove(self):
+        """Takes this node out of every parent"""
+
+        for parent in list(self.parents):
+            parent.childs.remove(self)
+
+    @property
+    def transform(self):
+        return self._transform
+
+    @transform.setter
+    def transform(self, transform):
+        self._transform = transform
+        self.worldTransforms = {}
+
+    def worldTransform(self, parentTransform):
+        """
+        parentTransform times transform, computed once per parent matrix.
+        Cached parents are recognized by identity, so an unchanged parent hands
+        the same array to its childs and their products are reused too.
+        The returned matrix is read only.
+        """
+        cached = self.worldTransforms.get(id(parentTransform))
+        if cached is not None and cached[0] is parentTransform:
+            return cached[1]
+
+        worldTransform = np.matmul(parentTransform, self._transform)
+        worldTransform.flags.writeable = False
+
+        if len(self.worldTransforms) >= MAX_CACHED_PARENTS:
+            self.worldTransforms.clear()
+
+        # The parent matrix is kept alive, so its id is never reused while cached
+        self.worldTransforms[id(parentTransform)] = (parentTransform, worldTransform)
+        return worldTransform
+
     def clear(self):
         """Freeing GPU memory"""
 
@@ -38,18 +250,9 @@ def findNode(node, name):
     if isinstance(node, gs.GPUShape):
         return None
 
-    # This is the requested node
-    if node.name == name:
-        return node
-    
-    # All childs are checked for the requested name
-    for child in node.childs:
-        foundNode = findNode(child, name)
-        if foundNode != None:
-            return foundNode
-
-    # No child of this node had the requested name
-    return None
+    # Every node indexes the names of its subtree
+    entry = node.index.get(name)
+    return None if entry is None else entry[0]
 
 
 def findTransform(node, name, parentTransform=tr.identity()):
@@ -58,7 +261,7 @@ def findTransform(node, name, parentTransform=tr.identity()):
     if isinstance(node, gs.GPUShape):
         return None
 
-    newTransform = np.matmul(parentTransform, node.transform)
+    newTransform = node.worldTransform(parentTransform)
 
     # This is the requested node
     if node.name == name:
@@ -85,22 +288,215 @@ def findPosition(node, name, parentTransform=tr.identity()):
     return None
 
 
+def isLeaf(node):
+    """A node holding a single GPUShape"""
+    return len(node.childs) == 1 and isinstance(node.childs[0], gs.GPUShape)
+
+
 def drawSceneGraphNode(node, pipeline, transformName, parentTransform=tr.identity()):
     assert(isinstance(node, SceneGraphNode))
 
-    # Composing the transformations through this path
-    newTransform = np.matmul(parentTransform, node.transform)
+    # Hidden subtrees are skipped instead of drawn with a null scale
+    if not node.enabled:
+        return
+
+    # Composing the transformations through this path, cached while unchanged
+    newTransform = node.worldTransform(parentTransform)
 
     # If the child node is a leaf, it should be a GPUShape.
     # Hence, it can be drawn with drawCall
-    if len(node.childs) == 1 and isinstance(node.childs[0], gs.GPUShape):
+    if isLeaf(node):
         leaf = node.childs[0]
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, transformName), 1, GL_TRUE, newTransform)
+        pipeline.setMat4(transformName, newTransform)
         pipeline.drawCall(leaf)
 
     # If the child node is not a leaf, it MUST be a SceneGraphNode,
     # so this draw function is called recursively
     else:
+        # Consecutive sibling leaves are drawn together, so copies of a shape
+        # are instanced while the children keep their drawing order
+        leaves = []
         for child in node.childs:
+            if isLeaf(child):
+                if child.enabled:
+                    leaves.append(child)
+                continue
+
+            drawSceneGraphLeaves(leaves, pipeline, transformName, newTransform)
+            leaves = []
             drawSceneGraphNode(child, pipeline, transformName, newTransform)
 
+        drawSceneGraphLeaves(leaves, pipeline, transformName, newTransform)
+
+
+def drawSceneGraphLeaves(leaves, pipeline, transformName, parentTransform):
+    """Sibling leaves, in order, through drawShapes when there is more than one"""
+
+    if len(leaves) == 1:
+        drawSceneGraphNode(leaves[0], pipeline, transformName, parentTransform)
+    elif len(leaves) > 1:
+        pipeline.drawShapes([leaf.childs[0] for leaf in leaves],
+            [leaf.worldTransform(parentTransform) for leaf in leaves], transformName)
+
+
+class DrawList:
+    """
+    Leaves of one or more scene graphs flattened into a list of
+    (pipeline, VAO, texture, world matrix) records.
+
+    Records are sorted by layer, pipeline, texture and buffers, so drawing them
+    switches programs and bindings as few times as possible, and consecutive
+    copies of a shape become one instanced draw call when the pipeline
+    supports it. The list is only built and sorted again after the structure
+    of a graph changes; when only transforms change, draw() just refreshes
+    the world matrices.
+
+    Within a layer the drawing order follows the state, not the graph, so
+    blended shapes that rely on being drawn last need a higher layer.
+    Textures are bound as GL_TEXTURE_2D.
+    """
+    def __init__(self, transformName):
+        self.transformName = transformName
+        self.graphs = []
+        self.version = None
+
+        # Nodes in depth first order with the slot of their parent, -1 for roots
+        self.nodes = []
+        self.parentSlots = []
+        self.worldTransforms = []
+
+        # (sort key, pipeline, gpuShape, slot of the node holding it)
+        self.records = []
+
+        # Runs of records with the same pipeline and instanceKey
+        self.batches = []
+
+        # State changes of the last draw
+        self.programSwitches = 0
+        self.textureSwitches = 0
+        self.vaoSwitches = 0
+
+    def add(self, node, pipeline):
+        """Adds a graph, drawn with pipeline"""
+
+        assert(isinstance(node, SceneGraphNode))
+        self.graphs.append((node, pipeline))
+        self.version = None
+
+    def compile(self):
+        self.nodes = []
+        self.parentSlots = []
+        self.records = []
+        pipelineOrder = {}
+
+        for root, pipeline in self.graphs:
+            order = pipelineOrder.setdefault(id(pipeline), len(pipelineOrder))
+            self.collect(root, pipeline, order, -1, 0)
+
+        # Sorting is stable, so equal states keep the order of the graph
+        self.records.sort(key=lambda record: record[0])
+        self.batches = []
+        for record in self.records:
+            _, pipeline, gpuShape, _ = record
+            if len(self.batches) > 0:
+                last = self.batches[-1][0]
+                if last[1] is pipeline and sp.instanceKey(last[2]) == sp.instanceKey(gpuShape):
+                    self.batches[-1].append(record)
+                    continue
+            self.batches.append([record])
+
+        self.worldTransforms = [None] * len(self.nodes)
+        self.version = structureVersion
+
+    def collect(self, node, pipeline, pipelineOrder, parentSlot, layer):
+        if not node.enabled:
+            return
+
+        if node.layer is not None:
+            layer = node.layer
+
+        slot = len(self.nodes)
+        self.nodes.append(node)
+        self.parentSlots.append(parentSlot)
+
+        # Same leaf convention as drawSceneGraphNode
+        if isLeaf(node):
+            leaf = node.childs[0]
+            texture = -1 if leaf.texture is None else leaf.texture
+            key = (layer, pipelineOrder, texture, leaf.vbo, leaf.vao)
+            self.records.append((key, pipeline, leaf, slot))
+            return
+
+        for child in node.childs:
+            self.collect(child, pipeline, pipelineOrder, slot, layer)
+
+    def update(self):
+        """Compiles the list again if a graph changed, and refreshes the world matrices"""
+
+        if self.version != structureVersion:
+            self.compile()
+
+        # Parents come before their childs, unchanged transforms hit the node caches
+        worldTransforms = self.worldTransforms
+        for slot, node in enumerate(self.nodes):
+            parentSlot = self.parentSlots[slot]
+            parentTransform = IDENTITY if parentSlot < 0 else worldTransforms[parentSlot]
+            worldTransforms[slot] = node.worldTransform(parentTransform)
+
+    def draw(self, update=True):
+        """Draws the list, update=False if update() was already called this frame"""
+
+        if update:
+            self.update()
+
+        self.programSwitches = 0
+        self.textureSwitches = 0
+        self.vaoSwitches = 0
+
+        currentPipeline = None
+        currentTexture = None
+        currentVao = None
+
+        worldTransforms = self.worldTransforms
+        for batch in self.batches:
+            pipeline = batch[0][1]
+            if pipeline is not currentPipeline:
+                glUseProgram(pipeline.shaderProgram)
+                currentPipeline = pipeline
+                self.programSwitches += 1
+
+            if len(batch) >= sp.MIN_INSTANCES and pipeline.supportsInstancing():
+                gpuShape = batch[0][2]
+                pipeline.drawInstanced(gpuShape, [worldTransforms[slot] for _, _, _, slot in batch])
+
+                # drawInstanced binds its own VAO and unbinds it afterwards
+                if gpuShape.texture is not None and gpuShape.texture != currentTexture:
+                    currentTexture = gpuShape.texture
+                    self.textureSwitches += 1
+                currentVao = None
+                self.vaoSwitches += 1
+                continue
+
+            for _, _, gpuShape, slot in batch:
+                if gpuShape.texture is not None and gpuShape.texture != currentTexture:
+                    glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
+                    currentTexture = gpuShape.texture
+                    self.textureSwitches += 1
+
+                if gpuShape.vao != currentVao:
+                    glBindVertexArray(gpuShape.vao)
+                    currentVao = gpuShape.vao
+                    self.vaoSwitches += 1
+
+                pipeline.setMat4(self.transformName, worldTransforms[slot])
+                glDrawElements(GL_TRIANGLES, gpuShape.size, GL_UNSIGNED_INT, None)
+                pipeline.countDrawCall()
+
+        glBindVertexArray(0)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __str__(self):
+        return f"DrawList [{len(self.records)} records in {len(self.batches)} batches - {self.programSwitches} programs - " +\
+            f"{self.textureSwitches} textures - {self.vaoSwitches} VAOs]"
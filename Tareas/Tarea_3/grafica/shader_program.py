@@ -0,0 +1,260 @@
+# coding=utf-8
+"""Base class for shader programs with cached uniform locations and change tracked uniforms"""
+
+from OpenGL.GL import *
+import numpy as np
+from grafica.gpu_shape import GPUShape
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+
+class GLCallCounter:
+    """
+    Counts the draw calls and uniform uploads issued through the shader programs.
+    It must be reset once per frame.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.drawCalls = 0
+        self.uniformUploads = 0
+        self.skippedUploads = 0
+
+    def __str__(self):
+        return f" [{self.drawCalls} draws - {self.uniformUploads} uniforms - {self.skippedUploads} skipped]"
+
+
+# Shared by every shader program
+callCounter = GLCallCounter()
+
+# Per instance model matrix of the pipelines supporting instancing, read
+# instead of the model uniform while the "instanced" uniform is true
+INSTANCE_ATTRIBUTE = "instanceModel"
+
+# Shapes sharing buffers and texture are instanced from this many copies on
+MIN_INSTANCES = 2
+
+
+def activeUniforms(shaderProgram):
+    """
+    Dictionary name -> (location, type) with the active uniforms of a linked program.
+    Arrays are listed both as "name[0]" and "name".
+    """
+    uniforms = {}
+    count = glGetProgramiv(shaderProgram, GL_ACTIVE_UNIFORMS)
+
+    for index in range(count):
+        name, size, uniformType = glGetActiveUniform(shaderProgram, index)
+        name = name.decode("utf-8") if isinstance(name, bytes) else name
+        location = glGetUniformLocation(shaderProgram, name)
+        uniforms[name] = (location, uniformType)
+
+        if name.endswith("[0]"):
+            uniforms[name[:-3]] = (location, uniformType)
+
+    return uniforms
+
+
+def instanceKey(gpuShape):
+    """GPUShapes with the same key can be drawn by a single instanced call"""
+    return (gpuShape.vbo, gpuShape.ebo, gpuShape.size, gpuShape.texture)
+
+
+class InstancedShape:
+    """
+    VAO reading the vertex buffers and texture of a GPUShape, plus a buffer
+    with one model matrix per instance.
+    """
+    def __init__(self, pipeline, gpuShape):
+        self.shape = GPUShape()
+        self.shape.vao = glGenVertexArrays(1)
+        self.shape.vbo = gpuShape.vbo
+        self.shape.ebo = gpuShape.ebo
+        self.shape.size = gpuShape.size
+        self.shape.texture = gpuShape.texture
+        pipeline.setupVAO(self.shape)
+
+        self.instanceVbo = glGenBuffers(1)
+        self.count = 0
+
+        glBindVertexArray(self.shape.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instanceVbo)
+
+        # A mat4 attribute takes 4 locations, one per column, advanced once per instance
+        location = pipeline.instanceLocation
+        for column in range(4):
+            glVertexAttribPointer(location + column, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(16 * column))
+            glEnableVertexAttribArray(location + column)
+            glVertexAttribDivisor(location + column, 1)
+
+        glBindVertexArray(0)
+
+    def upload(self, transforms):
+        """Sends a list or (N, 4, 4) array of row major matrices"""
+
+        # Transposed, so every column is contiguous as the attribute expects
+        matrices = np.asarray(transforms, dtype=np.float32).reshape(-1, 4, 4)
+        data = np.ascontiguousarray(np.transpose(matrices, (0, 2, 1)))
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.instanceVbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STREAM_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.count = len(matrices)
+
+    def clear(self):
+        """Freeing the VAO and instance buffer, the vertex buffers belong to the GPUShape"""
+        glDeleteBuffers(1, [self.instanceVbo])
+        glDeleteVertexArrays(1, [self.shape.vao])
+
+
+class ShaderProgram:
+    """
+    Uniform locations are queried once, when shaderProgram is assigned after
+    linking, and every setter skips the GL call if the uniform already holds
+    that value. As with glUniform, setters affect the program in use.
+
+    Values uploaded with glUniform directly are not tracked, invalidate() must
+    be called after doing so.
+
+    Pipelines whose vertex shader declares the instanceModel attribute can
+    also draw many copies of a shape in one call with drawInstanced.
+    """
+
+    @property
+    def shaderProgram(self):
+        return self._shaderProgram
+
+    @shaderProgram.setter
+    def shaderProgram(self, shaderProgram):
+        self._shaderProgram = shaderProgram
+        self.uniforms = activeUniforms(shaderProgram)
+        self.uniformValues = {}
+        self.instanceLocation = glGetAttribLocation(shaderProgram, INSTANCE_ATTRIBUTE)
+        self.instancedShapes = {}
+
+    def uniformLocation(self, name):
+        """Cached location of a uniform, -1 if it is not active in the program"""
+
+        uniform = self.uniforms.get(name)
+        return -1 if uniform is None else uniform[0]
+
+    def invalidate(self):
+        """Forgets the uploaded values, so the next setters upload again"""
+        self.uniformValues.clear()
+
+    def changed(self, name, value):
+        if name not in self.uniforms:
+            return False
+
+        if self.uniformValues.get(name) == value:
+            callCounter.skippedUploads += 1
+            return False
+
+        self.uniformValues[name] = value
+        callCounter.uniformUploads += 1
+        return True
+
+    def setFloat(self, name, value):
+        value = float(value)
+        if self.changed(name, value):
+            glUniform1f(self.uniforms[name][0], value)
+
+    def setInt(self, name, value):
+        value = int(value)
+        if self.changed(name, value):
+            glUniform1i(self.uniforms[name][0], value)
+
+    def setUint(self, name, value):
+        value = int(value)
+        if self.changed(name, value):
+            glUniform1ui(self.uniforms[name][0], value)
+
+    def setVec3(self, name, value):
+        value = (float(value[0]), float(value[1]), float(value[2]))
+        if self.changed(name, value):
+            glUniform3f(self.uniforms[name][0], *value)
+
+    def setVec4(self, name, value):
+        value = (float(value[0]), float(value[1]), float(value[2]), float(value[3]))
+        if self.changed(name, value):
+            glUniform4f(self.uniforms[name][0], *value)
+
+    def setMat4(self, name, matrix):
+        """Uploads a row major 4x4 matrix, as the ones built by transformations"""
+
+        # Bytes compare by value and are immutable, unlike the caller's array
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if self.changed(name, matrix.tobytes()):
+            glUniformMatrix4fv(self.uniforms[name][0], 1, GL_TRUE, matrix)
+
+    def countDrawCall(self):
+        callCounter.drawCalls += 1
+
+    def supportsInstancing(self):
+        return self.instanceLocation >= 0
+
+    def drawInstanced(self, gpuShape, transforms, mode=GL_TRIANGLES):
+        """
+        Draws gpuShape once per matrix in transforms with a single draw call.
+        The instanced VAO is built on first use, for the buffers the shape
+        has at that moment.
+        """
+        if not self.supportsInstancing():
+            raise ValueError(type(self).__name__ + " does not support instancing")
+
+        key = instanceKey(gpuShape)
+        instanced = self.instancedShapes.get(key)
+        if instanced is None:
+            instanced = InstancedShape(self, gpuShape)
+            self.instancedShapes[key] = instanced
+
+        instanced.upload(transforms)
+
+        self.setInt("instanced", 1)
+        glBindVertexArray(instanced.shape.vao)
+        if gpuShape.texture is not None:
+            glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
+
+        glDrawElementsInstanced(mode, gpuShape.size, GL_UNSIGNED_INT, None, instanced.count)
+        self.countDrawCall()
+
+        glBindVertexArray(0)
+        self.setInt("instanced", 0)
+
+    def drawShapes(self, gpuShapes, transforms, transformName, mode=GL_TRIANGLES):
+        """
+        Draws every GPUShape with its transform, in the given order. If the
+        pipeline supports instancing, consecutive shapes sharing buffers and
+        texture take one draw call, so blending still sees the same order.
+        """
+        if not self.supportsInstancing():
+            for gpuShape, transform in zip(gpuShapes, transforms):
+                self.setMat4(transformName, transform)
+                self.drawCall(gpuShape, mode)
+            return
+
+        runs = []
+        for gpuShape, transform in zip(gpuShapes, transforms):
+            key = instanceKey(gpuShape)
+            if runs and runs[-1][0] == key:
+                runs[-1][1].append((gpuShape, transform))
+            else:
+                runs.append((key, [(gpuShape, transform)]))
+
+        for _, run in runs:
+            if len(run) >= MIN_INSTANCES:
+                self.drawInstanced(run[0][0], [transform for _, transform in run], mode)
+                continue
+
+            for gpuShape, transform in run:
+                self.setMat4(transformName, transform)
+                self.drawCall(gpuShape, mode)
+
+    def clearInstancing(self):
+        """Freeing the VAOs and buffers created by drawInstanced"""
+
+        for instanced in self.instancedShapes.values():
+            instanced.clear()
+        self.instancedShapes.clear()
@@ -9,6 +9,7 @@ import OpenGL.GL.shaders
 import numpy as np
 import grafica.basic_shapes as bs
 import grafica.easy_shaders as es
+from grafica.shader_program import ShaderProgram
 import grafica.font8x8_basic as f88
 
 __author__ = "Daniel Calderon"
@@ -89,22 +90,31 @@ def getCharacterShape(char):
     return bs.Shape(vertices, indices)
 
 
+# 3d positions + 3d texture coordinates of the 3D font texture
+TEXT_LAYOUT = bs.VertexLayout(("position", 3), ("texCoords", 3))
+
+
 def textToShape(text, charWidth, charHeight):
 
-    shape = bs.Shape([],[])
+    if len(text) == 0:
+        return bs.ArrayShape([], [], TEXT_LAYOUT)
+
+    # Every character is the same quad, shifted by its position in the text
+    quad = bs.toArrayShape(getCharacterShape(" "), TEXT_LAYOUT)
+    n = len(text)
+
+    vertexData = np.tile(quad.vertexData, (n, 1)).reshape(n, 4, TEXT_LAYOUT.stride)
+    vertexData[:, :, 0] += np.arange(n, dtype=np.float32)[:, None]
+    vertexData[:, :, 0:3] *= np.array([charWidth, charHeight, 1], dtype=np.float32)
+    vertexData[:, :, 3] = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)[:, None]
 
-    for i in range(len(text)):
-        char = text[i]
-        charShape = getCharacterShape(char)
-        bs.applyOffset(charShape, 6, [i, 0, 0])
-        bs.scaleVertices(charShape, 6, [charWidth, charHeight, 1])
-        bs.merge(shape, 6, charShape)
+    indices = (quad.indices[None, :] + 4 * np.arange(n, dtype=np.uint32)[:, None]).reshape(-1)
 
-    return shape
+    return bs.ArrayShape(vertexData.reshape(-1, TEXT_LAYOUT.stride), indices, TEXT_LAYOUT)
 
 
 
-class TextureTextRendererShaderProgram:
+class TextureTextRendererShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -182,6 +192,7 @@ class TextureTextRendererShaderProgram:
         glBindVertexArray(gpuShape.vao)
         glBindTexture(GL_TEXTURE_3D, gpuShape.texture)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        self.countDrawCall()
         
         # Unbind the current VAO
         glBindVertexArray(0)
@@ -112,6 +112,107 @@ def matmul(mats):
 
     return out
 
+# Batched versions: every parameter may be a scalar or an array of N values,
+# and N matrices are returned as a (N, 4, 4) stack. If out is given, the
+# matrices are written there instead of in a new array.
+
+def identityN(n, out=None):
+    if out is None:
+        out = np.zeros((n, 4, 4), dtype=np.float32)
+    else:
+        assert out.shape == (n, 4, 4)
+        out[...] = 0
+
+    out[:, 0, 0] = 1
+    out[:, 1, 1] = 1
+    out[:, 2, 2] = 1
+    out[:, 3, 3] = 1
+    return out
+
+
+def uniformScaleN(s, out=None):
+    s = np.ravel(s)
+    out = identityN(s.size, out)
+    out[:, 0, 0] = s
+    out[:, 1, 1] = s
+    out[:, 2, 2] = s
+    return out
+
+
+def scaleN(sx, sy, sz, out=None):
+    sx, sy, sz = np.broadcast_arrays(np.ravel(sx), np.ravel(sy), np.ravel(sz))
+    out = identityN(sx.size, out)
+    out[:, 0, 0] = sx
+    out[:, 1, 1] = sy
+    out[:, 2, 2] = sz
+    return out
+
+
+def rotationXN(theta, out=None):
+    theta = np.ravel(theta)
+    sin_theta = np.sin(theta)
+    cos_theta = np.cos(theta)
+
+    out = identityN(theta.size, out)
+    out[:, 1, 1] = cos_theta
+    out[:, 1, 2] = -sin_theta
+    out[:, 2, 1] = sin_theta
+    out[:, 2, 2] = cos_theta
+    return out
+
+
+def rotationYN(theta, out=None):
+    theta = np.ravel(theta)
+    sin_theta = np.sin(theta)
+    cos_theta = np.cos(theta)
+
+    out = identityN(theta.size, out)
+    out[:, 0, 0] = cos_theta
+    out[:, 0, 2] = sin_theta
+    out[:, 2, 0] = -sin_theta
+    out[:, 2, 2] = cos_theta
+    return out
+
+
+def rotationZN(theta, out=None):
+    theta = np.ravel(theta)
+    sin_theta = np.sin(theta)
+    cos_theta = np.cos(theta)
+
+    out = identityN(theta.size, out)
+    out[:, 0, 0] = cos_theta
+    out[:, 0, 1] = -sin_theta
+    out[:, 1, 0] = sin_theta
+    out[:, 1, 1] = cos_theta
+    return out
+
+
+def translateN(tx, ty, tz, out=None):
+    tx, ty, tz = np.broadcast_arrays(np.ravel(tx), np.ravel(ty), np.ravel(tz))
+    out = identityN(tx.size, out)
+    out[:, 0, 3] = tx
+    out[:, 1, 3] = ty
+    out[:, 2, 3] = tz
+    return out
+
+
+def matmulN(mats, out=None):
+    """
+    Product of a list of (N, 4, 4) stacks, matrix by matrix.
+    Single (4, 4) matrices in the list are applied to the whole stack.
+    """
+    result = mats[0]
+    for i in range(1, len(mats) - 1):
+        result = np.matmul(result, mats[i])
+
+    if len(mats) == 1:
+        if out is None:
+            return np.array(result, dtype=np.float32)
+        out[...] = result
+        return out
+
+    return np.matmul(result, mats[-1], out=out)
+
 
 def frustum(left, right, bottom, top, near, far):
     r_l = right - left
@@ -9,35 +9,40 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import grafica.basic_shapes as bs
 import grafica.easy_shaders as es
 import grafica.transformations as tr
+import grafica.quaternion as qt
 import grafica.performance_monitor as pm
 import shapes_3D as s3d
 import grafica.scene_graph as sg
-import ode_resolver as edo
 import grafica.assets_path as ap
+import grafica.geometry_cache as gc
+import grafica.resource_registry as rr
+
+# Cache de geometria: las bolas comparten la misma esfera y sombra, que ademas
+# se guardan en disco para no generarlas de nuevo en la siguiente ejecucion
+geometryCache = gc.GeometryCache(cacheDirectory=os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+
+# Registro de recursos: las bolas comparten los buffers de la esfera y la textura
+# de sombra, que se suben una sola vez a la GPU y se liberan con el ultimo clear()
+resourceRegistry = rr.ResourceRegistry()
 
 # Convenience function to ease initialization
 def createGPUShape(pipeline, shape, draw=GL_DYNAMIC_DRAW):
-    gpuShape = es.GPUShape().initBuffers()
-    pipeline.setupVAO(gpuShape)
-    gpuShape.fillBuffers(shape.vertices, shape.indices, draw)
-    return gpuShape
+    return resourceRegistry.createGPUShape(pipeline, shape, draw)
 
 # Crea gpu de texturas
 def createTextureGPUShape(shape, pipeline, path, draw=GL_DYNAMIC_DRAW):
     # Funcion Conveniente para facilitar la inicializacion de un GPUShape con texturas
-    gpuShape = es.GPUShape().initBuffers()
-    pipeline.setupVAO(gpuShape)
-    gpuShape.fillBuffers(shape.vertices, shape.indices, draw)
-    gpuShape.texture = es.textureSimpleSetup(
-        path, GL_CLAMP_TO_EDGE, GL_CLAMP_TO_EDGE, GL_NEAREST, GL_NEAREST)
-    return gpuShape
+    return resourceRegistry.createGPUShape(pipeline, shape, draw, path, GL_CLAMP_TO_EDGE, GL_NEAREST)
+
+# Giro de las bolas en z, para que la textura mire hacia la camara
+MEDIA_VUELTA = qt.Quaternion.fromEuler(0, 0, np.pi)
 
 
 class Circle:
 
     def __init__(self, pipeline, position, velocity, CIRCLE_DISCRETIZATION, RADIUS, texture):
-        shape = s3d.createTextureNormalSphere(CIRCLE_DISCRETIZATION)
-        shadow_shape = bs.createTextureNormalsPlane("sombra.png")
+        shape = geometryCache.get(s3d.createTextureNormalSphere, CIRCLE_DISCRETIZATION)
+        shadow_shape = geometryCache.get(bs.createTextureNormalsPlane, "sombra.png")
 
         # addapting the size of the circle's vertices to have a circle
         # with the desired radius
@@ -50,152 +55,66 @@ class Circle:
         self.radius   = RADIUS
         self.velocity = velocity
 
+        # Posicion al inicio del ultimo paso de fisica, para interpolar al dibujar
+        self.previousPosition = np.array(position, dtype=float)
 
-    def action(self, deltaTime, mu, gravity):
-
-        epsilon = 5e-3
-        if np.fabs(self.velocity[0]) < epsilon:
-            self.velocity[0] = 0.0
-            self.position[0] += 0.0
-            pass
-
-        if np.fabs(self.velocity[1]) < epsilon:
-            self.velocity[1] = 0
-            self.position[1] += 0
-            pass
-
-        # Euler integration
-        if self.velocity[0] >= 0:
-            self.velocity[0] += deltaTime*(-mu)*gravity
-            self.position[0] += deltaTime*self.velocity[0]
-
-        # modified Euler integration
-        elif self.velocity[0] < 0:
-            z = [self.position[0], self.velocity[0]]
-
-            def f(t, z):
-                return np.array([z[1], (mu)*gravity])
-
-            z = edo.modified_euler_step(f, deltaTime, 0, z)
-            self.velocity[0] = z[1]
-            self.position[0] = z[0]
-
-        # RK4 integration
-        if self.velocity[1] >= 0:
-            z = [self.position[1], self.velocity[1]]
-
-            def f(t, z):
-                return np.array([z[1], (-mu)*gravity])
+    def interpolatedPosition(self, alpha):
+        # alpha = 0 es el estado anterior de la fisica y alpha = 1 el actual
+        return self.previousPosition + (self.position - self.previousPosition) * alpha
 
-            z = edo.RK4_step(f, deltaTime, 0, z)
-            self.velocity[1] = z[1]
-            self.position[1] = z[0]
-
-        # improved Euler integration
-        elif self.velocity[1] < 0:
-            z = [self.position[1], self.velocity[1]]
-
-            def f(t, z):
-                return np.array([z[1], (mu)*gravity])
-
-            z = edo.improved_euler_step(f, deltaTime, 0, z)
-            self.velocity[1] = z[1]
-            self.position[1] = z[0]
-
-
-    def draw(self, transformName):
+    # Matrices armadas directo desde traslacion, rotacion y escala, sin multiplicar 4x4
+    def transform(self, alpha=1.0):
         scaleFactor = 2 * self.radius
-        glUniformMatrix4fv(glGetUniformLocation(self.pipeline.shaderProgram, transformName), 1, GL_TRUE,
-            tr.matmul([tr.translate(self.position[0], self.position[1], 0.0), tr.uniformScale(scaleFactor), tr.rotationZ(np.pi)])
-        )
-        self.pipeline.drawCall(self.gpuShape)
-
-        glUniformMatrix4fv(glGetUniformLocation(self.pipeline.shaderProgram, transformName), 1, GL_TRUE,
-            tr.matmul([tr.translate(self.position[0], self.position[1], -self.radius+0.001-0.5), tr.uniformScale(scaleFactor)])
-        )
-        self.pipeline.drawCall(self.gpuShadowShape)
-
-
-def rotate2D(vector, theta):
-    """
-    Direct application of a 2D rotation
-    """
-    sin_theta = np.sin(theta)
-    cos_theta = np.cos(theta)
+        position = self.interpolatedPosition(alpha)
+        return qt.trsMatrix((position[0], position[1], 0.0), MEDIA_VUELTA, (scaleFactor, scaleFactor, scaleFactor))
 
-    return np.array([
-        cos_theta * vector[0] - sin_theta * vector[1],
-        sin_theta * vector[0] + cos_theta * vector[1],
-        0
-    ], dtype = np.float32)
-
-
-def collide(circle1, circle2, c):
-    """
-    If there are a collision between the circles, it modifies the velocity of
-    both circles in a way that preserves energy and momentum.
-    """
-    
-    assert isinstance(circle1, Circle)
-    assert isinstance(circle2, Circle)
-
-    normal = circle2.position - circle1.position
-    normal /= np.linalg.norm(normal)
-
-    circle1MovingToNormal = np.dot(circle2.velocity, normal) > 0.0
-    circle2MovingToNormal = np.dot(circle1.velocity, normal) < 0.0
-
-    if not (circle1MovingToNormal and circle2MovingToNormal):
-
-        # obtaining the tangent direction
-        tangent = rotate2D(normal, np.pi/2.0)
-
-        # Projecting the velocity vector over the normal and tangent directions
-        # for both circles, 1 and 2.
-        v1n = np.dot(circle1.velocity, normal) * normal + 0.001
-        v1t = np.dot(circle1.velocity, tangent) * tangent
-
-        v2n = np.dot(circle2.velocity, normal) * normal + 0.001
-        v2t = np.dot(circle2.velocity, tangent) * tangent
-
-        # swaping the normal components...
-        circle1.velocity = (v1n * (1-c) + v2n * (1+c))/2 + v1t
-        circle2.velocity = (v2n * (1-c) + v1n * (1+c))/2 + v2t
-
-
-def areColliding(circle1, circle2):
-    assert isinstance(circle1, Circle)
-    assert isinstance(circle2, Circle)
-
-    difference = circle2.position - circle1.position
-    distance = np.linalg.norm(difference)
-    collisionDistance = circle2.radius + circle1.radius
-    return distance < collisionDistance
-
-def collideWithHole(circles, circle, point, radius):
-    d = np.linalg.norm(circle.position - point)
-    if d < circle.radius + radius:
-        circles.remove(circle)
-
-
-def collideWithBorder(circle, border_width, border_height):
-
-    offset = 0.028875
-    # Right
-    if circle.position[0] + circle.radius > border_width/2-offset:
-        circle.velocity[0] = -abs(circle.velocity[0])
-
-    # Left
-    if circle.position[0] < -border_width/2+offset + circle.radius:
-        circle.velocity[0] = abs(circle.velocity[0])
-
-    # Top
-    if circle.position[1] > border_height/2-offset - circle.radius:
-        circle.velocity[1] = -abs(circle.velocity[1])
-
-    # Bottom
-    if circle.position[1] < -border_height/2+offset + circle.radius:
-        circle.velocity[1] = abs(circle.velocity[1])
+    def shadowTransform(self, alpha=1.0):
+        scaleFactor = 2 * self.radius
+        position = self.interpolatedPosition(alpha)
+        return qt.trsMatrix((position[0], position[1], -self.radius+0.001-0.5), qt.IDENTITY,
+            (scaleFactor, scaleFactor, scaleFactor))
+
+
+# Dibuja bolas y sombras. Las sombras comparten buffers y textura, asi que si el
+# pipeline lo permite se dibujan todas con una sola llamada instanciada.
+# alpha interpola entre los dos ultimos estados de la fisica
+def drawCircles(circles, pipeline, transformName, alpha=1.0):
+    gpuShapes = [circle.gpuShape for circle in circles] + [circle.gpuShadowShape for circle in circles]
+    transforms = [circle.transform(alpha) for circle in circles] + [circle.shadowTransform(alpha) for circle in circles]
+    pipeline.drawShapes(gpuShapes, transforms, transformName)
+
+
+# Reloj de fisica a paso fijo: acumula el tiempo real de cada frame y lo consume en
+# pasos de largo constante, asi el resultado no depende de los fps
+class FixedTimestep:
+
+    def __init__(self, rate, maxSubsteps):
+        self.step = 1.0 / rate
+        self.maxSubsteps = maxSubsteps
+        self.accumulator = 0.0
+        self.alpha = 0.0
+        self.steps = 0          # pasos del ultimo frame
+        self.totalSteps = 0
+        self.droppedTime = 0.0  # tiempo descartado por superar maxSubsteps
+
+    def advance(self, frameTime):
+        # Cantidad de pasos a simular en este frame
+        self.accumulator += frameTime
+
+        # La tolerancia evita perder un paso por redondeo cuando el acumulador llega justo a un paso
+        steps = int(self.accumulator / self.step + 1e-9)
+
+        if steps > self.maxSubsteps:
+            # Frame muy largo: se descarta el resto para no atrasarse cada vez mas
+            steps = self.maxSubsteps
+            self.droppedTime += self.accumulator - steps * self.step
+            self.accumulator = steps * self.step
+
+        self.accumulator = max(self.accumulator - steps * self.step, 0.0)
+        self.alpha = self.accumulator / self.step
+        self.steps = steps
+        self.totalSteps += steps
+        return steps
 
 
 # Clase para manejar una camara que se mueve en coordenadas polares
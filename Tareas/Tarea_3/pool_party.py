@@ -13,19 +13,38 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import grafica.basic_shapes as bs
 import grafica.lighting_shaders as ls
 import grafica.transformations as tr
+import grafica.headless as hl
 import grafica.performance_monitor as pm
+import grafica.gl_accounting as gla
+import grafica.shader_program as sp
+import grafica.lighting_block as lb
 import grafica.scene_graph as sg
+import grafica.resource_registry as rr
 from model import *
+from pool_physics import PoolPhysics
+from event_physics import EventPhysics
+from pool_simulation import rackPositions, holePositions
+from pool_recording import PoolRecorder, PoolRecording, PoolReplay
+from shot_planner import ShotPlanner
 
 __author__ = "Sebastián Tapia"
 __license__ = "MIT"
 
 # Parameters
 
+# Modo sin ventana: --headless=N dibuja N frames fuera de pantalla y --dump-frames=DIR los guarda en PNG
+headless = hl.HeadlessMode.fromArguments()
+
 jsonFile = str(sys.argv[1])
 configuration = open(jsonFile,)
 params = json.load(configuration)
 
+# Si la configuracion trae "metricas", al cerrar se guardan los tiempos por frame
+# y por seccion en <metricas>.json y <metricas>.csv
+
+# Con "grabacion" cada paso de fisica se guarda en ese archivo, con "reproduccion"
+# se reproduce una grabacion sin simular
+
 NUMBER_OF_CIRCLES = 16
 CIRCLE_DISCRETIZATION = 20
 RADIUS = 0.028875
@@ -38,6 +57,17 @@ GRAVITY = 0.98
 MU = params["friccion"]
 C = params["restitucion"]
 
+# La fisica avanza en pasos fijos de 1/PHYSICS_RATE segundos, a lo mas MAX_SUBSTEPS por frame
+PHYSICS_RATE = params.get("frecuencia_fisica", 120)
+MAX_SUBSTEPS = params.get("max_subpasos", 8)
+
+# Con "fisica_eventos" las bolas avanzan en forma exacta de un choque al siguiente,
+# un paso por frame y sin interpolar al dibujar
+EVENT_PHYSICS = params.get("fisica_eventos", False)
+
+# Segundos que puede buscar el planificador de tiros al pedir un tiro sugerido con [B]
+PLANNER_BUDGET = params.get("planificador_tiempo", 1.0)
+
 # A class to store the application control
 class Controller:
     def __init__(self):
@@ -55,6 +85,12 @@ class Controller:
 
         self.heatMap = False
 
+        # Reproduccion de una grabacion, None si se simula
+        self.replay = None
+
+        # Se pidio un tiro sugerido
+        self.suggestShot = False
+
     # Entregar la referencia a la camara
     def get_camera(self):
         return self.polar_camera
@@ -96,6 +132,26 @@ class Controller:
             if action == glfw.PRESS:
                 controller.heatMap = not controller.heatMap
 
+        # Tiro sugerido por el planificador
+        if key == glfw.KEY_B:
+            if action == glfw.PRESS:
+                self.suggestShot = True
+
+        # Reproduccion: [P] pausa, [-] y [+] cambian la velocidad, [RePag] y [AvPag] saltan un segundo
+        if self.replay is not None and action == glfw.PRESS:
+            if key == glfw.KEY_P:
+                self.replay.togglePause()
+            elif key == glfw.KEY_MINUS:
+                self.replay.speed /= 2
+            elif key == glfw.KEY_EQUAL:
+                self.replay.speed *= 2
+            elif key == glfw.KEY_PAGE_UP:
+                self.replay.seek(self.replay.time + 1.0)
+            elif key == glfw.KEY_PAGE_DOWN:
+                self.replay.seek(self.replay.time - 1.0)
+            elif key == glfw.KEY_HOME:
+                self.replay.seek(0.0)
+
 
     #Funcion que recibe el input para manejar la camara y controlar sus coordenadas
     def update_camera(self, delta):
@@ -116,7 +172,7 @@ controller = Controller()
 if __name__ == "__main__":
 
     # Initialize glfw
-    if not glfw.init():
+    if not headless.init():
         sys.exit(1)
 
     # Creating a glfw window
@@ -126,7 +182,7 @@ if __name__ == "__main__":
     glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, GL_TRUE)
     glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
     glfw.window_hint(glfw.SAMPLES, 4)
-    window = glfw.create_window(WINDOW_WIDTH, WINDOW_HEIGHT, title, None, None)
+    window = headless.createWindow(WINDOW_WIDTH, WINDOW_HEIGHT, title)
 
     if not window:
         glfw.terminate()
@@ -152,37 +208,8 @@ if __name__ == "__main__":
 
     # Creating shapes on GPU memory
     circles = []
-    positions = []
-    first_pos = np.array([0, -0.15, 0])
-    first_row = [first_pos]
-
-    second_pos = first_pos + np.array([RADIUS, -np.sqrt(3)*RADIUS, 0])
-    third_pos = first_pos + np.array([-RADIUS, -np.sqrt(3)*RADIUS, 0])
-
-    second_row = [second_pos, third_pos]
-
-    fourth_pos = second_pos + np.array([RADIUS, -np.sqrt(3)*RADIUS, 0])
-    fifth_pos = second_pos + np.array([-RADIUS, -np.sqrt(3)*RADIUS, 0])
-    sixth_pos = third_pos + np.array([-RADIUS, -np.sqrt(3)*RADIUS, 0])
-
-    third_row = [fourth_pos, fifth_pos, sixth_pos]
-
-    seventh_pos = fourth_pos + np.array([RADIUS, -np.sqrt(3)*RADIUS, 0])
-    eighth_pos = fourth_pos + np.array([-RADIUS, -np.sqrt(3)*RADIUS, 0])
-    nineth_pos = fifth_pos + np.array([-RADIUS, -np.sqrt(3)*RADIUS, 0])
-    tenth_pos = sixth_pos + np.array([-RADIUS, -np.sqrt(3)*RADIUS, 0])
-
-    fourth_row = [seventh_pos, eighth_pos, nineth_pos, tenth_pos]
-
-    eleventh_pos = seventh_pos + np.array([RADIUS, -np.sqrt(3)*RADIUS, 0])
-    twelfth_pos = seventh_pos + np.array([-RADIUS, -np.sqrt(3)*RADIUS, 0])
-    thirteenth_pos = eighth_pos + np.array([-RADIUS, -np.sqrt(3)*RADIUS, 0])
-    fourteenth_pos = nineth_pos + np.array([-RADIUS, -np.sqrt(3)*RADIUS, 0])
-    fifteenth_pos = tenth_pos + np.array([-RADIUS, -np.sqrt(3)*RADIUS, 0])
-
-    fifth_row = [eleventh_pos, twelfth_pos, thirteenth_pos, fourteenth_pos, fifteenth_pos]
-
-    positions += first_row + second_row + third_row + fourth_row + fifth_row
+    # Triangulo de 15 bolas, igual al de las simulaciones sin ventana
+    positions = rackPositions(RADIUS)
 
     textures = ["1.png", "2.png", "3.png", "4.png", "5.png", "6.png", "7.png", "8.png", "9.png", "10.png",
                 "11.png", "12.png", "13.png", "14.png", "15.png"]
@@ -202,20 +229,46 @@ if __name__ == "__main__":
     white_velocity = np.array([0.0, 0.0, 0.0])
     white_ball = Circle(tex_pipeline, white_pos, white_velocity, CIRCLE_DISCRETIZATION, RADIUS, texture="white.png")
 
-    offset = 0.1
     holes_radius = RADIUS
-    hole1 = np.array([BORDER_WIDTH/2-offset, BORDER_HEIGHT/2-offset, 0])
-    hole2 = np.array([BORDER_WIDTH/2-offset, -BORDER_HEIGHT/2+offset, 0])
-    hole3 = np.array([-BORDER_WIDTH/2+offset, BORDER_HEIGHT/2-offset, 0])
-    hole4 = np.array([-BORDER_WIDTH/2+offset, -BORDER_HEIGHT/2+offset, 0])
-    hole5 = np.array([BORDER_WIDTH/2-offset,  0, 0])
-    hole6 = np.array([-BORDER_WIDTH/2+offset, 0, 0])
-    holes_pos = [hole1, hole2, hole3, hole4, hole5, hole6]
+    holes_pos = holePositions(BORDER_WIDTH, BORDER_HEIGHT)
+
+    # Todas las bolas en arreglos del motor, la blanca al final y sin caer en hoyos
+    physicsEngine = EventPhysics if EVENT_PHYSICS else PoolPhysics
+    physics = physicsEngine.fromCircles(circles + [white_ball], MU, GRAVITY, C, BORDER_WIDTH, BORDER_HEIGHT,
+        holes_pos, holes_radius, pocketable=[True] * len(circles) + [False])
+    all_circles = circles
+
+    recorder = None
+    if "grabacion" in params:
+        recorder = PoolRecorder(params["grabacion"], len(physics), 1.0 / PHYSICS_RATE)
+
+    replay = None
+    if "reproduccion" in params:
+        replay = PoolReplay(PoolRecording(params["reproduccion"]))
+        if replay.recording.balls != len(physics):
+            raise ValueError(f"La grabacion tiene {replay.recording.balls} bolas, la mesa {len(physics)}")
+        controller.replay = replay
+
+    # Los procesos del planificador se crean con el primer tiro sugerido, que se
+    # busca en otro hilo mientras se siguen dibujando frames
+    planner = None
+    suggestion = None
+    suggestionValid = False
 
     scene = create_scene(color_pipeline, tex_pipeline, BORDER_WIDTH, BORDER_HEIGHT, RADIUS)
 
+    # Memoria de video usada por cada textura y buffer compartido, con RESOURCE_REPORT=1
+    if rr.reportRequested():
+        print(resourceRegistry.report())
+
     perfMonitor = pm.PerformanceMonitor(glfw.get_time(), 0.5)
 
+    # Conteo de llamadas a OpenGL por frame, solo si se ejecuta con GL_ACCOUNTING=1
+    glAccounting = gla.fromEnvironment(perfMonitor)
+
+    # Bolas despiertas y dormidas por frame, en el reporte del monitor
+    perfMonitor.addCounterSource(physics)
+
     # glfw will swap buffers as soon as possible
     glfw.swap_interval(0)
 
@@ -224,6 +277,9 @@ if __name__ == "__main__":
 
     epsilon = 1e-1 # tolerancia disparo
 
+    physicsClock = FixedTimestep(PHYSICS_RATE, MAX_SUBSTEPS)
+    alpha = 1.0 if EVENT_PHYSICS else physicsClock.alpha
+
     spotConcentration = 8
     spot_dir = [0, 0, -1]
     light_pos1 = [0, -3.5, 5] 
@@ -234,16 +290,53 @@ if __name__ == "__main__":
     
     Ls1 = [1.0, 1.0, 1.0]
     Ls2 = [1.0, 1.0, 1.0]
+
+    # Luces y camara en uniform buffers: uno para los pipelines con texturas, asi
+    # cambiar al heatmap no requiere subir uniforms, y otro para la mesa y las
+    # bandas, iluminadas por sus propias luces sobre la mesa
+    lightingBlock = lb.LightingBlock()
+    tableLightingBlock = lb.LightingBlock(lb.LIGHTING_BINDING + 1)
+    for block in [lightingBlock, tableLightingBlock]:
+        block.setAmbient([0.7, 0.7, 0.7])
+        block.setSpotConcentration(spotConcentration)
+        block.setAttenuation(0.001, 0.03, 0.01)
+    lightingBlock.setLights([light_pos1, light_pos2], [spot_dir, spot_dir], [Ld1, Ld2], [Ls1, Ls2])
+    tableLightingBlock.setLights([[0, -1, 50], [0, 1, 50]], [spot_dir, spot_dir], [Ld1, Ld2], [Ls1, Ls2])
+
+    tableLightingBlock.attach(color_pipeline)
+    lightingBlock.attach(normal_tex_pipeline)
+    lightingBlock.attach(heatMap_tex_pipeline)
+
+    # El material no cambia, se fija una sola vez en cada pipeline
+    for pipeline in [color_pipeline, normal_tex_pipeline, heatMap_tex_pipeline]:
+        glUseProgram(pipeline.shaderProgram)
+        pipeline.setVec3("Ka", (0.7, 0.7, 0.7))
+        pipeline.setVec3("Kd", (0.7, 0.7, 0.7))
+        pipeline.setVec3("Ks", (1.0, 1.0, 1.0))
+        pipeline.setUint("shininess", 100)
+
+    # Escenas compiladas en listas ordenadas por estado, se reconstruyen solo si cambia el grafo.
+    # Hay una lista de texturas por cada pipeline, la del heatmap se elige en cada frame
+    colorDrawList = sg.DrawList("model")
+    colorDrawList.add(sg.findNode(scene, "Escena con colores"), color_pipeline)
+
+    tex_scene = sg.findNode(scene, "Escena con texturas")
+    texDrawLists = {False: sg.DrawList("model"), True: sg.DrawList("model")}
+    texDrawLists[False].add(tex_scene, normal_tex_pipeline)
+    texDrawLists[True].add(tex_scene, heatMap_tex_pipeline)
     
 
     # Application loop
-    while not glfw.window_should_close(window):
+    while not headless.shouldClose(window):
 
         can_shoot = True # switch para poder lanzar bola blanca
 
         # Measuring performance
         perfMonitor.update(glfw.get_time())
-        glfw.set_window_title(window, title + str(perfMonitor))
+        # Llamadas a OpenGL del frame anterior: las subidas de uniforms sin cambios se omiten
+        glfw.set_window_title(window, title + str(perfMonitor) + str(sp.callCounter) +
+            ("" if glAccounting is None else str(glAccounting)) + ("" if replay is None else str(replay)))
+        sp.callCounter.reset()
 
         # Using GLFW to check for input events
         glfw.poll_events()
@@ -262,45 +355,70 @@ if __name__ == "__main__":
 
         controller.update_camera(delta)
         camera = controller.get_camera()
-        viewMatrix = camera.update_view(white_ball.position)
+        # La camara sigue a la bola blanca tal como se dibujo en el frame anterior
+        viewMatrix = camera.update_view(white_ball.interpolatedPosition(alpha))
 
         camera.can_shoot = can_shoot
 
         # Physics!
-        for circle in circles:
-            # moving each circle
-            circle.action(deltaTime, MU, GRAVITY)
-
-            # checking and processing collisions against the border
-            collideWithBorder(circle, BORDER_WIDTH, BORDER_HEIGHT)
-            for hole in holes_pos:
-                collideWithHole(circles, circle, hole, holes_radius)
-
-            if np.fabs(circle.velocity[0])> epsilon or np.fabs(circle.velocity[1]) > epsilon:
+        with perfMonitor.section("physics"):
+            # Se puede disparar solo si todas las bolas estan quietas
+            if physics.isMoving(epsilon) or replay is not None:
                 can_shoot = False
 
-        if np.fabs(white_ball.velocity[0])> epsilon or np.fabs(white_ball.velocity[1]) > epsilon:
-            can_shoot = False
-
-        if glfw.get_key(window, glfw.KEY_ENTER) == glfw.PRESS and can_shoot:
-            forward_vector = (camera.center - camera.eye)/np.linalg.norm(camera.center - camera.eye)
-
-            force = 3
-            white_ball.velocity = np.array([force*forward_vector[0], force*forward_vector[1], 0.0])
-
-
-        white_ball.action(deltaTime, MU, GRAVITY)
-        collideWithBorder(white_ball, BORDER_WIDTH, BORDER_HEIGHT)
-
-        # checking and processing collisions among circles
-        for i in range(len(circles)):
-            for j in range(i+1, len(circles)):
-                if areColliding(circles[i], circles[j]):
-                    collide(circles[i], circles[j], C)
-
-            if areColliding(circles[i], white_ball):
-                    collide(circles[i], white_ball, C)
-
+            if glfw.get_key(window, glfw.KEY_ENTER) == glfw.PRESS and can_shoot:
+                forward_vector = (camera.center - camera.eye)/np.linalg.norm(camera.center - camera.eye)
+
+                force = 3
+                white_ball.velocity[:] = [force*forward_vector[0], force*forward_vector[1], 0.0]
+
+            if controller.suggestShot and can_shoot and suggestion is None:
+                if planner is None:
+                    planner = ShotPlanner(deltaTime=1.0 / PHYSICS_RATE)
+                suggestion = planner.submit(physics, white_ball.body, PLANNER_BUDGET)
+                suggestionValid = True
+            controller.suggestShot = False
+
+            if suggestion is not None:
+                # Si se disparo mientras se buscaba, la mesa ya no es la planificada
+                if physics.isMoving(epsilon):
+                    suggestionValid = False
+                if suggestion.done():
+                    shots = suggestion.result()
+                    suggestion = None
+                    print(planner.report())
+                    if shots and suggestionValid:
+                        print(f"Tiro sugerido: {shots[0]}")
+                        white_ball.velocity[:] = shots[0].velocity()
+
+            if replay is not None:
+                # Las bolas toman el estado grabado, sin simular
+                replay.update(deltaTime)
+                replay.apply(physics)
+                alpha = 1.0
+            elif EVENT_PHYSICS:
+                # Exacta con cualquier largo de paso, se avanza justo al tiempo del frame
+                physics.step(deltaTime)
+                if recorder is not None:
+                    with perfMonitor.section("recording"):
+                        recorder.record(physics, deltaTime)
+            else:
+                # Pasos fijos por el tiempo real acumulado, independiente de los fps
+                for _ in range(physicsClock.advance(deltaTime)):
+                    physics.step(physicsClock.step)
+                    if recorder is not None:
+                        with perfMonitor.section("recording"):
+                            recorder.record(physics, physicsClock.step)
+                alpha = physicsClock.alpha
+
+            # Las bolas en un hoyo siguen en los arreglos del motor, pero no se dibujan.
+            # Al reproducir hacia atras pueden volver a la mesa
+            circles = [circle for circle in all_circles if not physics.pocketed[circle.body]]
+
+        # Matrices de mundo de las escenas, se recompilan solo si cambio el grafo
+        with perfMonitor.section("scene update"):
+            colorDrawList.update()
+            texDrawLists[controller.heatMap].update()
 
         # Clearing the screen
         glClear(GL_COLOR_BUFFER_BIT| GL_DEPTH_BUFFER_BIT)
@@ -316,90 +434,55 @@ if __name__ == "__main__":
         else:
             glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
 
-        # Drawing (no texture)
-        glUseProgram(color_pipeline.shaderProgram)
-
-        glUniform3f(glGetUniformLocation(color_pipeline.shaderProgram, "spotDirection1"), spot_dir[0], spot_dir[1], spot_dir[2])
-        glUniform3f(glGetUniformLocation(color_pipeline.shaderProgram, "spotDirection2"), spot_dir[0], spot_dir[1], spot_dir[2])
-
-        glUniform1f(glGetUniformLocation(color_pipeline.shaderProgram, "spotConcentration"), spotConcentration)
-    
-        glUniform3f(glGetUniformLocation(color_pipeline.shaderProgram, "La"), 0.7, 0.7, 0.7)
-
-        glUniform3f(glGetUniformLocation(color_pipeline.shaderProgram, "Ld1"), Ld1[0], Ld1[1], Ld1[2])
-        glUniform3f(glGetUniformLocation(color_pipeline.shaderProgram, "Ld2"), Ld2[0], Ld2[1], Ld2[2])
-
-        glUniform3f(glGetUniformLocation(color_pipeline.shaderProgram, "Ls1"), Ls1[0], Ls1[1], Ls1[2])
-        glUniform3f(glGetUniformLocation(color_pipeline.shaderProgram, "Ls2"), Ls2[0], Ls2[1], Ls2[2])
-
-        glUniform3f(glGetUniformLocation(color_pipeline.shaderProgram, "Ka"), 0.7, 0.7, 0.7)
-        glUniform3f(glGetUniformLocation(color_pipeline.shaderProgram, "Kd"), 0.7, 0.7, 0.7)
-        glUniform3f(glGetUniformLocation(color_pipeline.shaderProgram, "Ks"), 1.0, 1.0, 1.0)
-
-        glUniform3f(glGetUniformLocation(color_pipeline.shaderProgram, "lightPosition0"), 0, -1, 50)
-        glUniform3f(glGetUniformLocation(color_pipeline.shaderProgram, "lightPosition1"), 0, 1, 50)
-        
-        glUniform3f(glGetUniformLocation(color_pipeline.shaderProgram, "viewPosition"), camera.get_eye()[0], camera.get_eye()[1], camera.get_eye()[2])
-        glUniform1ui(glGetUniformLocation(color_pipeline.shaderProgram, "shininess"), 100)
-        
-        glUniform1f(glGetUniformLocation(color_pipeline.shaderProgram, "constantAttenuation"), 0.001)
-        glUniform1f(glGetUniformLocation(color_pipeline.shaderProgram, "linearAttenuation"), 0.03)
-        glUniform1f(glGetUniformLocation(color_pipeline.shaderProgram, "quadraticAttenuation"), 0.01)
-
-        glUniformMatrix4fv(glGetUniformLocation(color_pipeline.shaderProgram, "projection"), 1, GL_TRUE, projection)
-        glUniformMatrix4fv(glGetUniformLocation(color_pipeline.shaderProgram, "view"), 1, GL_TRUE, viewMatrix)
-
-        sg.drawSceneGraphNode(sg.findNode(scene, "Escena con colores"), color_pipeline, "model")
-
-
-        # Drawing (texture)
-        glUseProgram(tex_pipeline.shaderProgram)
-
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "spotDirection1"), spot_dir[0], spot_dir[1], spot_dir[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "spotDirection2"), spot_dir[0], spot_dir[1], spot_dir[2])
-
-        glUniform1f(glGetUniformLocation(tex_pipeline.shaderProgram, "spotConcentration"), spotConcentration)
-    
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "La"), 0.7, 0.7, 0.7)
-
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ld1"), Ld1[0], Ld1[1], Ld1[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ld2"), Ld2[0], Ld2[1], Ld2[2])
-
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ls1"), Ls1[0], Ls1[1], Ls1[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ls2"), Ls2[0], Ls2[1], Ls2[2])
+        # Camara compartida por todos los pipelines de iluminacion, se sube una vez por frame en cada bloque
+        with perfMonitor.section("uniform upload"):
+            for block in [lightingBlock, tableLightingBlock]:
+                block.setCamera(viewMatrix, projection, camera.get_eye())
+                block.upload()
 
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ka"), 0.7, 0.7, 0.7)
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Kd"), 0.7, 0.7, 0.7)
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "Ks"), 1.0, 1.0, 1.0)
+        with perfMonitor.section("draw"):
+            # Drawing (no texture)
+            colorDrawList.draw(update=False)
 
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "lightPosition0"), light_pos1[0], light_pos1[1], light_pos1[2])
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "lightPosition1"), light_pos2[0], light_pos2[1], light_pos2[2])
-        
-        glUniform3f(glGetUniformLocation(tex_pipeline.shaderProgram, "viewPosition"), camera.get_eye()[0], camera.get_eye()[1], camera.get_eye()[2])
-        glUniform1ui(glGetUniformLocation(tex_pipeline.shaderProgram, "shininess"), 100)
-        
-        glUniform1f(glGetUniformLocation(tex_pipeline.shaderProgram, "constantAttenuation"), 0.001)
-        glUniform1f(glGetUniformLocation(tex_pipeline.shaderProgram, "linearAttenuation"), 0.03)
-        glUniform1f(glGetUniformLocation(tex_pipeline.shaderProgram, "quadraticAttenuation"), 0.01)
+            # Drawing (texture)
+            glUseProgram(tex_pipeline.shaderProgram)
 
-        glUniformMatrix4fv(glGetUniformLocation(tex_pipeline.shaderProgram, "projection"), 1, GL_TRUE, projection)
-        glUniformMatrix4fv(glGetUniformLocation(tex_pipeline.shaderProgram, "view"), 1, GL_TRUE, viewMatrix)
-
-        # drawing all the circles
-        for i in range(len(circles)):
-            circles[i].draw("model")
-
-        white_ball.draw("model")
-        tex_scene = sg.findNode(scene, "Escena con texturas")
-        sg.drawSceneGraphNode(tex_scene, tex_pipeline, "model")
+            # drawing all the circles
+            drawCircles(circles + [white_ball], tex_pipeline, "model", alpha)
+            texDrawLists[controller.heatMap].draw(update=False)
 
         # Once the drawing is rendered, buffers are swap so an uncomplete drawing is never seen.
-        glfw.swap_buffers(window)
+        with perfMonitor.section("swap"):
+            headless.swapBuffers(window)
 
     # freeing GPU memory
     for circle in circles:
         circle.gpuShape.clear()
+        circle.gpuShadowShape.clear()
     white_ball.gpuShape.clear()
+    white_ball.gpuShadowShape.clear()
     scene.clear()
-
+    for pipeline in [color_pipeline, normal_tex_pipeline, heatMap_tex_pipeline]:
+        pipeline.clearInstancing()
+    lightingBlock.clear()
+    tableLightingBlock.clear()
+
+    # Las bolas que cayeron a un hoyo ya no estan en circles, sus recursos se liberan aca
+    resourceRegistry.clear()
+
+    # Percentiles de tiempo por frame y por seccion, para ver si limita la fisica o el dibujo
+    print(perfMonitor.report())
+
+    if planner is not None:
+        planner.close()
+    if recorder is not None:
+        recorder.close()
+        print(f"{recorder.frames} pasos grabados en {recorder.path}")
+    if glAccounting is not None:
+        print(glAccounting.report())
+    if "metricas" in params:
+        perfMonitor.exportJSON(params["metricas"] + ".json")
+        perfMonitor.exportCSV(params["metricas"] + ".csv")
+
+    headless.clear()
     glfw.terminate()
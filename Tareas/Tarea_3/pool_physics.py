@@ -0,0 +1,322 @@
+# coding=utf-8
+"""Fisica de la mesa de pool con todas las bolas en arreglos de NumPy"""
+
+import numpy as np
+from broad_phase import SweepAndPrune
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+# Bajo esta rapidez una componente de la velocidad se considera detenida
+REST_SPEED = 5e-3
+
+# Pasos seguidos bajo REST_SPEED antes de que una bola se duerma
+SLEEP_STEPS = 30
+
+# Distancia de las bandas al borde de la mesa
+CUSHION_OFFSET = 0.028875
+
+# Sumado a cada componente de las velocidades normales en un choque, como en el
+# juego original: ambas bolas salen con (0.001, 0.001) de mas en x e y, asi que
+# con restitucion cercana a 1 un choque puede ganar energia
+IMPULSE_OFFSET = 0.001
+
+
+def collisionImpulse(p1, p2, v1, v2, c):
+    """
+    Velocidades despues del choque entre bolas en p1 y p2 con velocidades v1 y v2.
+    Recibe vectores (3,) o arreglos (K, 3) de K choques.
+
+    La restitucion c pierde energia, pero IMPULSE_OFFSET la aumenta en
+    v . (0.001, 0.001) + 0.001^2 por bola, con v su velocidad de salida sin el
+    desplazamiento: la perdida neta de un choque puede ser negativa. Se mantiene
+    para no cambiar las trayectorias del juego.
+    """
+    normal = p2 - p1
+    normal = normal / np.linalg.norm(normal, axis=-1, keepdims=True)
+
+    v1Normal = np.sum(v1 * normal, axis=-1, keepdims=True)
+    v2Normal = np.sum(v2 * normal, axis=-1, keepdims=True)
+
+    # No se separan: la bola 2 avanza en la normal y la 1 retrocede
+    separating = (v2Normal > 0.0) & (v1Normal < 0.0)
+
+    # Tangente: normal rotada en 90 grados en el plano de la mesa
+    tangent = np.zeros_like(normal)
+    tangent[..., 0] = -normal[..., 1]
+    tangent[..., 1] = normal[..., 0]
+
+    v1n = v1Normal * normal + IMPULSE_OFFSET
+    v1t = np.sum(v1 * tangent, axis=-1, keepdims=True) * tangent
+    v2n = v2Normal * normal + IMPULSE_OFFSET
+    v2t = np.sum(v2 * tangent, axis=-1, keepdims=True) * tangent
+
+    # Se intercambian las componentes normales
+    new1 = np.where(separating, v1, (v1n * (1 - c) + v2n * (1 + c)) / 2 + v1t)
+    new2 = np.where(separating, v2, (v2n * (1 - c) + v1n * (1 + c)) / 2 + v2t)
+    return new1, new2
+
+
+def collisionRounds(first, second, count):
+    """
+    Separa los pares (first, second) de choques en rondas sin bolas repetidas.
+    Cada par entra en la primera ronda en que ya se resolvieron todos los pares
+    anteriores con alguna de sus bolas, asi resolver las rondas en orden da lo
+    mismo que recorrer los pares uno a uno. Devuelve una lista de indices de pares.
+    """
+    rounds = []
+    remaining = np.arange(len(first))
+
+    while len(remaining) > 0:
+        balls = np.concatenate([first[remaining], second[remaining]])
+        pairs = np.concatenate([remaining, remaining])
+
+        # Primer par pendiente de cada bola
+        firstPair = np.full(count, len(first))
+        np.minimum.at(firstPair, balls, pairs)
+
+        ready = (firstPair[first[remaining]] == remaining) & (firstPair[second[remaining]] == remaining)
+        rounds.append(remaining[ready])
+        remaining = remaining[~ready]
+
+    return rounds
+
+
+class PoolPhysics:
+    """
+    Posiciones, velocidades y posiciones del paso anterior en arreglos (N, 3),
+    radios (N,) y banderas de bolas en hoyos. Cada paso integra el roce, refleja
+    en las bandas y detecta hoyos para todas las bolas a la vez.
+
+    Las bolas metidas en un hoyo quedan marcadas en pocketed y fuera de la
+    simulacion, los arreglos no se reordenan, asi los indices siguen validos.
+
+    Una bola quieta por sleepSteps pasos se duerme: no se integra ni se revisa
+    contra bandas y hoyos, y los pares de bolas dormidas no se prueban. Despierta
+    si un choque la pone en movimiento o si alguien cambia su velocidad, como en
+    un disparo. Con la mesa quieta un paso casi no cuesta.
+    """
+    def __init__(self, positions, velocities, radii, mu, gravity, restitution,
+                 borderWidth, borderHeight, holes, holeRadius, pocketable=None):
+        self.positions = np.array(positions, dtype=float).reshape(-1, 3)
+        self.velocities = np.array(velocities, dtype=float).reshape(-1, 3)
+        self.previousPositions = self.positions.copy()
+        self.radii = np.array(radii, dtype=float).reshape(-1)
+
+        count = len(self.positions)
+        self.pocketed = np.zeros(count, dtype=bool)
+        self.pocketable = np.ones(count, dtype=bool) if pocketable is None else np.array(pocketable, dtype=bool)
+
+        self.mu = mu
+        self.gravity = gravity
+        self.restitution = restitution
+        self.borderWidth = borderWidth
+        self.borderHeight = borderHeight
+        self.holes = np.array(holes, dtype=float).reshape(-1, 3)
+        self.holeRadius = holeRadius
+        self.broadPhase = SweepAndPrune()
+        self.collisions = 0
+        self.collisionEnergyLoss = 0.0   # energia cinetica perdida en los choques del ultimo paso, masa 1
+        self.pocketEnergyLoss = 0.0      # energia cinetica de las bolas que cayeron a un hoyo en el ultimo paso
+
+        self.sleepSteps = SLEEP_STEPS
+        self.sleeping = np.zeros(count, dtype=bool)
+        self.restSteps = np.zeros(count, dtype=np.int64)
+        self.wakeUps = 0
+
+    @classmethod
+    def fromCircles(cls, circles, mu, gravity, restitution, borderWidth, borderHeight, holes, holeRadius,
+                    pocketable=None):
+        """
+        Motor con las bolas de una lista de Circle. La posicion, velocidad y posicion
+        anterior de cada Circle pasan a ser vistas de los arreglos del motor, y
+        circle.body es su indice.
+        """
+        physics = cls([circle.position for circle in circles], [circle.velocity for circle in circles],
+            [circle.radius for circle in circles], mu, gravity, restitution, borderWidth, borderHeight,
+            holes, holeRadius, pocketable)
+
+        for index, circle in enumerate(circles):
+            circle.body = index
+            circle.position = physics.positions[index]
+            circle.velocity = physics.velocities[index]
+            circle.previousPosition = physics.previousPositions[index]
+
+        return physics
+
+    def __len__(self):
+        return len(self.positions)
+
+    def active(self):
+        return ~self.pocketed
+
+    def awake(self):
+        return ~self.pocketed & ~self.sleeping
+
+    def integrate(self, deltaTime, bodies=None):
+        """
+        Roce con la mesa en x e y. Con la componente en movimiento los pasos coinciden
+        con la integracion original por eje: Euler con v > 0 en x, y Euler modificado,
+        RK4 y Euler mejorado en los otros casos.
+
+        A diferencia del original, una componente detenida no sufre roce. El original
+        tomaba v = 0 como v >= 0 y le aplicaba el roce igual, asi una bola quieta se
+        corria -mu g dt^2 en x y -mu g dt^2 / 2 en y en cada paso, porque la velocidad
+        resultante volvia a quedar bajo REST_SPEED y se anulaba en el paso siguiente.
+        Ese arrastre se quita a proposito.
+        """
+
+        bodies = np.flatnonzero(self.active()) if bodies is None else bodies
+        velocities = self.velocities[bodies, :2]
+
+        # Componentes casi detenidas se detienen del todo y no sufren roce
+        velocities[np.abs(velocities) < REST_SPEED] = 0.0
+
+        # El roce se opone al movimiento en cada eje
+        deltaVelocity = np.where(velocities > 0, -1.0, 1.0) * self.mu * self.gravity * deltaTime
+        deltaVelocity[velocities == 0.0] = 0.0
+
+        # RK4 y los Euler modificado y mejorado son exactos con aceleracion constante:
+        # x += (v + dv/2) dt. Con v > 0 en x, Euler avanza con la velocidad nueva: x += (v + dv) dt
+        weight = np.full(deltaVelocity.shape, 0.5)
+        weight[:, 0] = np.where(velocities[:, 0] > 0, 1.0, 0.5)
+
+        self.positions[bodies, :2] += (velocities + weight * deltaVelocity) * deltaTime
+        self.velocities[bodies, :2] = velocities + deltaVelocity
+
+    def collideWithBorders(self, bodies=None):
+        """Las bolas que pasan una banda se devuelven hacia la mesa"""
+
+        bodies = np.arange(len(self)) if bodies is None else bodies
+        x = self.positions[bodies, 0]
+        y = self.positions[bodies, 1]
+        vx = self.velocities[bodies, 0]
+        vy = self.velocities[bodies, 1]
+        radii = self.radii[bodies]
+        halfWidth = self.borderWidth / 2 - CUSHION_OFFSET
+        halfHeight = self.borderHeight / 2 - CUSHION_OFFSET
+
+        right = x + radii > halfWidth
+        left = x < -halfWidth + radii
+        top = y > halfHeight - radii
+        bottom = y < -halfHeight + radii
+
+        vx[right] = -np.abs(vx[right])
+        vx[left] = np.abs(vx[left])
+        vy[top] = -np.abs(vy[top])
+        vy[bottom] = np.abs(vy[bottom])
+        self.velocities[bodies, 0] = vx
+        self.velocities[bodies, 1] = vy
+
+    def collideWithHoles(self, bodies=None):
+        """Marca las bolas que tocan un hoyo, devuelve los indices de las nuevas"""
+
+        bodies = np.arange(len(self)) if bodies is None else bodies
+        bodies = bodies[self.pocketable[bodies] & ~self.pocketed[bodies]]
+
+        distances = np.linalg.norm(self.positions[bodies, np.newaxis, :] - self.holes[np.newaxis, :, :], axis=2)
+        inHole = np.any(distances < (self.radii[bodies, np.newaxis] + self.holeRadius), axis=1)
+
+        pocketed = bodies[inHole]
+        self.pocketed[pocketed] = True
+        self.pocketEnergyLoss = 0.5 * float(np.sum(self.velocities[pocketed, :2] ** 2))
+        self.velocities[pocketed] = 0.0
+        return pocketed
+
+    def collidingPairs(self):
+        """
+        Pares (i, j) con i < j de bolas activas que se tocan, en orden de i y luego j.
+        La fase amplia propone candidatos y aca se mide su distancia.
+        """
+        self.broadPhase.update(self.positions, self.radii)
+        first, second = self.broadPhase.candidatePairs(self.positions, self.radii, self.active())
+
+        # Dos bolas dormidas no se mueven, si se tocaban ya se resolvio antes de dormirse
+        awake = self.awake()
+        either = awake[first] | awake[second]
+        first = first[either]
+        second = second[either]
+
+        distances = np.linalg.norm(self.positions[first] - self.positions[second], axis=1)
+        touching = distances < self.radii[first] + self.radii[second]
+        return first[touching], second[touching]
+
+    def collideBalls(self):
+        """
+        Choques entre bolas, con el mismo resultado que el doble ciclo original: una
+        bola puede chocar con varias en un paso y cada choque usa las velocidades
+        nuevas. Los choques de cada ronda no comparten bolas y se resuelven juntos.
+        """
+        first, second = self.collidingPairs()
+        positions = self.positions
+        velocities = self.velocities
+
+        touched = np.unique(np.concatenate([first, second]))
+        energy = 0.5 * np.sum(velocities[touched, :2] ** 2)
+
+        for pairs in collisionRounds(first, second, len(self)):
+            i = first[pairs]
+            j = second[pairs]
+            velocities[i], velocities[j] = collisionImpulse(positions[i], positions[j],
+                velocities[i], velocities[j], self.restitution)
+
+        self.collisionEnergyLoss = float(energy - 0.5 * np.sum(velocities[touched, :2] ** 2))
+
+        # Solo despiertan las bolas que el choque dejo en movimiento, a las demas el
+        # paso siguiente les habria anulado la velocidad por quedar bajo REST_SPEED
+        touched = touched[self.sleeping[touched]]
+        hit = np.any(np.abs(velocities[touched, :2]) >= REST_SPEED, axis=1)
+        self.wake(touched[hit])
+        velocities[touched[~hit], :2] = 0.0
+
+        self.collisions = len(first)
+        return len(first)
+
+    def wake(self, bodies):
+        self.wakeUps += int(np.count_nonzero(self.sleeping[bodies]))
+        self.sleeping[bodies] = False
+        self.restSteps[bodies] = 0
+
+    def updateSleep(self, bodies):
+        """Cuenta los pasos quietas de las bolas despiertas y duerme las que cumplen sleepSteps"""
+
+        resting = np.all(np.abs(self.velocities[bodies, :2]) < REST_SPEED, axis=1)
+        self.restSteps[bodies] = np.where(resting, self.restSteps[bodies] + 1, 0)
+
+        asleep = bodies[self.restSteps[bodies] >= self.sleepSteps]
+        self.sleeping[asleep] = True
+        self.velocities[asleep, :2] = 0.0
+
+    def step(self, deltaTime):
+        """Un paso de fisica, devuelve los indices de las bolas que cayeron a un hoyo"""
+
+        # Una velocidad puesta desde fuera despierta a la bola
+        sleeping = np.flatnonzero(self.sleeping)
+        if len(sleeping) > 0:
+            self.wake(sleeping[np.any(self.velocities[sleeping, :2] != 0.0, axis=1)])
+
+        bodies = np.flatnonzero(self.awake())
+        if len(bodies) == 0:
+            self.collisions = 0
+            self.collisionEnergyLoss = 0.0
+            self.pocketEnergyLoss = 0.0
+            return bodies
+
+        self.previousPositions[bodies] = self.positions[bodies]
+        self.integrate(deltaTime, bodies)
+        self.collideWithBorders(bodies)
+        pocketed = self.collideWithHoles(bodies)
+        self.collideBalls()
+        self.updateSleep(np.flatnonzero(self.awake()))
+        return pocketed
+
+    def collectCounters(self, monitor):
+        """Bolas despiertas y dormidas, como fuente de contadores de PerformanceMonitor"""
+
+        awake = int(np.count_nonzero(self.awake()))
+        monitor.setCounter("awake balls", awake)
+        monitor.setCounter("sleeping balls", int(np.count_nonzero(self.active())) - awake)
+
+    def isMoving(self, epsilon):
+        """True si alguna bola en juego se mueve mas rapido que epsilon en x o y"""
+        return bool(np.any(np.abs(self.velocities[self.active(), :2]) > epsilon))
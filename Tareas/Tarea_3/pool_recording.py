@@ -0,0 +1,170 @@
+# coding=utf-8
+"""Grabacion binaria de los pasos de fisica del pool y su reproduccion con saltos a cualquier instante"""
+
+import os
+import numpy as np
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+MAGIC = b"POOLRECS"
+VERSION = 1
+
+# Cabecera de 32 bytes: identificacion, version, numero de bolas y paso nominal de la fisica
+HEADER = np.dtype([("magic", "S8"), ("version", "<u4"), ("balls", "<u4"), ("step", "<f8"), ("reserved", "<u8")])
+
+# Cuadros por escritura al archivo, grabar un paso solo copia al buffer
+BUFFER_FRAMES = 256
+
+
+def frameType(balls):
+    """Un cuadro por paso: instante, posiciones y velocidades en float32 y bolas en hoyos"""
+
+    return np.dtype([("time", "<f8"), ("position", "<f4", (balls, 3)), ("velocity", "<f4", (balls, 3)),
+        ("pocketed", "u1", (balls,))])
+
+
+class PoolRecorder:
+    """
+    Agrega al final del archivo el estado de un motor de fisica en cada paso. Los
+    cuadros se juntan en un buffer y se escriben de a BUFFER_FRAMES, asi el costo
+    por paso es una copia de unos cientos de bytes.
+
+    El archivo se puede leer mientras se graba: PoolRecording toma los cuadros completos.
+    """
+    def __init__(self, path, balls, step, bufferFrames=BUFFER_FRAMES):
+        self.path = path
+        self.frameType = frameType(balls)
+        self.buffer = np.zeros(bufferFrames, dtype=self.frameType)
+        self.buffered = 0
+        self.frames = 0
+        self.time = 0.0
+
+        header = np.zeros(1, dtype=HEADER)
+        header["magic"] = MAGIC
+        header["version"] = VERSION
+        header["balls"] = balls
+        header["step"] = step
+
+        self.file = open(path, "wb")
+        self.file.write(header.tobytes())
+
+    def record(self, physics, deltaTime):
+        """Estado del motor tras un paso de deltaTime segundos"""
+
+        self.time += deltaTime
+        frame = self.buffer[self.buffered]
+        frame["time"] = self.time
+        frame["position"] = physics.positions
+        frame["velocity"] = physics.velocities
+        frame["pocketed"] = physics.pocketed
+
+        self.buffered += 1
+        self.frames += 1
+        if self.buffered == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer[:self.buffered].tobytes())
+        self.file.flush()
+        self.buffered = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+        return False
+
+
+class PoolRecording:
+    """
+    Grabacion abierta con np.memmap: solo se leen del disco los cuadros que se
+    usan. Los instantes se copian a memoria para buscar cualquier tiempo.
+    """
+    def __init__(self, path):
+        header = np.fromfile(path, dtype=HEADER, count=1)
+        if len(header) == 0 or header["magic"][0] != MAGIC:
+            raise ValueError(f"{path} no es una grabacion de pool")
+        if header["version"][0] != VERSION:
+            raise ValueError(f"{path} tiene la version {header['version'][0]}, se esperaba {VERSION}")
+
+        self.path = path
+        self.balls = int(header["balls"][0])
+        self.step = float(header["step"][0])
+        self.frameType = frameType(self.balls)
+
+        # Un cuadro a medio escribir al final se ignora
+        frames = (os.path.getsize(path) - HEADER.itemsize) // self.frameType.itemsize
+        if frames == 0:
+            raise ValueError(f"{path} no tiene cuadros")
+
+        self.frames = np.memmap(path, dtype=self.frameType, mode="r", offset=HEADER.itemsize, shape=(frames,))
+        self.times = np.array(self.frames["time"])
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def duration(self):
+        return float(self.times[-1])
+
+    def frameIndex(self, time):
+        """Ultimo cuadro grabado en o antes de time"""
+        return max(int(np.searchsorted(self.times, time, side="right")) - 1, 0)
+
+    def state(self, time):
+        """
+        Posiciones (N, 3) en time interpoladas entre los dos cuadros vecinos,
+        velocidades y bolas en hoyos del cuadro anterior
+        """
+        index = self.frameIndex(time)
+        frame = self.frames[index]
+        positions = frame["position"].astype(float)
+
+        if index + 1 < len(self.frames) and time > self.times[index]:
+            following = self.frames[index + 1]
+            alpha = (time - self.times[index]) / (self.times[index + 1] - self.times[index])
+            positions += (following["position"] - frame["position"]) * min(alpha, 1.0)
+
+        return positions, frame["velocity"].astype(float), frame["pocketed"].astype(bool)
+
+
+class PoolReplay:
+    """Reloj de reproduccion sobre una grabacion: pausa, velocidad y saltos"""
+
+    def __init__(self, recording, speed=1.0):
+        self.recording = recording
+        self.time = float(recording.times[0])
+        self.speed = speed
+        self.paused = False
+
+    def update(self, deltaTime):
+        if not self.paused:
+            self.seek(self.time + deltaTime * self.speed)
+
+    def seek(self, time):
+        """Salta a cualquier instante, acotado a la grabacion"""
+        self.time = min(max(time, float(self.recording.times[0])), self.recording.duration)
+
+    def togglePause(self):
+        self.paused = not self.paused
+
+    def apply(self, physics):
+        """Copia el estado del instante actual al motor, sin simular"""
+
+        positions, velocities, pocketed = self.recording.state(self.time)
+        physics.positions[:] = positions
+        physics.previousPositions[:] = positions
+        physics.velocities[:] = velocities
+        physics.pocketed[:] = pocketed
+
+    def __str__(self):
+        state = " pausa" if self.paused else ""
+        return f" [{self.time:.2f}/{self.recording.duration:.2f} s x{self.speed:g}{state}]"
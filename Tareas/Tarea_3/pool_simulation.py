@@ -0,0 +1,206 @@
+# coding=utf-8
+"""
+Simulacion de tiros de apertura sin OpenGL, para barrer friccion, restitucion,
+angulo y fuerza del tiro en todos los nucleos y guardar estadisticas en CSV o Parquet.
+
+    python pool_simulation.py --tiros 2000 --friccion 0.3 0.5 0.7 --restitucion 0.9 0.99 --salida barrido.csv
+"""
+
+import os
+import csv
+import time
+import argparse
+import concurrent.futures
+import numpy as np
+from pool_physics import PoolPhysics, REST_SPEED
+from event_physics import EventPhysics
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+# Mesa y bolas de pool_party
+RADIUS = 0.028875
+BORDER_WIDTH = 1.46
+BORDER_HEIGHT = 2.74
+GRAVITY = 0.98
+HOLE_OFFSET = 0.1
+CUE_POSITION = (0.0, 0.5, 0.0)
+
+ENGINES = {"pasos": PoolPhysics, "eventos": EventPhysics}
+
+def rackPositions(radius, apex=(0.0, -0.15, 0.0)):
+    """Las 15 bolas en triangulo desde apex hacia -y, fila por fila como en pool_party"""
+
+    positions = []
+    rowStep = np.array([radius, -np.sqrt(3) * radius, 0.0])
+    for row in range(5):
+        first = np.array(apex) + row * rowStep
+        positions += [first - k * np.array([2 * radius, 0.0, 0.0]) for k in range(row + 1)]
+    return positions
+
+
+def holePositions(borderWidth, borderHeight, offset=HOLE_OFFSET):
+    x = borderWidth / 2 - offset
+    y = borderHeight / 2 - offset
+    return [np.array([x, y, 0]), np.array([x, -y, 0]), np.array([-x, y, 0]), np.array([-x, -y, 0]),
+        np.array([x, 0, 0]), np.array([-x, 0, 0])]
+
+
+def createTable(mu, restitution, engine=PoolPhysics):
+    """Motor con el triangulo armado y la bola blanca al final, quietas"""
+
+    positions = rackPositions(RADIUS) + [np.array(CUE_POSITION)]
+    count = len(positions)
+    return engine(positions, np.zeros((count, 3)), np.full(count, RADIUS), mu, GRAVITY, restitution,
+        BORDER_WIDTH, BORDER_HEIGHT, holePositions(BORDER_WIDTH, BORDER_HEIGHT), RADIUS,
+        pocketable=[True] * (count - 1) + [False])
+
+
+def kineticEnergy(physics):
+    """Energia cinetica en el plano de la mesa, con bolas de masa 1"""
+
+    velocities = physics.velocities[physics.active(), :2]
+    return 0.5 * float(np.sum(velocities * velocities))
+
+
+def simulateShot(friction, restitution, angle, force, deltaTime=1 / 120, maxTime=60.0, engine="pasos"):
+    """
+    Un tiro de apertura: la blanca sale con rapidez force en direccion a angle
+    grados del apice del triangulo. La simulacion sigue hasta que todas las bolas
+    quedan quietas o se cumple maxTime. Devuelve un diccionario con las estadisticas.
+    """
+    physics = createTable(friction, restitution, ENGINES[engine])
+    theta = np.radians(angle)
+    physics.velocities[-1, :2] = [force * np.sin(theta), -force * np.cos(theta)]
+
+    initialEnergy = kineticEnergy(physics)
+    steps = 0
+    collisions = 0
+    collisionLoss = 0.0
+    pocketLoss = 0.0
+    while steps * deltaTime < maxTime:
+        physics.step(deltaTime)
+        steps += 1
+        collisions += physics.collisions
+        collisionLoss += physics.collisionEnergyLoss
+        pocketLoss += physics.pocketEnergyLoss
+        if not physics.isMoving(REST_SPEED):
+            break
+
+    # La energia que no se perdio en choques ni hoyos y no quedo en las bolas se la
+    # llevo el roce. La de choques es neta: IMPULSE_OFFSET la puede dejar negativa
+    remaining = kineticEnergy(physics)
+    return {
+        "friction": friction,
+        "restitution": restitution,
+        "angle": angle,
+        "force": force,
+        "pocketed": int(np.count_nonzero(physics.pocketed)),
+        "time_to_rest": steps * deltaTime,
+        "energy_lost_collisions": collisionLoss / initialEnergy,
+        "energy_lost_pockets": pocketLoss / initialEnergy,
+        "energy_lost_friction": (initialEnergy - collisionLoss - pocketLoss - remaining) / initialEnergy,
+        "collisions": collisions,
+        "steps": steps,
+    }
+
+
+def simulateShots(shots):
+    """Lista de tiros (friccion, restitucion, angulo, fuerza, deltaTime, maxTime, motor), en un proceso"""
+    return [simulateShot(*shot) for shot in shots]
+
+
+def runSweep(shots, workers=None, chunkSize=None):
+    """
+    Simula los tiros en un pool de procesos, uno por nucleo si workers es None.
+    Los tiros se envian en grupos para no pagar la comunicacion por cada uno.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunkSize = chunkSize or max(1, min(64, len(shots) // (4 * workers)))
+    chunks = [shots[i:i + chunkSize] for i in range(0, len(shots), chunkSize)]
+
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for rows in executor.map(simulateShots, chunks):
+            results += rows
+    return results
+
+
+def aggregate(results):
+    """Promedio, desviacion y maximo de cada estadistica por par (friccion, restitucion)"""
+
+    groups = {}
+    for row in results:
+        groups.setdefault((row["friction"], row["restitution"]), []).append(row)
+
+    summary = []
+    for (friction, restitution), rows in sorted(groups.items()):
+        line = {"friction": friction, "restitution": restitution, "shots": len(rows)}
+        for name in ["pocketed", "time_to_rest", "energy_lost_collisions", "energy_lost_pockets",
+                "energy_lost_friction"]:
+            values = np.array([row[name] for row in rows], dtype=float)
+            line[name + "_mean"] = float(values.mean())
+            line[name + "_std"] = float(values.std())
+            line[name + "_max"] = float(values.max())
+        summary.append(line)
+    return summary
+
+
+def writeTable(rows, path):
+    """CSV, o Parquet si path termina en .parquet (necesita pandas con pyarrow)"""
+
+    if path.endswith(".parquet"):
+        import pandas
+        pandas.DataFrame(rows).to_parquet(path, index=False)
+        return
+
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def summaryPath(path):
+    base, extension = os.path.splitext(path)
+    return base + "_resumen" + extension
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Barrido de tiros de apertura sin ventana")
+    parser.add_argument("--tiros", type=int, default=1000, help="tiros por cada par friccion-restitucion")
+    parser.add_argument("--friccion", type=float, nargs="+", default=[0.5])
+    parser.add_argument("--restitucion", type=float, nargs="+", default=[0.999999999])
+    parser.add_argument("--angulo", type=float, default=5.0, help="desvio maximo en grados desde el apice")
+    parser.add_argument("--fuerza", type=float, nargs=2, default=[2.0, 6.0], metavar=("MIN", "MAX"))
+    parser.add_argument("--paso", type=float, default=1 / 120, help="paso de la fisica en segundos")
+    parser.add_argument("--tiempo-maximo", type=float, default=60.0)
+    parser.add_argument("--motor", choices=list(ENGINES), default="pasos")
+    parser.add_argument("--procesos", type=int, default=None, help="por defecto uno por nucleo")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default="barrido.csv", help=".csv o .parquet, el resumen va en <salida>_resumen")
+    arguments = parser.parse_args()
+
+    # Los tiros se sortean aca, asi el resultado no depende del numero de procesos
+    rng = np.random.default_rng(arguments.semilla)
+    shots = []
+    for friction in arguments.friccion:
+        for restitution in arguments.restitucion:
+            angles = rng.uniform(-arguments.angulo, arguments.angulo, arguments.tiros)
+            forces = rng.uniform(arguments.fuerza[0], arguments.fuerza[1], arguments.tiros)
+            shots += [(friction, restitution, float(angle), float(force), arguments.paso, arguments.tiempo_maximo,
+                arguments.motor) for angle, force in zip(angles, forces)]
+
+    workers = arguments.procesos or os.cpu_count() or 1
+    start = time.perf_counter()
+    results = runSweep(shots, workers)
+    elapsed = time.perf_counter() - start
+
+    writeTable(results, arguments.salida)
+    summary = aggregate(results)
+    writeTable(summary, summaryPath(arguments.salida))
+
+    print(f"{len(results)} tiros en {elapsed:.1f} s con {workers} procesos: {len(results) / elapsed:.1f} tiros/s")
+    for line in summary:
+        print(f"friccion {line['friction']} - restitucion {line['restitution']}: "
+            f"{line['pocketed_mean']:.2f} bolas en hoyos, {line['time_to_rest_mean']:.1f} s hasta quedar quietas")
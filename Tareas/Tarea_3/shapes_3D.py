@@ -5,6 +5,7 @@ import grafica.basic_shapes as bs
 import grafica.easy_shaders as es
 import grafica.transformations as tr
 import grafica.scene_graph as sg
+import grafica.parametric_shapes as ps
 
 
 # Convenience function to ease initialization
@@ -16,182 +17,14 @@ def createGPUShape(pipeline, shape):
 
 
 def createTextureNormalSphere(N):
-    # Funcion para crear una esfera texturizada con normales
-
-    vertices = []           # lista para almacenar los verices
-    indices = []            # lista para almacenar los indices
-    dTheta = np.pi / N      # angulo que hay entre cada iteracion de la coordenada theta
-    dPhi = 2 * np.pi /N     # angulo que hay entre cada iteracion de la coordenada phi
-    rho = 0.5               # radio de la esfera
-    c = 0                   # contador de vertices, para ayudar a indicar los indices
-
-    # Se recorre la coordenada theta
-    for i in range(N - 1):
-        theta = i * dTheta # angulo theta en esta iteracion
-        theta1 = (i + 1) * dTheta # angulo theta en la iteracion siguiente
-        # Se recorre la coordenada phi
-        for j in range(N):
-            phi = j*dPhi # angulo phi en esta iteracion
-            phi1 = (j+1)*dPhi # angulo phi en la iteracion siguiente
-
-            # Se crean los vertices necesarios son coordenadas esfericas para cada iteracion
-
-            # Vertice para las iteraciones actuales de theta (i) y phi (j) 
-            v0 = [rho*np.sin(theta)*np.cos(phi), rho*np.sin(theta)*np.sin(phi), rho*np.cos(theta)]
-            # Vertice para las iteraciones siguiente de theta (i + 1) y actual de phi (j) 
-            v1 = [rho*np.sin(theta1)*np.cos(phi), rho*np.sin(theta1)*np.sin(phi), rho*np.cos(theta1)]
-            # Vertice para las iteraciones actual de theta (i + 1) y siguiente de phi (j + 1) 
-            v2 = [rho*np.sin(theta1)*np.cos(phi1), rho*np.sin(theta1)*np.sin(phi1), rho*np.cos(theta1)]
-            # Vertice para las iteraciones siguientes de theta (i y phi (j + 1) 
-            v3 = [rho*np.sin(theta)*np.cos(phi1), rho*np.sin(theta)*np.sin(phi1), rho*np.cos(theta)]
-            
-            # Se crean los vectores normales para cada vertice segun los valores de rho tongo 
-            n0 = [np.sin(theta)*np.cos(phi), np.sin(theta)*np.sin(phi), np.cos(theta)]
-            n1 = [np.sin(theta1)*np.cos(phi), np.sin(theta1)*np.sin(phi), np.cos(theta1)]
-            n2 = [np.sin(theta1)*np.cos(phi1), np.sin(theta1)*np.sin(phi1), np.cos(theta1)]
-            n3 = [np.sin(theta)*np.cos(phi1), np.sin(theta)*np.sin(phi1), np.cos(theta)]
-
-
-            # Creamos los triangulos superiores
-            #        v0
-            #       /  \
-            #      /    \
-            #     /      \
-            #    /        \
-            #   /          \
-            # v1 ---------- v2
-            if i == 0:
-                #           vertices              tex coords    normales
-                vertices += [v0[0], v0[1], v0[2], phi/(2*np.pi), theta/(np.pi),  n0[0], n0[1], n0[2]]
-                vertices += [v1[0], v1[1], v1[2], phi/(2*np.pi), theta1/(np.pi),  n1[0], n1[1], n1[2]]
-                vertices += [v2[0], v2[1], v2[2], phi1/(2*np.pi), theta1/(np.pi),  n2[0], n2[1], n2[2]]
-                indices += [ c + 0, c + 1, c +2 ]
-                c += 3
-
-            # Creamos los triangulos inferiores
-            # v0 ---------- v3
-            #   \          /
-            #    \        /
-            #     \      /
-            #      \    /
-            #       \  /
-            #        v1
-            elif i == (N-2):
-                #           vertices              tex coords       normales
-                vertices += [v0[0], v0[1], v0[2], phi/(2*np.pi), theta/(np.pi),   n0[0], n0[1], n0[2]]
-                vertices += [v1[0], v1[1], v1[2], phi/(2*np.pi), theta1/(np.pi),  n1[0], n1[1], n1[2]]
-                vertices += [v3[0], v3[1], v3[2], phi1/(2*np.pi), theta/(np.pi),  n3[0], n3[1], n3[2]]
-                indices += [ c + 0, c + 1, c +2 ]
-                c += 3
-            
-            # Creamos los quads intermedios
-            #  v0 -------------- v3
-            #  | \                |
-            #  |    \             |
-            #  |       \          |
-            #  |          \       |
-            #  |             \    |
-            #  |                \ |
-            #  v1 -------------- v2
-            else: 
-                #           vertices              tex coords    normales
-                vertices += [v0[0], v0[1], v0[2], phi/(2*np.pi),  theta/(np.pi),  n0[0], n0[1], n0[2]]
-                vertices += [v1[0], v1[1], v1[2], phi/(2*np.pi), theta1/(np.pi),  n1[0], n1[1], n1[2]]
-                vertices += [v2[0], v2[1], v2[2], phi1/(2*np.pi), theta1/(np.pi), n2[0], n2[1], n2[2]]
-                vertices += [v3[0], v3[1], v3[2], phi1/(2*np.pi),  theta/(np.pi), n3[0], n3[1], n3[2]]
-                indices += [ c + 0, c + 1, c + 2 ]
-                indices += [ c + 2, c + 3, c + 0 ]
-                c += 4
-
-    return bs.Shape(vertices, indices)
+    # Esfera texturizada con normales de radio 0.5, evaluada de una vez sobre
+    # las esquinas (phi, theta) de cada cuadrilatero, con casquetes de triangulos
+    phi, theta = ps.cellParameters(N, N - 1, 2 * np.pi / N, np.pi / N)
+    texCoords = np.stack([phi / (2 * np.pi), theta / np.pi], axis=-1)
+    return ps.createCellShape(ps.sphereCells(phi, theta, 0.5, texCoords), bs.TEXTURE_NORMAL_LAYOUT, capped=True)
 
 
 def createColorNormalSphere(N, r, g, b):
-    # Funcion para crear una esfera con normales
-
-    vertices = []           # lista para almacenar los verices
-    indices = []            # lista para almacenar los indices
-    dTheta = np.pi / N      # angulo que hay entre cada iteracion de la coordenada theta
-    dPhi = 2 * np.pi /N     # angulo que hay entre cada iteracion de la coordenada phi
-    rho = 0.5               # radio de la esfera
-    c = 0                   # contador de vertices, para ayudar a indicar los indices
-
-    # Se recorre la coordenada theta
-    for i in range(N - 1):
-        theta = i * dTheta # angulo theta en esta iteracion
-        theta1 = (i + 1) * dTheta # angulo theta en la iteracion siguiente
-        # Se recorre la coordenada phi
-        for j in range(N):
-            phi = j*dPhi # angulo phi en esta iteracion
-            phi1 = (j+1)*dPhi # angulo phi en la iteracion siguiente
-
-            # Se crean los vertices necesarios son coordenadas esfericas para cada iteracion
-
-            # Vertice para las iteraciones actuales de theta (i) y phi (j) 
-            v0 = [rho*np.sin(theta)*np.cos(phi), rho*np.sin(theta)*np.sin(phi), rho*np.cos(theta)]
-            # Vertice para las iteraciones siguiente de theta (i + 1) y actual de phi (j) 
-            v1 = [rho*np.sin(theta1)*np.cos(phi), rho*np.sin(theta1)*np.sin(phi), rho*np.cos(theta1)]
-            # Vertice para las iteraciones actual de theta (i) y siguiente de phi (j + 1) 
-            v2 = [rho*np.sin(theta1)*np.cos(phi1), rho*np.sin(theta1)*np.sin(phi1), rho*np.cos(theta1)]
-            # Vertice para las iteraciones siguientes de theta (i + 1) y phi (j + 1) 
-            v3 = [rho*np.sin(theta)*np.cos(phi1), rho*np.sin(theta)*np.sin(phi1), rho*np.cos(theta)]
-            
-            # Se crean los vectores normales para cada vertice segun los valores de rho tongo 
-            n0 = [np.sin(theta)*np.cos(phi), np.sin(theta)*np.sin(phi), np.cos(theta)]
-            n1 = [np.sin(theta1)*np.cos(phi), np.sin(theta1)*np.sin(phi), np.cos(theta1)]
-            n2 = [np.sin(theta1)*np.cos(phi1), np.sin(theta1)*np.sin(phi1), np.cos(theta1)]
-            n3 = [np.sin(theta)*np.cos(phi1), np.sin(theta)*np.sin(phi1), np.cos(theta)]
-
-
-            # Creamos los triangulos superiores
-            #        v0
-            #       /  \
-            #      /    \
-            #     /      \
-            #    /        \
-            #   /          \
-            # v1 ---------- v2
-            if i == 0:
-                #           vertices              color    normales
-                vertices += [v0[0], v0[1], v0[2], r, g, b, n0[0], n0[1], n0[2]]
-                vertices += [v1[0], v1[1], v1[2], r, g, b, n1[0], n1[1], n1[2]]
-                vertices += [v2[0], v2[1], v2[2], r, g, b, n2[0], n2[1], n2[2]]
-                indices += [ c + 0, c + 1, c +2 ]
-                c += 3
-
-            # Creamos los triangulos inferiores
-            # v0 ---------- v3
-            #   \          /
-            #    \        /
-            #     \      /
-            #      \    /
-            #       \  /
-            #        v1
-            elif i == (N-2):
-                #           vertices              color    normales
-                vertices += [v0[0], v0[1], v0[2], r, g, b, n0[0], n0[1], n0[2]]
-                vertices += [v1[0], v1[1], v1[2], r, g, b, n1[0], n1[1], n1[2]]
-                vertices += [v3[0], v3[1], v3[2], r, g, b, n3[0], n3[1], n3[2]]
-                indices += [ c + 0, c + 1, c +2 ]
-                c += 3
-            
-            # Creamos los quads intermedios
-            #  v0 -------------- v3
-            #  | \                |
-            #  |    \             |
-            #  |       \          |
-            #  |          \       |
-            #  |             \    |
-            #  |                \ |
-            #  v1 -------------- v2
-            else: 
-                #           vertices              color    normales
-                vertices += [v0[0], v0[1], v0[2], r, g, b, n0[0], n0[1], n0[2]]
-                vertices += [v1[0], v1[1], v1[2], r, g, b, n1[0], n1[1], n1[2]]
-                vertices += [v2[0], v2[1], v2[2], r, g, b, n2[0], n2[1], n2[2]]
-                vertices += [v3[0], v3[1], v3[2], r, g, b, n3[0], n3[1], n3[2]]
-                indices += [ c + 0, c + 1, c +2 ]
-                indices += [ c + 2, c + 3, c + 0 ]
-                c += 4
-
-    return bs.Shape(vertices, indices)
+    # Esfera de color con normales de radio 0.5, evaluada de una vez sobre las esquinas (phi, theta)
+    phi, theta = ps.cellParameters(N, N - 1, 2 * np.pi / N, np.pi / N)
+    return ps.createCellShape(ps.sphereCells(phi, theta, 0.5, (r, g, b)), bs.COLOR_NORMAL_LAYOUT, capped=True)
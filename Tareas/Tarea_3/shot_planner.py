@@ -0,0 +1,353 @@
+# coding=utf-8
+"""Busqueda del mejor tiro: cientos de angulos y fuerzas por segundo simulados sin OpenGL en varios procesos"""
+
+import os
+import time
+import concurrent.futures
+import numpy as np
+from pool_physics import PoolPhysics, REST_SPEED
+
+__author__ = "Sebastián Tapia"
+__license__ = "MIT"
+
+# Tiros por segundo que se suponen por nucleo antes del primer plan, para elegir cuantos pedir
+CANDIDATES_PER_SECOND = 100
+
+# Candidatos pedidos como minimo, aunque el tiempo no alcance para terminarlos
+MIN_CANDIDATES = 64
+
+# Fuerzas distintas de la grilla de candidatos como minimo
+MIN_FORCE_STEPS = 4
+
+
+class Table:
+    """Estado de la mesa a copiar en cada candidato, sin referencias al motor para enviarlo a otro proceso"""
+
+    def __init__(self, physics):
+        self.positions = physics.positions.copy()
+        self.radii = physics.radii.copy()
+        self.pocketed = physics.pocketed.copy()
+        self.pocketable = physics.pocketable.copy()
+        # Las bolas dormidas siguen dormidas hasta que un choque las mueva, como en el motor
+        self.sleeping = physics.sleeping.copy()
+        self.restSteps = physics.restSteps.copy()
+        self.parameters = (physics.mu, physics.gravity, physics.restitution, physics.borderWidth,
+            physics.borderHeight, physics.holes.copy(), physics.holeRadius)
+
+    def __len__(self):
+        return len(self.positions)
+
+
+class ShotBatch(PoolPhysics):
+    """
+    K copias de la mesa simuladas a la vez, una por tiro candidato, en los arreglos
+    de un solo motor de K * N bolas: el roce, las bandas, los hoyos y los choques se
+    resuelven para todas juntas. Solo cambia la busqueda de pares, que no mezcla mesas.
+    Con reset una mesa vuelve al estado inicial con otro tiro, sin tocar las demas.
+    """
+    def __init__(self, table, cue, angles, forces):
+        count = len(angles)
+        balls = len(table)
+        mu, gravity, restitution, borderWidth, borderHeight, holes, holeRadius = table.parameters
+
+        super().__init__(np.tile(table.positions, (count, 1)), np.zeros((count * balls, 3)),
+            np.tile(table.radii, count), mu, gravity, restitution, borderWidth, borderHeight, holes, holeRadius,
+            np.tile(table.pocketable, count))
+
+        self.table = table
+        self.cue = cue
+        self.tables = count
+        self.balls = balls
+        self.pairs = np.triu_indices(balls, 1)
+        self.reset(np.arange(count), angles, forces)
+
+    def reset(self, tables, angles, forces):
+        """Las mesas de indices tables vuelven a la posicion inicial, con la bola cue lanzada"""
+
+        velocities = np.zeros((len(tables), self.balls, 3))
+        velocities[:, self.cue, 0] = forces * np.cos(angles)
+        velocities[:, self.cue, 1] = forces * np.sin(angles)
+
+        bodies = (tables[:, np.newaxis] * self.balls + np.arange(self.balls)).reshape(-1)
+        self.positions[bodies] = np.tile(self.table.positions, (len(tables), 1))
+        self.previousPositions[bodies] = self.positions[bodies]
+        self.velocities[bodies] = velocities.reshape(-1, 3)
+        self.pocketed[bodies] = np.tile(self.table.pocketed, len(tables))
+        self.sleeping[bodies] = np.tile(self.table.sleeping, len(tables))
+        self.restSteps[bodies] = np.tile(self.table.restSteps, len(tables))
+
+    def collidingPairs(self):
+        """Pares que se tocan dentro de cada mesa con alguna bola despierta, en orden de indice global"""
+
+        awake = self.awake().reshape(self.tables, self.balls)
+        tables = np.flatnonzero(awake.any(axis=1))
+
+        positions = self.positions.reshape(self.tables, self.balls, 3)[tables, :, :2]
+        radii = self.radii.reshape(self.tables, self.balls)[tables]
+        active = self.active().reshape(self.tables, self.balls)[tables]
+        awake = awake[tables]
+
+        # Solo los pares i < j de cada mesa, con distancias al cuadrado: la raiz no cambia la comparacion
+        first, second = self.pairs
+        differences = positions[:, first] - positions[:, second]
+        distances = np.einsum("tpk,tpk->tp", differences, differences)
+        touching = distances < (radii[:, first] + radii[:, second]) ** 2
+        touching &= active[:, first] & active[:, second]
+        touching &= awake[:, first] | awake[:, second]
+
+        table, pair = np.nonzero(touching)
+        offset = tables[table] * self.balls
+        return offset + first[pair], offset + second[pair]
+
+    def movingTables(self):
+        speeds = np.abs(self.velocities[:, :2]).reshape(self.tables, self.balls * 2)
+        return np.any(speeds >= REST_SPEED, axis=1)
+
+    def pocketedPerTable(self):
+        return np.count_nonzero(self.pocketed.reshape(self.tables, self.balls), axis=1)
+
+
+def evaluateShots(table, cue, angles, forces, deltaTime, maxTime, deadline, batchSize=256):
+    """
+    Simula los tiros de a batchSize mesas a la vez. Cada tiro termina cuando su
+    mesa queda quieta o pasa maxTime, y su mesa se reutiliza en seguida para el
+    siguiente, asi cada paso avanza batchSize tiros en vez de esperar al mas
+    lento. Se detiene al cumplirse deadline (segun time.time, que sirve entre
+    procesos). Devuelve las bolas metidas por cada tiro, cuales terminaron y
+    cuales quedaron a medio simular: esos cuentan las bolas metidas hasta el plazo.
+    """
+    angles = np.asarray(angles)
+    forces = np.asarray(forces)
+    count = len(angles)
+    pocketed = np.zeros(count, dtype=np.int64)
+    done = np.zeros(count, dtype=bool)
+    partial = np.zeros(count, dtype=bool)
+    if count == 0:
+        return pocketed, done, partial
+
+    slots = min(batchSize, count)
+    batch = ShotBatch(table, cue, angles[:slots], forces[:slots])
+    initial = int(np.count_nonzero(table.pocketed))
+
+    # Tiro simulado en cada mesa (-1 si quedo libre) y pasos que lleva
+    shots = np.arange(slots)
+    steps = np.zeros(slots, dtype=np.int64)
+    maxSteps = int(np.ceil(maxTime / deltaTime - 1e-9))
+    nextShot = slots
+
+    while True:
+        finishedTables = np.flatnonzero((shots >= 0) & (~batch.movingTables() | (steps >= maxSteps)))
+        if len(finishedTables) > 0:
+            pocketed[shots[finishedTables]] = batch.pocketedPerTable()[finishedTables] - initial
+            done[shots[finishedTables]] = True
+
+            refill = finishedTables[:max(count - nextShot, 0)]
+            shots[finishedTables] = -1
+            shots[refill] = np.arange(nextShot, nextShot + len(refill))
+            steps[refill] = 0
+            batch.reset(refill, angles[shots[refill]], forces[shots[refill]])
+            nextShot += len(refill)
+
+        if not np.any(shots >= 0):
+            return pocketed, done, partial
+
+        if time.time() > deadline:
+            # Las mesas en vuelo no se botan: cuentan las bolas que ya cayeron
+            running = np.flatnonzero(shots >= 0)
+            pocketed[shots[running]] = batch.pocketedPerTable()[running] - initial
+            partial[shots[running]] = True
+            return pocketed, done, partial
+
+        batch.step(deltaTime)
+        steps += 1
+
+
+def evaluated(angles, speeds, result):
+    """Angulos, fuerzas, bolas metidas y si quedaron a medio simular, de los tiros de un grupo que se alcanzaron a simular"""
+
+    pocketed, done, partial = result
+    simulated = done | partial
+    return angles[simulated], speeds[simulated], pocketed[simulated], partial[simulated]
+
+
+class Shot:
+    """
+    Tiro candidato: angulo en radianes en el plano de la mesa, rapidez inicial y bolas
+    metidas. En un tiro parcial la simulacion se corto en el plazo y pocketed es un minimo.
+    """
+
+    def __init__(self, angle, force, pocketed, partial=False):
+        self.angle = angle
+        self.force = force
+        self.pocketed = pocketed
+        self.partial = partial
+
+    def velocity(self):
+        return np.array([self.force * np.cos(self.angle), self.force * np.sin(self.angle), 0.0])
+
+    def __repr__(self):
+        state = ", parcial" if self.partial else ""
+        return f"Shot({np.degrees(self.angle):.1f} grados, {self.force:.2f} m/s, {self.pocketed} bolas{state})"
+
+
+class ShotPlanner:
+    """
+    Reparte los candidatos en grupos de chunkSize entre procesos, que se crean una
+    vez y se reutilizan en cada plan. Con workers=0 todo se simula en este proceso.
+    Cada grupo simula batchSize mesas a la vez y reutiliza las que quedan quietas.
+    Un plan termina cuando se evaluan todos los candidatos o se acaba el tiempo;
+    los tiros a medio simular en ese momento entran con las bolas que ya metieron,
+    marcados como parciales, detras de los terminados con las mismas bolas.
+
+    Sin count, se piden los candidatos que alcanzan a terminarse en el tiempo dado
+    segun los tiros por segundo del plan anterior (CANDIDATES_PER_SECOND por nucleo
+    en el primero). Asi las mesas simuladas a la vez tambien bajan con poco tiempo,
+    y cada una avanza mas pasos antes del plazo. submit hace el plan en otro hilo.
+
+    Los tiros por segundo dependen del tiempo hasta que la mesa queda quieta:
+    con roce 0.5 un tiro a 6 m/s rueda varios segundos, cientos de pasos de 1/120.
+    Con 256 mesas, la mesa inicial dormida y maxTime de 8 s (mismas bolas metidas
+    que con 15 s en 1024 tiros de la salida) un nucleo evalua unos 130 tiros por
+    segundo; un paso de 1/60 cambia el resultado de un cuarto de los tiros.
+    report() muestra cuantos de los pedidos alcanzaron a evaluarse.
+    """
+    def __init__(self, workers=None, batchSize=256, deltaTime=1 / 120, maxTime=8.0, chunkSize=512):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.batchSize = batchSize
+        self.chunkSize = chunkSize
+        self.deltaTime = deltaTime
+        self.maxTime = maxTime
+        self.executor = None
+        if self.workers > 0:
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+        # Hilo de submit, creado con el primer plan pedido asi
+        self.thread = None
+
+        self.requested = 0
+        self.evaluated = 0
+        self.partial = 0
+        self.elapsed = 0.0
+        self.candidatesPerSecond = 0.0
+        self.budgetExpired = False
+
+    def candidates(self, count, forces, rng):
+        """Grilla de angulos y fuerzas en orden aleatorio, asi cortar antes sigue cubriendo toda la mesa"""
+
+        # Con pocos candidatos igual se prueban fuerzas de todo el rango, no solo la menor
+        forceSteps = max(min(count, MIN_FORCE_STEPS), int(round(np.sqrt(count / 64))))
+        angleSteps = max(1, count // forceSteps)
+        angles, speeds = np.meshgrid(np.linspace(0, 2 * np.pi, angleSteps, endpoint=False),
+            np.linspace(forces[0], forces[1], forceSteps), indexing="ij")
+
+        order = rng.permutation(angles.size)
+        return angles.reshape(-1)[order], speeds.reshape(-1)[order]
+
+    def candidateCount(self, budget):
+        """Candidatos que se alcanzan a terminar en budget segundos, segun el plan anterior"""
+
+        rate = self.candidatesPerSecond
+        if rate <= 0.0:
+            rate = CANDIDATES_PER_SECOND * max(self.workers, 1)
+        return max(MIN_CANDIDATES, int(rate * budget))
+
+    def plan(self, physics, cue, budget=1.0, count=None, forces=(1.0, 6.0), top=5, seed=None):
+        """
+        Los top mejores tiros de la bola cue sobre el estado actual de physics,
+        ordenados por bolas metidas, los terminados antes que los parciales y
+        luego por menor fuerza, en a lo mas budget segundos
+        """
+        return self.planTable(Table(physics), cue, budget, count, forces, top, seed)
+
+    def submit(self, physics, cue, budget=1.0, count=None, forces=(1.0, 6.0), top=5, seed=None):
+        """
+        Como plan, pero en otro hilo: devuelve un Future con los tiros. La mesa se copia
+        aca, asi physics puede seguir cambiando mientras se busca.
+        """
+        if self.thread is None:
+            self.thread = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        return self.thread.submit(self.planTable, Table(physics), cue, budget, count, forces, top, seed)
+
+    def planTable(self, table, cue, budget, count, forces, top, seed):
+        start = time.perf_counter()
+        deadline = time.time() + budget
+
+        count = self.candidateCount(budget) if count is None else count
+        angles, speeds = self.candidates(count, forces, np.random.default_rng(seed))
+        self.requested = len(angles)
+
+        results = []
+        self.budgetExpired = False
+        if self.executor is None:
+            result = evaluateShots(table, cue, angles, speeds, self.deltaTime, self.maxTime, deadline, self.batchSize)
+            results.append(evaluated(angles, speeds, result))
+            self.budgetExpired = not result[1].all()
+        else:
+            # Al menos un grupo por proceso, aunque se pidan pocos candidatos
+            chunkSize = min(self.chunkSize, -(-len(angles) // self.workers))
+            batches = [(angles[i:i + chunkSize], speeds[i:i + chunkSize])
+                for i in range(0, len(angles), chunkSize)]
+            results = self.evaluateInPool(table, cue, batches, deadline)
+
+        self.partial = sum(int(np.count_nonzero(result[3])) for result in results)
+        self.evaluated = sum(len(result[0]) for result in results) - self.partial
+        self.elapsed = time.perf_counter() - start
+        self.candidatesPerSecond = self.evaluated / self.elapsed
+
+        if not results:
+            return []
+        angles = np.concatenate([result[0] for result in results])
+        speeds = np.concatenate([result[1] for result in results])
+        pocketed = np.concatenate([result[2] for result in results])
+        partial = np.concatenate([result[3] for result in results])
+
+        best = np.lexsort((speeds, partial, -pocketed))[:top]
+        return [Shot(float(angles[i]), float(speeds[i]), int(pocketed[i]), bool(partial[i])) for i in best]
+
+    def evaluateInPool(self, table, cue, batches, deadline):
+        # Dos grupos por proceso en vuelo, para que ninguno quede esperando trabajo
+        pending = {}
+        results = []
+        nextBatch = 0
+
+        while nextBatch < len(batches) or pending:
+            while nextBatch < len(batches) and len(pending) < 2 * self.workers:
+                batchAngles, batchSpeeds = batches[nextBatch]
+                future = self.executor.submit(evaluateShots, table, cue, batchAngles, batchSpeeds,
+                    self.deltaTime, self.maxTime, deadline, self.batchSize)
+                pending[future] = batches[nextBatch]
+                nextBatch += 1
+
+            done, _ = concurrent.futures.wait(pending, timeout=max(deadline - time.time(), 0.0),
+                return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                batchAngles, batchSpeeds = pending.pop(future)
+                result = future.result()
+                self.budgetExpired = self.budgetExpired or not result[1].all()
+                results.append(evaluated(batchAngles, batchSpeeds, result))
+
+            if time.time() > deadline:
+                # Los grupos en cola se cancelan, los que corren ven el plazo en el paso
+                # siguiente y devuelven los tiros que alcanzaron a terminar
+                self.budgetExpired = self.budgetExpired or nextBatch < len(batches) or bool(pending)
+                running = [future for future in pending if not future.cancel()]
+                for future in concurrent.futures.as_completed(running):
+                    batchAngles, batchSpeeds = pending[future]
+                    results.append(evaluated(batchAngles, batchSpeeds, future.result()))
+                break
+
+        return results
+
+    def report(self):
+        partial = f" y {self.partial} a medio simular" if self.partial > 0 else ""
+        state = ", se acabo el tiempo" if self.budgetExpired else ""
+        return (f"{self.evaluated} de {self.requested} tiros evaluados{partial} en {self.elapsed:.2f} s: "
+            f"{self.candidatesPerSecond:.0f} tiros/s{state}")
+
+    def close(self):
+        if self.thread is not None:
+            self.thread.shutdown(wait=True)
+            self.thread = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None